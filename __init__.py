@@ -4,13 +4,53 @@ Author: Maarten Harms
 Ko-fi: https://ko-fi.com/maartenharms
 """
 
-import os
+import asyncio
+import functools
+import itertools
 import json
-import re
-from pathlib import Path
+import logging
+import os
+import time
+
+import folder_paths
 from aiohttp import web
 from server import PromptServer
-import folder_paths
+
+from .core.api import (
+    CategorizerCache,
+    batch_request,
+    categorize_request,
+    delete_wildcard_file,
+    etag_matches,
+    export_command,
+    export_error,
+    is_truthy,
+    json_object,
+    resolve_request,
+    resolve_seeds,
+    save_request,
+    save_wildcard_file,
+    search_params,
+    variation_rows,
+    variations_page_payload,
+    variations_params,
+    variations_space,
+    variations_template,
+    wildcard_batch_payload,
+    wildcard_contents_payload,
+    wildcard_listing_params,
+    wildcard_name_from_url,
+)
+from .core.async_io import BlockingIOPool
+from .core.bundle import BUNDLE_EXTENSION
+from .core.engine import PromptEngine, set_default_engine
+from .core.export import CONTENT_TYPES
+from .core.listing import WildcardListing, accepted_encoding, parse_fields
+from .core.metrics import METRICS
+from .core.presets import PresetStore
+from .core.search import WildcardSearchIndex
+from .core.watcher import WildcardWatcher
+from .core.wildcards import WildcardRegistry
 
 # Import nodes
 from .nodes.promptflow_core import PromptFlowCore
@@ -30,37 +70,48 @@ NODE_DISPLAY_NAME_MAPPINGS = {
 # Web directory for frontend
 WEB_DIRECTORY = "./web/comfyui"
 
+# PromptFlow logs under "promptflow.*"; PROMPTFLOW_LOG_LEVEL=DEBUG shows
+# per-request details
+logger = logging.getLogger("promptflow")
+if os.environ.get("PROMPTFLOW_LOG_LEVEL"):
+    logger.setLevel(os.environ["PROMPTFLOW_LOG_LEVEL"].upper())
+
 # Get the directory where this file is located
 EXTENSION_DIR = os.path.dirname(os.path.realpath(__file__))
 PRESETS_DIR = os.path.join(EXTENSION_DIR, "presets")
 
+# Generated caches (line indexes for large wildcard files, ...)
+CACHE_DIR = os.path.join(EXTENSION_DIR, ".cache")
+
 # Wildcard directories (PromptFlow local first, then shared ComfyUI location)
 WILDCARDS_DIR_LOCAL = os.path.join(EXTENSION_DIR, "wildcards")
 WILDCARDS_DIR_SHARED = os.path.join(folder_paths.base_path, "wildcards")
 
 
-def load_builtin_presets():
-    """Load all built-in presets from the presets directory"""
-    presets = {"styles": [], "quality": [], "negatives": []}
-
-    print(f"[PromptFlow] Loading presets from: {PRESETS_DIR}")
-
-    for preset_type in presets.keys():
-        preset_file = os.path.join(PRESETS_DIR, f"{preset_type}.json")
-        print(f"[PromptFlow] Looking for: {preset_file}")
-        if os.path.exists(preset_file):
-            try:
-                with open(preset_file, "r", encoding="utf-8") as f:
-                    presets[preset_type] = json.load(f)
-                    print(
-                        f"[PromptFlow] Loaded {len(presets[preset_type])} {preset_type} presets"
-                    )
-            except Exception as e:
-                print(f"[PromptFlow] Error loading {preset_type} presets: {e}")
-        else:
-            print(f"[PromptFlow] Preset file not found: {preset_file}")
+def get_preset_dirs():
+    """
+    Get preset directories in merge order: built-in presets first, then the
+    user's presets in ComfyUI/user/promptflow/presets (which override
+    built-ins with the same name).
+    """
+    dirs = [PRESETS_DIR]
+    if hasattr(folder_paths, "get_user_directory"):
+        dirs.append(
+            os.path.join(folder_paths.get_user_directory(), "promptflow", "presets")
+        )
+    return dirs
+
 
-    return presets
+# Shared preset cache (loaded lazily, reloaded when preset files change)
+PRESET_STORE = PresetStore(get_preset_dirs)
+
+
+def load_builtin_presets():
+    """
+    Load all presets (built-in merged with user presets).
+    The returned dict is cached and must not be modified.
+    """
+    return PRESET_STORE.presets()
 
 
 # ============================================================================
@@ -72,35 +123,46 @@ def ensure_wildcards_dir():
     """Ensure the local wildcards directory exists"""
     if not os.path.exists(WILDCARDS_DIR_LOCAL):
         os.makedirs(WILDCARDS_DIR_LOCAL)
-        print(f"[PromptFlow] Created wildcards directory: {WILDCARDS_DIR_LOCAL}")
+        logger.info("[PromptFlow] Created wildcards directory: %s", WILDCARDS_DIR_LOCAL)
     return WILDCARDS_DIR_LOCAL
 
 
+def _add_wildcard_root(dirs, source, directory):
+    """
+    Add a wildcard directory and the wildcard bundle next to it
+    ("wildcards" and "wildcards.pfw"), whichever exist
+    """
+    if os.path.isdir(directory):
+        dirs.append((source, directory))
+    bundle = directory + BUNDLE_EXTENSION
+    if os.path.isfile(bundle):
+        dirs.append((source, bundle))
+
+
 def get_wildcard_dirs():
-    """Get list of wildcard directories that exist, in priority order"""
+    """
+    Get list of wildcard directories (and bundles) that exist, in priority
+    order
+    """
     dirs = []
 
     # 1. PromptFlow local wildcards (highest priority)
-    if os.path.exists(WILDCARDS_DIR_LOCAL):
-        dirs.append(("local", WILDCARDS_DIR_LOCAL))
+    _add_wildcard_root(dirs, "local", WILDCARDS_DIR_LOCAL)
 
     # 2. Shared ComfyUI wildcards
-    if os.path.exists(WILDCARDS_DIR_SHARED):
-        dirs.append(("shared", WILDCARDS_DIR_SHARED))
+    _add_wildcard_root(dirs, "shared", WILDCARDS_DIR_SHARED)
 
     # 3. Impact Pack wildcards
     impact_wildcards = os.path.join(
         folder_paths.base_path, "custom_nodes", "comfyui-impact-pack", "wildcards"
     )
-    if os.path.exists(impact_wildcards):
-        dirs.append(("impact-pack", impact_wildcards))
+    _add_wildcard_root(dirs, "impact-pack", impact_wildcards)
 
     # 4. ComfyUI-Impact-Subpack wildcards
     impact_subpack = os.path.join(
         folder_paths.base_path, "custom_nodes", "ComfyUI-Impact-Subpack", "wildcards"
     )
-    if os.path.exists(impact_subpack):
-        dirs.append(("impact-subpack", impact_subpack))
+    _add_wildcard_root(dirs, "impact-subpack", impact_subpack)
 
     # 5. Any other custom_nodes/*/wildcards directories
     custom_nodes_dir = os.path.join(folder_paths.base_path, "custom_nodes")
@@ -108,72 +170,90 @@ def get_wildcard_dirs():
         for node_name in os.listdir(custom_nodes_dir):
             node_wildcards = os.path.join(custom_nodes_dir, node_name, "wildcards")
             # Skip already added directories
-            if node_wildcards in [d[1] for d in dirs]:
+            added = [d[1] for d in dirs]
+            if node_wildcards in added or node_wildcards + BUNDLE_EXTENSION in added:
                 continue
-            if os.path.isdir(node_wildcards):
-                dirs.append((node_name, node_wildcards))
+            _add_wildcard_root(dirs, node_name, node_wildcards)
 
     return dirs
 
 
+# Shared wildcard index, persisted under .cache (loaded lazily on first use)
+WILDCARD_REGISTRY = WildcardRegistry(
+    get_wildcard_dirs,
+    index_dir=os.path.join(CACHE_DIR, "line_index"),
+    cache_path=os.path.join(CACHE_DIR, "wildcards.cache"),
+)
+
+# Resolution engine used by the nodes and the resolve API
+PROMPT_ENGINE = PromptEngine(registry=WILDCARD_REGISTRY)
+set_default_engine(PROMPT_ENGINE)
+
+METRICS.gauge(
+    "wildcard_files",
+    lambda: WILDCARD_REGISTRY.stats()["wildcards"],
+    "Wildcard files in the registry index",
+)
+METRICS.gauge(
+    "wildcard_cached_files",
+    lambda: WILDCARD_REGISTRY.stats()["cached_files"],
+    "Wildcard files with parsed options in memory",
+)
+
+# Beyond this many changed names the frontend just drops its whole cache
+WILDCARD_EVENT_MAX_NAMES = 500
+
+
+def _push_wildcard_changes(diff):
+    """Tell connected frontends which cached wildcards are stale"""
+    changed = len(diff["added"]) + len(diff["removed"]) + len(diff["modified"])
+    if changed > WILDCARD_EVENT_MAX_NAMES:
+        payload = {"full": True, "version": diff["version"]}
+    else:
+        payload = dict(diff)
+    logger.debug("[PromptFlow] Wildcards changed: %d names", changed)
+    try:
+        PromptServer.instance.send_sync("promptflow.wildcards.changed", payload)
+    except Exception:
+        logger.debug("[PromptFlow] Could not push wildcard changes", exc_info=True)
+
+
+WILDCARD_REGISTRY.add_listener(_push_wildcard_changes)
+
+# Watch the wildcard directories for edits (disable with PROMPTFLOW_WATCH=0).
+# Started on the first wildcard lookup, so nothing is read at import time.
+WILDCARD_WATCHER = WildcardWatcher(WILDCARD_REGISTRY)
+if os.environ.get("PROMPTFLOW_WATCH", "1").lower() not in ("0", "false", "no"):
+    WILDCARD_REGISTRY.on_first_use(WILDCARD_WATCHER.start)
+
+# Name and content search (indexed on the first search, then incrementally)
+WILDCARD_SEARCH = WildcardSearchIndex(WILDCARD_REGISTRY, watcher=WILDCARD_WATCHER)
+
+
 def list_wildcards():
     """
     List all available wildcards from both directories.
     Returns dict with wildcard names and their source location.
     Local wildcards take priority over shared ones with same name.
     """
-    wildcards = {}
-
-    # Process shared first, then local (so local overrides)
-    for source, base_dir in reversed(get_wildcard_dirs()):
-        if not os.path.exists(base_dir):
-            continue
-
-        for root, dirs, files in os.walk(base_dir):
-            for file in files:
-                if file.endswith(".txt"):
-                    # Get relative path from base_dir
-                    rel_path = os.path.relpath(os.path.join(root, file), base_dir)
-                    # Convert to wildcard name: remove .txt, use forward slashes
-                    wildcard_name = rel_path[:-4].replace(os.sep, "/")
-
-                    wildcards[wildcard_name] = {
-                        "name": wildcard_name,
-                        "source": source,
-                        "path": os.path.join(root, file),
-                        "file": file,
-                    }
-
-    return wildcards
+    return dict(WILDCARD_REGISTRY.entries())
 
 
 def get_wildcard_contents(wildcard_name):
     """
     Get the contents of a wildcard file.
     Returns list of options (one per line, empty lines and comments stripped).
+    The list is cached by the registry and must not be modified.
     """
-    wildcards = list_wildcards()
-
-    if wildcard_name not in wildcards:
-        return None
-
-    filepath = wildcards[wildcard_name]["path"]
-
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            lines = f.readlines()
+    return WILDCARD_REGISTRY.get_options(wildcard_name)
 
-        # Process lines: strip whitespace, skip empty lines and comments
-        options = []
-        for line in lines:
-            line = line.strip()
-            if line and not line.startswith("#"):
-                options.append(line)
 
-        return options
-    except Exception as e:
-        print(f"[PromptFlow] Error reading wildcard {wildcard_name}: {e}")
-        return None
+def get_wildcard_fingerprint(wildcard_names):
+    """
+    Hashable fingerprint of the given wildcard files and every wildcard they
+    reference; changes when any of those files changes.
+    """
+    return WILDCARD_REGISTRY.fingerprint(wildcard_names)
 
 
 def save_wildcard(wildcard_name, options, overwrite=False):
@@ -188,90 +268,117 @@ def save_wildcard(wildcard_name, options, overwrite=False):
     Returns:
         dict with success status and path/error
     """
-    # Validate name (only alphanumeric, underscores, hyphens, forward slashes)
-    if not re.match(r"^[\w\-/]+$", wildcard_name):
-        return {
-            "success": False,
-            "error": "Invalid wildcard name. Use only letters, numbers, underscores, hyphens, and forward slashes.",
-        }
-
-    # Ensure base directory exists
-    ensure_wildcards_dir()
-
-    # Build file path
-    filepath = os.path.join(
-        WILDCARDS_DIR_LOCAL, wildcard_name.replace("/", os.sep) + ".txt"
+    result = save_wildcard_file(
+        WILDCARD_REGISTRY, WILDCARDS_DIR_LOCAL, wildcard_name, options, overwrite
     )
+    if result["success"]:
+        logger.info(
+            "[PromptFlow] Saved wildcard: %s (%d options)", wildcard_name, len(options)
+        )
+    return result
 
-    # Check if exists
-    if os.path.exists(filepath) and not overwrite:
-        return {
-            "success": False,
-            "error": f"Wildcard '{wildcard_name}' already exists. Set overwrite=true to replace.",
-        }
 
-    # Ensure parent directory exists
-    parent_dir = os.path.dirname(filepath)
-    if parent_dir and not os.path.exists(parent_dir):
-        os.makedirs(parent_dir)
+def delete_wildcard(wildcard_name):
+    """
+    Delete a wildcard file (only from local directory for safety).
+    """
+    result = delete_wildcard_file(WILDCARD_REGISTRY, WILDCARDS_DIR_LOCAL, wildcard_name)
+    if result["success"]:
+        logger.info("[PromptFlow] Deleted wildcard: %s", wildcard_name)
+    return result
 
-    try:
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write("\n".join(options))
 
-        print(f"[PromptFlow] Saved wildcard: {wildcard_name} ({len(options)} options)")
-        return {"success": True, "path": filepath, "name": wildcard_name}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+# API Routes
 
+# Blocking filesystem / parsing work runs here, off the server's event loop
+IO_POOL = BlockingIOPool(max_workers=4)
 
-def delete_wildcard(wildcard_name):
+
+def instrumented(route):
     """
-    Delete a wildcard file (only from local directory for safety).
+    Count and time the requests of an API route (also logged at DEBUG).
+    Apply below the route registration decorator.
+
+    Args:
+        route: Route label used in the metrics
     """
-    # Only allow deleting from local directory
-    filepath = os.path.join(
-        WILDCARDS_DIR_LOCAL, wildcard_name.replace("/", os.sep) + ".txt"
-    )
+    timer = METRICS.timer("http_request", "API request handling time", route=route)
+
+    def decorate(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            if not METRICS.enabled and not logger.isEnabledFor(logging.DEBUG):
+                return await handler(request)
+
+            start = time.perf_counter()
+            response = await handler(request)
+            elapsed = time.perf_counter() - start
+
+            timer.observe(elapsed)
+            METRICS.counter(
+                "http_requests_total", route=route, status=response.status
+            ).inc()
+            logger.debug(
+                "[PromptFlow] %s %s -> %d (%.1f ms)",
+                request.method,
+                request.path,
+                response.status,
+                elapsed * 1000,
+            )
+            return response
 
-    if not os.path.exists(filepath):
-        return {
-            "success": False,
-            "error": f"Wildcard '{wildcard_name}' not found in local directory",
-        }
+        return wrapper
 
-    try:
-        os.remove(filepath)
-        print(f"[PromptFlow] Deleted wildcard: {wildcard_name}")
-        return {"success": True}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+    return decorate
+
+
+def _bad_request(error):
+    """400 response for a request validation error"""
+    return web.json_response({"error": str(error)}, status=400)
+
+
+def _serialize_payload(func, *args):
+    """Call func -> (status, payload) and JSON-encode the payload (blocking)"""
+    status, payload = func(*args)
+    return status, json.dumps(payload).encode("utf-8")
+
+
+def _cached_json_response(request, body, etag):
+    """JSON response for pre-serialized bytes, answering 304 when fresh"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=body, content_type="application/json", headers=headers)
 
 
-# API Routes
 @PromptServer.instance.routes.get("/promptflow/presets")
+@instrumented("presets")
 async def get_presets(request):
-    """Get all built-in presets"""
+    """Get all presets (built-in and user)"""
     try:
-        presets = load_builtin_presets()
-        return web.json_response(presets)
+        body, etag = await IO_POOL.run(PRESET_STORE.serialized, key="presets")
+        return _cached_json_response(request, body, etag)
     except Exception as e:
         return web.json_response({"error": str(e)}, status=500)
 
 
 @PromptServer.instance.routes.get("/promptflow/presets/{preset_type}")
+@instrumented("presets.type")
 async def get_preset_type(request):
     """Get presets for a specific type (styles, quality, negatives)"""
     try:
         preset_type = request.match_info["preset_type"]
-        presets = load_builtin_presets()
+        serialized = await IO_POOL.run(
+            PRESET_STORE.serialized, preset_type, key=("presets", preset_type)
+        )
 
-        if preset_type not in presets:
+        if serialized is None:
             return web.json_response(
                 {"error": f"Unknown preset type: {preset_type}"}, status=404
             )
 
-        return web.json_response(presets[preset_type])
+        body, etag = serialized
+        return _cached_json_response(request, body, etag)
     except Exception as e:
         return web.json_response({"error": str(e)}, status=500)
 
@@ -281,106 +388,418 @@ async def get_preset_type(request):
 # ============================================================================
 
 
+# Serialized /promptflow/wildcards views, reused until the registry changes
+WILDCARD_LISTING = WildcardListing(
+    WILDCARD_REGISTRY,
+    directories={"local": WILDCARDS_DIR_LOCAL, "shared": WILDCARDS_DIR_SHARED},
+)
+
+
 @PromptServer.instance.routes.get("/promptflow/wildcards")
+@instrumented("wildcards.list")
 async def api_list_wildcards(request):
-    """List all available wildcards from both local and shared directories"""
+    """
+    List the available wildcards from all wildcard directories.
+
+    Without parameters every wildcard is listed. Query options:
+    fields (comma separated subset of name, source, path, file),
+    prefix (names starting with it), limit and cursor (pagination; pass
+    the previous page's next_cursor), tree (subfolders and wildcards
+    directly inside the prefix folder). Responses are gzip or brotli
+    compressed when the client accepts it.
+    """
     try:
-        wildcards = list_wildcards()
-        # Convert to list sorted by name
-        result = sorted(wildcards.values(), key=lambda x: x["name"])
-        return web.json_response(
-            {
-                "wildcards": result,
-                "directories": {
-                    "local": WILDCARDS_DIR_LOCAL,
-                    "shared": WILDCARDS_DIR_SHARED,
-                },
-            }
+        try:
+            view, params = wildcard_listing_params(request.query, parse_fields)
+        except ValueError as e:
+            return _bad_request(e)
+
+        encoding = accepted_encoding(request.headers.get("Accept-Encoding"))
+        body, etag, encoding = await IO_POOL.run(
+            WILDCARD_LISTING.serialized,
+            view,
+            encoding,
+            **params,
+            key=("wildcards", view, encoding, tuple(sorted(params.items()))),
+        )
+
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            return web.Response(status=304, headers=headers)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return web.Response(body=body, content_type="application/json", headers=headers)
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
+
+
+# Registered before the catch-all route below, which would match it too
+@PromptServer.instance.routes.get("/promptflow/wildcards/search")
+@instrumented("wildcards.search")
+async def api_search_wildcards(request):
+    """
+    Search wildcard names and option text.
+    Query: q, limit, offset, scope (all, names or contents), samples
+    (include the first matching option of content matches)
+    """
+    try:
+        try:
+            params = search_params(request.query)
+        except ValueError as e:
+            return _bad_request(e)
+
+        payload = await IO_POOL.run(
+            WILDCARD_SEARCH.search, *params, key=("search",) + params
         )
+        return web.json_response(payload)
     except Exception as e:
+        logger.exception("[PromptFlow] Wildcard search failed")
         return web.json_response({"error": str(e)}, status=500)
 
 
 @PromptServer.instance.routes.get("/promptflow/wildcards/{wildcard_name:.*}")
+@instrumented("wildcards.get")
 async def api_get_wildcard(request):
     """Get contents of a specific wildcard file"""
     try:
-        wildcard_name = request.match_info["wildcard_name"]
-        # Handle slash placeholder from frontend
-        wildcard_name = wildcard_name.replace("---SLASH---", "/")
+        wildcard_name = wildcard_name_from_url(request.match_info["wildcard_name"])
+        status, body = await IO_POOL.run(
+            _serialize_payload,
+            wildcard_contents_payload,
+            WILDCARD_REGISTRY,
+            wildcard_name,
+            key=("wildcard", wildcard_name),
+        )
+        return web.Response(body=body, status=status, content_type="application/json")
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
 
-        print(f"[PromptFlow] Getting wildcard: {wildcard_name}")
 
-        # Get wildcard info
-        wildcards = list_wildcards()
-        if wildcard_name not in wildcards:
-            print(f"[PromptFlow] Available wildcards: {list(wildcards.keys())}")
-            return web.json_response(
-                {"error": f"Wildcard '{wildcard_name}' not found"}, status=404
-            )
+@PromptServer.instance.routes.post("/promptflow/wildcards/batch")
+@instrumented("wildcards.batch")
+async def api_batch_wildcards(request):
+    """
+    Get the contents of several wildcards in one request.
 
-        options = get_wildcard_contents(wildcard_name)
-        if options is None:
-            return web.json_response(
-                {"error": f"Could not read wildcard '{wildcard_name}'"}, status=500
-            )
+    Body: "names" (list of wildcard names) and optional "sample"; when
+    "sample" is given only the option count and the first N options are
+    returned for each wildcard.
+    """
+    try:
+        try:
+            names, sample = batch_request(await request.json())
+        except ValueError as e:
+            return _bad_request(e)
 
-        print(f"[PromptFlow] Returning {len(options)} options for '{wildcard_name}'")
-        return web.json_response(
-            {
-                "name": wildcard_name,
-                "options": options,
-                "count": len(options),
-                "source": wildcards[wildcard_name]["source"],
-            }
+        payload = await IO_POOL.run(
+            wildcard_batch_payload, WILDCARD_REGISTRY, names, sample
         )
+        return web.json_response(payload)
     except Exception as e:
+        logger.exception("[PromptFlow] Wildcard batch request failed")
         return web.json_response({"error": str(e)}, status=500)
 
 
 @PromptServer.instance.routes.post("/promptflow/wildcards")
+@instrumented("wildcards.save")
 async def api_save_wildcard(request):
     """Save a new wildcard file"""
     try:
-        data = await request.json()
+        try:
+            name, options, overwrite = save_request(await request.json())
+        except ValueError as e:
+            return _bad_request(e)
 
-        name = data.get("name", "").strip()
-        options = data.get("options", [])
-        overwrite = data.get("overwrite", False)
+        result = await IO_POOL.run(save_wildcard, name, options, overwrite)
+        return web.json_response(result, status=200 if result["success"] else 400)
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
 
-        if not name:
-            return web.json_response({"error": "Wildcard name is required"}, status=400)
 
-        if not options or not isinstance(options, list):
-            return web.json_response(
-                {"error": "Options must be a non-empty list"}, status=400
-            )
+@PromptServer.instance.routes.delete("/promptflow/wildcards/{wildcard_name:.*}")
+@instrumented("wildcards.delete")
+async def api_delete_wildcard(request):
+    """Delete a wildcard file (local only)"""
+    try:
+        wildcard_name = request.match_info["wildcard_name"]
+        result = await IO_POOL.run(delete_wildcard, wildcard_name)
+        return web.json_response(result, status=200 if result["success"] else 400)
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
 
-        result = save_wildcard(name, options, overwrite)
 
-        if result["success"]:
-            return web.json_response(result)
-        else:
-            return web.json_response(result, status=400)
+# ============================================================================
+# RESOLVE API ROUTES
+# ============================================================================
+
 
+@PromptServer.instance.routes.post("/promptflow/resolve")
+@instrumented("resolve")
+async def api_resolve(request):
+    """
+    Resolve a template for many seeds in one request.
+
+    Body: either "widget_data" (PromptFlow widget JSON, as string or object,
+    plus optional "trigger_words" / "input_prompt") or a raw "prompt" with an
+    optional "mode" (fixed, random, increment, decrement, shuffle; default
+    random), together with "seeds" or "seed_range".
+    """
+    try:
+        try:
+            resolve_args, seeds = resolve_request(await request.json())
+        except ValueError as e:
+            return _bad_request(e)
+
+        results = await IO_POOL.run(resolve_seeds, PROMPT_ENGINE, resolve_args, seeds)
+        return web.json_response({"results": results, "count": len(results)})
     except Exception as e:
+        logger.exception("[PromptFlow] Resolve request failed")
         return web.json_response({"error": str(e)}, status=500)
 
 
-@PromptServer.instance.routes.delete("/promptflow/wildcards/{wildcard_name:.*}")
-async def api_delete_wildcard(request):
-    """Delete a wildcard file (local only)"""
+# ============================================================================
+# VARIATIONS API ROUTES
+# ============================================================================
+
+# Lines per write when streaming variations as NDJSON
+VARIATIONS_STREAM_CHUNK = 256
+
+# Bytes per read from an export process
+EXPORT_READ_SIZE = 256 * 1024
+
+
+async def _variations_response(request, params):
+    """Shared handler body for GET and POST /promptflow/variations"""
     try:
-        wildcard_name = request.match_info["wildcard_name"]
+        template = variations_template(params)
+        paging = variations_params(params)
+    except ValueError as e:
+        return _bad_request(e)
+    offset, limit, order = paging["offset"], paging["limit"], paging["order"]
+
+    space, missing = await IO_POOL.run(
+        variations_space, template, get_wildcard_contents
+    )
+    if not paging["stream"]:
+        payload = await IO_POOL.run(
+            variations_page_payload, template, space, missing, offset, limit, order
+        )
+        return web.json_response(payload)
+
+    # Streaming: NDJSON, one {"index", "prompt", "probability"} object per line
+    response = web.StreamResponse(
+        headers={"Content-Type": "application/x-ndjson; charset=utf-8"}
+    )
+    await response.prepare(request)
+    rows = variation_rows(space, offset, limit, order)
+
+    def next_chunk():
+        # Render the next chunk of lines on the pool (options may be on disk)
+        lines = [
+            json.dumps(row) for row in itertools.islice(rows, VARIATIONS_STREAM_CHUNK)
+        ]
+        return ("\n".join(lines) + "\n").encode("utf-8") if lines else None
+
+    while True:
+        chunk = await IO_POOL.run(next_chunk)
+        if chunk is None:
+            break
+        await response.write(chunk)
+
+    await response.write_eof()
+    return response
+
+
+@PromptServer.instance.routes.get("/promptflow/variations")
+@instrumented("variations")
+async def api_get_variations(request):
+    """
+    Page through the variations of a prompt by index.
+    Query: prompt, offset, limit, order (sequential or shuffle),
+    stream (NDJSON when true)
+    """
+    try:
+        return await _variations_response(request, dict(request.query))
+    except Exception as e:
+        logger.exception("[PromptFlow] Variations request failed")
+        return web.json_response({"error": str(e)}, status=500)
 
-        result = delete_wildcard(wildcard_name)
 
-        if result["success"]:
-            return web.json_response(result)
+@PromptServer.instance.routes.post("/promptflow/variations")
+@instrumented("variations")
+async def api_post_variations(request):
+    """
+    Same as GET, with the parameters in a JSON body. Accepts either
+    "prompt" or "widget_data" (PromptFlow widget JSON).
+    """
+    try:
+        try:
+            params = json_object(await request.json())
+        except ValueError as e:
+            return _bad_request(e)
+        return await _variations_response(request, params)
+    except Exception as e:
+        logger.exception("[PromptFlow] Variations request failed")
+        return web.json_response({"error": str(e)}, status=500)
+
+
+@PromptServer.instance.routes.get("/promptflow/variations/export")
+@instrumented("variations_export")
+async def api_export_variations(request):
+    """
+    Download every variation of a prompt as JSONL or CSV.
+    Query: prompt or widget_data, format (jsonl or csv), start, stop,
+    order, key, workers (processes rendering index ranges in parallel)
+
+    The rows are rendered by a separate `python -m core.export` process,
+    which shards the index range over its own process pool, so large
+    exports neither block the event loop nor fork the ComfyUI server.
+    """
+    try:
+        params = dict(request.query)
+        try:
+            command, fmt = export_command(
+                variations_template(params),
+                params,
+                get_wildcard_dirs(),
+                os.path.join(CACHE_DIR, "line_index"),
+            )
+        except ValueError as e:
+            return _bad_request(e)
+
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            cwd=EXTENSION_DIR,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        # Drained concurrently: a full stderr pipe would block the exporter
+        stderr = asyncio.ensure_future(process.stderr.read())
+        try:
+            chunk = await process.stdout.read(EXPORT_READ_SIZE)
+            if not chunk:
+                returncode = await process.wait()
+                if returncode != 0:
+                    message = export_error(await stderr, returncode)
+                    return web.json_response({"error": message}, status=500)
+
+            response = web.StreamResponse(
+                headers={
+                    "Content-Type": CONTENT_TYPES[fmt],
+                    "Content-Disposition": (
+                        f'attachment; filename="promptflow_variations.{fmt}"'
+                    ),
+                }
+            )
+            await response.prepare(request)
+            while chunk:
+                await response.write(chunk)
+                chunk = await process.stdout.read(EXPORT_READ_SIZE)
+            await response.write_eof()
+            returncode = await process.wait()
+            if returncode != 0:
+                # Headers are already sent: the download ends short
+                logger.error(
+                    "[PromptFlow] Export failed: %s",
+                    export_error(await stderr, returncode),
+                )
+            return response
+        finally:
+            # Client went away (or the handler failed): stop the export
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            if not stderr.done():
+                stderr.cancel()
+    except Exception as e:
+        logger.exception("[PromptFlow] Variation export failed")
+        return web.json_response({"error": str(e)}, status=500)
+
+
+# ============================================================================
+# AUTO-CATEGORIZE API ROUTE
+# ============================================================================
+
+
+def get_category_keywords_path():
+    """
+    User keyword tables for auto-categorize:
+    ComfyUI/user/promptflow/categories.json ({category: [keywords]})
+    """
+    if not hasattr(folder_paths, "get_user_directory"):
+        return None
+    return os.path.join(
+        folder_paths.get_user_directory(), "promptflow", "categories.json"
+    )
+
+
+# Compiled default categorizer, rebuilt when the user keyword file changes
+CATEGORIZER = CategorizerCache(
+    get_category_keywords_path,
+    on_error=lambda path, e: logger.error("[PromptFlow] Error loading %s: %s", path, e),
+)
+
+
+@PromptServer.instance.routes.post("/promptflow/categorize")
+@instrumented("categorize")
+async def api_categorize(request):
+    """
+    Sort the tags of prompts into PromptFlow fields, like the widget's
+    Auto-Sort.
+
+    Body: "prompts" (list of strings) or "prompt", optional "mode"
+    ("extended" or "simple") and "keywords" ({category: [keywords]} added
+    to the tables for this request). Returns one {"categories",
+    "widget_data"} result per prompt.
+    """
+    try:
+        try:
+            prompts, mode, keywords = categorize_request(await request.json())
+            results = await IO_POOL.run(CATEGORIZER.categorize, prompts, mode, keywords)
+        except ValueError as e:
+            return _bad_request(e)
+        return web.json_response({"mode": mode, "results": results})
+    except Exception as e:
+        logger.exception("[PromptFlow] Categorize request failed")
+        return web.json_response({"error": str(e)}, status=500)
+
+
+# ============================================================================
+# STATS API ROUTE
+# ============================================================================
+
+
+@PromptServer.instance.routes.get("/promptflow/stats")
+async def api_stats(request):
+    """
+    Timers, counters, cache hit ratios and gauges of PromptFlow's hot paths.
+    Query: format=prometheus for the Prometheus text format (also used when
+    the Accept header asks for text/plain); reset=true zeroes the counters
+    after reading them.
+    """
+    try:
+        output = request.query.get("format")
+        if output is None and "text/plain" in request.headers.get("Accept", ""):
+            output = "prometheus"
+
+        if output == "prometheus":
+            response = web.Response(
+                body=METRICS.prometheus().encode("utf-8"),
+                headers={
+                    "Content-Type": "text/plain; version=0.0.4; charset=utf-8",
+                    "Cache-Control": "no-cache",
+                },
+            )
         else:
-            return web.json_response(result, status=400)
+            response = web.json_response(
+                METRICS.snapshot(), headers={"Cache-Control": "no-cache"}
+            )
 
+        if is_truthy(request.query.get("reset", False)):
+            METRICS.reset()
+        return response
     except Exception as e:
+        logger.exception("[PromptFlow] Stats request failed")
         return web.json_response({"error": str(e)}, status=500)
 
 
@@ -388,4 +807,4 @@ async def api_delete_wildcard(request):
 __version__ = "1.0.0"
 __all__ = ["NODE_CLASS_MAPPINGS", "NODE_DISPLAY_NAME_MAPPINGS", "WEB_DIRECTORY"]
 
-print(f"[PromptFlow] v{__version__} loaded successfully")
+logger.info("[PromptFlow] v%s loaded successfully", __version__)
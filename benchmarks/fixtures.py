@@ -0,0 +1,209 @@
+"""
+PromptFlow Benchmark Fixtures
+Deterministic synthetic wildcard trees, large wildcard files and templates
+"""
+
+import json
+import os
+import random
+import sys
+
+WORDS = [
+    "red",
+    "blue",
+    "green",
+    "silver",
+    "golden",
+    "dark",
+    "light",
+    "soft",
+    "sharp",
+    "cinematic",
+    "portrait",
+    "forest",
+    "city",
+    "beach",
+    "castle",
+    "night",
+    "morning",
+    "rain",
+    "snow",
+    "dress",
+    "armor",
+    "jacket",
+    "smile",
+    "glance",
+    "standing",
+    "sitting",
+    "running",
+    "detailed",
+    "intricate",
+    "glowing",
+    "misty",
+]
+
+# Files per generated directory
+FILES_PER_DIR = 100
+
+
+def _phrase(rng, words=3):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def tree_dir(workdir, files):
+    return os.path.join(workdir, f"tree_{files}")
+
+
+def wildcard_name(index):
+    """Name of the index-th file in a generated tree"""
+    return f"bench/d{index // FILES_PER_DIR:03d}/f{index:05d}"
+
+
+def make_tree(workdir, files, lines_per_file=20, seed=0):
+    """
+    Generate a wildcard tree with ``files`` files of ``lines_per_file``
+    options, plus a few nested/weighted files under ``nested/``.
+    Existing trees are reused.
+
+    Returns:
+        Root directory of the tree
+    """
+    root = tree_dir(workdir, files)
+    marker = os.path.join(root, ".complete")
+    if os.path.exists(marker):
+        return root
+
+    rng = random.Random(seed)
+    for index in range(files):
+        path = os.path.join(root, wildcard_name(index) + ".txt")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("# generated\n")
+            f.writelines(_phrase(rng) + "\n" for _ in range(lines_per_file))
+
+    nested = os.path.join(root, "nested")
+    os.makedirs(nested, exist_ok=True)
+    with open(os.path.join(nested, "outfit.txt"), "w", encoding="utf-8") as f:
+        f.write("{red|blue|{dark|light} green} dress\n")
+        f.write(f"__{wildcard_name(0)}__ jacket\n")
+        f.write("3::plain armor\n")
+    with open(os.path.join(nested, "scene.txt"), "w", encoding="utf-8") as f:
+        f.write("__nested/outfit__ in a {forest|city}\n")
+        f.write("2::__nested/outfit__ at night\n")
+
+    with open(marker, "w") as f:
+        f.write("ok")
+    return root
+
+
+def bundle_path(workdir, files):
+    return os.path.join(workdir, f"tree_{files}.pfw")
+
+
+def make_bundle(workdir, files, compress=False):
+    """
+    Pack the generated tree with ``files`` files into a wildcard bundle.
+    Existing bundles are reused.
+
+    Returns:
+        Path of the bundle
+    """
+    path = bundle_path(workdir, files)
+    if compress:
+        path = path[: -len(".pfw")] + ".z.pfw"
+    if os.path.exists(path):
+        return path
+
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if repo_dir not in sys.path:
+        sys.path.insert(0, repo_dir)
+    from core.bundle import build_bundle
+
+    build_bundle(make_tree(workdir, files), path, compress=compress)
+    return path
+
+
+def make_line_file(workdir, lines, seed=0):
+    """
+    Generate a single wildcard file with ``lines`` options in its own
+    directory. Existing files are reused.
+
+    Returns:
+        Directory containing big.txt
+    """
+    directory = os.path.join(workdir, f"lines_{lines}")
+    path = os.path.join(directory, "big.txt")
+    if os.path.exists(path):
+        return directory
+
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        chunk = []
+        for _ in range(lines):
+            chunk.append(_phrase(rng))
+            if len(chunk) >= 10000:
+                f.write("\n".join(chunk) + "\n")
+                chunk = []
+        if chunk:
+            f.write("\n".join(chunk) + "\n")
+    os.replace(tmp, path)
+    return directory
+
+
+def make_template(density, files, seed=0):
+    """
+    Build a comma separated prompt of 20 tags where ``density`` of them are
+    wildcards (alternating inline groups and file wildcards from a tree
+    with ``files`` files). density="nested" uses nested choices and
+    wildcard files that reference other wildcards.
+    """
+    rng = random.Random(seed)
+    if density == "nested":
+        return ", ".join(
+            [
+                "masterpiece",
+                "{1girl|{2|3}girls}",
+                "__nested/scene__",
+                "{smiling|{soft|wide} smile}",
+                "__nested/outfit__",
+            ]
+            + [_phrase(rng, 2) for _ in range(15)]
+        )
+
+    tags = []
+    for i in range(20):
+        if i < density and i % 2 == 0:
+            tags.append("{" + "|".join(_phrase(rng, 2) for _ in range(4)) + "}")
+        elif i < density:
+            tags.append(f"__{wildcard_name(rng.randrange(files))}__")
+        else:
+            tags.append(_phrase(rng, 2))
+    return ", ".join(tags)
+
+
+def make_widget_data(template, mode="random"):
+    """Spread a template over the extended-mode fields of a widget_data JSON"""
+    fields = ["subject", "character", "outfit", "pose", "location"]
+    tags = template.split(", ")
+    per_field = max(1, len(tags) // len(fields))
+    categories = {}
+    for i, field in enumerate(fields):
+        part = tags[i * per_field : (i + 1) * per_field]
+        if i == len(fields) - 1:
+            part = tags[i * per_field :]
+        categories[field] = {"value": ", ".join(part), "mode": mode}
+    return json.dumps(
+        {"mode": "extended", "categories": categories, "negative": "blurry, lowres"}
+    )
+
+
+def make_messy_prompt(tags, seed=0):
+    """A prompt with stray commas and whitespace for the cleanup benchmark"""
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(tags):
+        parts.append(_phrase(rng, 2))
+        parts.append(rng.choice([", ", " ,, ", ",  ,", "  ,", ", , "]))
+    return "  ," + "".join(parts) + " , "
@@ -0,0 +1,143 @@
+"""
+PromptFlow Auto-Categorize Golden Corpus
+Checks that core.categorize reproduces the widget's autoCategorize()
+(promptflow_widget.js) on a fixed corpus of prompts.
+
+Usage:
+    python benchmarks/golden_categorize.py               # verify
+    python benchmarks/golden_categorize.py --regenerate  # rerun the JS (needs node)
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+CORPUS_PATH = os.path.join(BENCH_DIR, "golden", "categorize.json")
+WIDGET_JS = os.path.join(REPO_DIR, "web", "comfyui", "promptflow_widget.js")
+TAG_DATABASE_JSON = os.path.join(REPO_DIR, "web", "comfyui", "tag_database.json")
+
+# autoCategorize() and its helpers; the keyword tables are fetched by the
+# widget, so they are inlined from the JSON file instead
+JS_START = "// Normalize text for matching"
+JS_END = "// PRESET STORAGE"
+
+# Tag material: keyword hits, near misses, pieces of keywords, odd input
+PIECES = [
+    "1girl", "woman", "cat ears", "catgirl", "blue_eyes", "Blue-Eyes",
+    "long hair", "smiling", "open_mouth", "t-shirt", "t shirt", "school uniform",
+    "standing", "looking at viewer", "from_behind", "simple background",
+    "night sky", "sci-fi", "Cyberpunk city", "oil painting", "3D render",
+    "close-up", "closeup", "bird's eye view", "depth of field", "85mm",
+    "rim lighting", "golden hour", "neon lights", "masterpiece", "best quality",
+    "8k", "UHD", "award-winning", "intricate details", "a", "e", "ar", "ight",
+    "xyz", "(masterpiece:1.2)", "<lora:foo:0.8>", "__wildcard__", "{red|blue}",
+    "日本", "ÉLÉGANT dress", " padded ", "  spaced  out  ", "_", "-",
+    "hd", "shd", "man", "Mannequin", "dog", "hotdog", "bar", "barefoot",
+]  # fmt: skip
+SEPARATORS = [", ", ",", " , ", ";", "; ", ",,", ", ;", ",\n", " ,, "]
+
+EDGE_CASES = [
+    "",
+    " ",
+    ",",
+    ";;;",
+    "a",
+    "woman",
+    "man, woman, Woman",
+    "_, -, __",
+    "\ufeffwoman\ufeff,\u3000 hd ",
+    "masterpiece; best quality, 1girl, smiling",
+]
+
+
+def build_inputs(count=500, seed=0):
+    """(text, mode) pairs: edge cases plus random tag soups"""
+    rng = random.Random(seed)
+    texts = list(EDGE_CASES)
+    for _ in range(count):
+        tags = [rng.choice(PIECES) for _tag in range(rng.randint(1, 12))]
+        text = ""
+        for tag in tags:
+            text += tag + rng.choice(SEPARATORS)
+        texts.append(text)
+    modes = ["extended", "extended", "extended", "simple"]
+    return [(text, modes[i % len(modes)]) for i, text in enumerate(texts)]
+
+
+def run_widget_js(inputs):
+    """Run the widget's autoCategorize() under node on (text, mode) pairs"""
+    with open(WIDGET_JS, encoding="utf-8") as f:
+        source = f.read()
+    start = source.index(JS_START)
+    end = source.index(JS_END, start)
+    code = source[start:end].rsplit("// ====", 1)[0]
+    with open(TAG_DATABASE_JSON, encoding="utf-8") as f:
+        tables = f.read()
+    program = (
+        f"const TAG_DATABASE = {tables};\n"
+        + code
+        + "\nconst inputs = JSON.parse(require('fs').readFileSync(0, 'utf8'));"
+        + "\nprocess.stdout.write(JSON.stringify("
+        + "inputs.map(([text, mode]) => autoCategorize(text, mode))));\n"
+    )
+    output = subprocess.run(
+        ["node", "-e", program],
+        input=json.dumps(inputs).encode("utf-8"),
+        capture_output=True,
+        check=True,
+    )
+    return json.loads(output.stdout)
+
+
+def verify(corpus):
+    """Return the cases where core.categorize differs from the widget"""
+    sys.path.insert(0, REPO_DIR)
+    from core.categorize import Categorizer
+
+    categorizer = Categorizer()
+    failures = []
+    for case in corpus:
+        got = categorizer.categorize(case["text"], case["mode"])
+        if got != case["expected"]:
+            failures.append((case, got))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Auto-categorize golden corpus")
+    parser.add_argument("--regenerate", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.regenerate:
+        inputs = build_inputs()
+        expected = run_widget_js(inputs)
+        corpus = [
+            {"text": text, "mode": mode, "expected": result}
+            for (text, mode), result in zip(inputs, expected)
+        ]
+        os.makedirs(os.path.dirname(CORPUS_PATH), exist_ok=True)
+        with open(CORPUS_PATH, "w", encoding="utf-8") as f:
+            json.dump(corpus, f, indent=1, ensure_ascii=True)
+            f.write("\n")
+        print(f"Wrote {len(corpus)} cases to {CORPUS_PATH}")
+        return 0
+
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        corpus = json.load(f)
+    failures = verify(corpus)
+    for case, got in failures[:10]:
+        print(f"MISMATCH {case['text']!r} ({case['mode']})")
+        for category, tags in case["expected"].items():
+            if got.get(category) != tags:
+                print(f"  {category}: expected {tags!r}, got {got.get(category)!r}")
+    print(f"{len(corpus) - len(failures)}/{len(corpus)} cases identical")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
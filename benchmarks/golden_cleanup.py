@@ -0,0 +1,138 @@
+"""
+PromptFlow Cleanup Golden Corpus
+Checks that prompt cleanup (core.templates.cleanup_prompt / cleanup_join)
+produces byte-identical output to the original four-regex implementation
+on a fixed corpus of prompts.
+
+Usage:
+    python benchmarks/golden_cleanup.py               # verify
+    python benchmarks/golden_cleanup.py --regenerate  # rewrite the corpus
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+CORPUS_PATH = os.path.join(BENCH_DIR, "golden", "cleanup.json")
+
+# Whitespace the regex \s and str.split() both know about, ASCII and not
+WHITESPACE = [" ", "  ", "\t", "\n", "\r\n", "\x0b", "\x0c", "\x1c", "\xa0", " ", "　"]
+PIECES = [
+    "cat",
+    "1girl",
+    "red dress",
+    "(masterpiece:1.2)",
+    "日本",
+    "a.b",
+    "x\u200by",  # zero-width space is not whitespace
+    ",",
+    ", ",
+    " ,",
+    ",,",
+    ", ,",
+    " , , ",
+    ",\n,",
+]
+
+EDGE_CASES = [
+    "",
+    " ",
+    ",",
+    ", , ,",
+    "a",
+    " a ",
+    "a,b",
+    "a ,b",
+    "a, ,b",
+    "a,,b",
+    ",a,",
+    "a  b",
+    "a\t\tb",
+    "a\n,\nb",
+    "\xa0a\xa0,\xa0b\xa0",
+    "a,　,b",
+    "trig, input, a {x|y}, , , c",
+]
+
+
+def reference_cleanup(text):
+    """The original cleanup: four regex passes"""
+    if not text:
+        return text
+    text = re.sub(r",(\s*,)+", ",", text)
+    text = re.sub(r"^[\s,]+|[\s,]+$", "", text)
+    text = re.sub(r"\s*,\s*", ", ", text)
+    text = re.sub(r"\s+", " ", text)
+    return text.strip()
+
+
+def build_corpus(count=600, seed=0):
+    """
+    Cases of {"parts": [...], "expected": ...}; the input prompt is the
+    parts joined with ", " (as the node joins trigger words, input prompt
+    and fields)
+    """
+    rng = random.Random(seed)
+    cases = [[text] for text in EDGE_CASES]
+    for _ in range(count):
+        parts = []
+        for _part in range(rng.randint(1, 5)):
+            tokens = []
+            for _token in range(rng.randint(0, 8)):
+                tokens.append(rng.choice(PIECES if rng.random() < 0.6 else WHITESPACE))
+            parts.append("".join(tokens))
+        cases.append(parts)
+    return [
+        {"parts": parts, "expected": reference_cleanup(", ".join(parts))}
+        for parts in cases
+    ]
+
+
+def verify(corpus):
+    """Return the cases where the current implementation differs"""
+    sys.path.insert(0, REPO_DIR)
+    from core.templates import cleanup_join, cleanup_prompt
+
+    failures = []
+    for case in corpus:
+        joined = ", ".join(case["parts"])
+        got_prompt = cleanup_prompt(joined)
+        got_join = cleanup_join(case["parts"])
+        if got_prompt != case["expected"] or got_join != case["expected"]:
+            failures.append((case, got_prompt, got_join))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prompt cleanup golden corpus")
+    parser.add_argument("--regenerate", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.regenerate:
+        os.makedirs(os.path.dirname(CORPUS_PATH), exist_ok=True)
+        corpus = build_corpus()
+        with open(CORPUS_PATH, "w", encoding="utf-8") as f:
+            json.dump(corpus, f, indent=1, ensure_ascii=True)
+            f.write("\n")
+        print(f"Wrote {len(corpus)} cases to {CORPUS_PATH}")
+        return 0
+
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        corpus = json.load(f)
+    failures = verify(corpus)
+    for case, got_prompt, got_join in failures[:10]:
+        print(f"MISMATCH {case['parts']!r}")
+        print(f"  expected     {case['expected']!r}")
+        print(f"  cleanup      {got_prompt!r}")
+        print(f"  cleanup_join {got_join!r}")
+    print(f"{len(corpus) - len(failures)}/{len(corpus)} cases identical")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+PromptFlow Import Time
+Measures how long importing PromptFlow takes in fresh interpreters: the
+ComfyUI-independent core engine alone, and the whole extension (with the
+benchmark stubs standing in for ComfyUI).
+
+Usage:
+    python benchmarks/import_time.py                  # median of 10 runs
+    python benchmarks/import_time.py --detail         # slowest modules
+    python benchmarks/import_time.py --max-ms 150     # exit 1 when slower
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+# Each snippet prints the milliseconds its import took
+TARGETS = {
+    "core.engine": (
+        "import sys, time\n"
+        "sys.path.insert(0, {repo!r})\n"
+        "t = time.perf_counter()\n"
+        "import core.engine\n"
+        "print((time.perf_counter() - t) * 1000)\n"
+    ),
+    "extension": (
+        "import sys, time\n"
+        "sys.path.insert(0, {bench!r})\n"
+        "import stubs\n"
+        "stubs.install_stubs({comfy!r})\n"
+        "t = time.perf_counter()\n"
+        "stubs.load_promptflow({repo!r})\n"
+        "print((time.perf_counter() - t) * 1000)\n"
+    ),
+}
+
+
+def _snippet(target, comfy_dir):
+    return TARGETS[target].format(repo=REPO_DIR, bench=BENCH_DIR, comfy=comfy_dir)
+
+
+def measure(target, runs, comfy_dir):
+    """Import times of target in milliseconds, one per fresh interpreter"""
+    code = _snippet(target, comfy_dir)
+    env = dict(os.environ, PROMPTFLOW_WATCH="0")
+    times = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        times.append(float(out.strip().splitlines()[-1]))
+    return times
+
+
+def detail(target, comfy_dir, top=15):
+    """Modules with the largest cumulative import time (-X importtime)"""
+    env = dict(os.environ, PROMPTFLOW_WATCH="0")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _snippet(target, comfy_dir)],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        self_us = int(parts[0].split(":")[1])
+        rows.append((int(parts[1]), self_us, parts[2].rstrip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PromptFlow import time")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--target", choices=sorted(TARGETS), action="append")
+    parser.add_argument("--detail", action="store_true", help="Slowest modules")
+    parser.add_argument(
+        "--max-ms", type=float, help="Fail if the extension's median is slower"
+    )
+    args = parser.parse_args(argv)
+
+    comfy_dir = os.path.join(tempfile.gettempdir(), "promptflow-bench", "comfy")
+    targets = args.target or list(TARGETS)
+    slow = False
+    for target in targets:
+        times = measure(target, args.runs, comfy_dir)
+        median = statistics.median(times)
+        print(
+            f"  {target:<12} median {median:7.1f} ms"
+            f"  min {min(times):7.1f} ms  max {max(times):7.1f} ms"
+        )
+        if args.max_ms is not None and target == "extension":
+            slow = median > args.max_ms
+        if args.detail:
+            print(f"    {'cumulative':>10} {'self':>8}  module")
+            for cumulative, self_us, module in detail(target, comfy_dir):
+                print(
+                    f"    {cumulative / 1000:8.1f}ms {self_us / 1000:6.1f}ms {module}"
+                )
+
+    if slow:
+        print(f"Extension import is slower than {args.max_ms} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
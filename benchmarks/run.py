@@ -0,0 +1,479 @@
+"""
+PromptFlow Benchmarks
+Times the hot paths (prompt resolution, wildcard discovery and loading,
+prompt cleanup, variations) on synthetic wildcard trees and compares the
+results against a stored baseline.
+
+Each benchmark runs in its own Python process, so caches start cold and the
+reported peak RSS belongs to that benchmark alone.
+
+Usage:
+    python benchmarks/run.py                   # quick profile, compare
+    python benchmarks/run.py --profile full    # 50k-file trees, 1M-line files
+    python benchmarks/run.py --filter resolve  # names containing "resolve"
+    python benchmarks/run.py --record          # store results as baseline
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+
+import fixtures
+import stubs
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+PROFILES = {
+    "quick": {"trees": [10, 1000], "lines": [10, 10000]},
+    "full": {"trees": [10, 1000, 50000], "lines": [10, 10000, 1000000]},
+}
+
+# Tree used by the resolution and variations benchmarks
+RESOLVE_TREE = 1000
+
+DENSITIES = [1, 5, 20, "nested"]
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), "promptflow-bench")
+
+
+# ============================================================================
+# BENCHMARK DEFINITIONS
+# ============================================================================
+
+
+class Context:
+    """What a benchmark setup gets: the loaded package and fixture paths"""
+
+    def __init__(self, pf, workdir):
+        self.pf = pf
+        self.workdir = workdir
+        self.tmp = tempfile.mkdtemp(prefix="run-", dir=workdir)
+
+    def registry(self, root, cache_path=None, index_dir=None, **kwargs):
+        """A fresh WildcardRegistry over one fixture directory"""
+        return self.pf.WildcardRegistry(
+            lambda: [("bench", root)],
+            check_interval=3600,
+            index_dir=index_dir,
+            cache_path=cache_path,
+            **kwargs,
+        )
+
+    def use_registry(self, registry):
+        """Make the package-level wildcard functions and the nodes use registry"""
+        self.pf.WILDCARD_REGISTRY = registry
+        self.pf.PROMPT_ENGINE.registry = registry
+        return registry
+
+
+def _seeds():
+    return itertools.count()
+
+
+def bench_process(ctx, density, mode="random"):
+    ctx.use_registry(ctx.registry(fixtures.tree_dir(ctx.workdir, RESOLVE_TREE)))
+    node = ctx.pf.PromptFlowCore()
+    widget_data = fixtures.make_widget_data(
+        fixtures.make_template(density, RESOLVE_TREE), mode
+    )
+    seeds = _seeds()
+    return lambda: node.process(widget_data, next(seeds))
+
+
+def bench_process_wildcards(ctx, density):
+    ctx.use_registry(ctx.registry(fixtures.tree_dir(ctx.workdir, RESOLVE_TREE)))
+    node = ctx.pf.PromptFlowCore()
+    template = fixtures.make_template(density, RESOLVE_TREE)
+    seeds = _seeds()
+
+    def op():
+        seed = next(seeds)
+        return node._process_wildcards(template, "random", random.Random(seed), seed)
+
+    return op
+
+
+def bench_cleanup(ctx, tags):
+    node = ctx.pf.PromptFlowCore()
+    text = fixtures.make_messy_prompt(tags)
+    return lambda: node._cleanup_prompt(text)
+
+
+def bench_cold_scan(ctx, files):
+    root = fixtures.tree_dir(ctx.workdir, files)
+    return lambda: ctx.registry(root).entries()
+
+
+def bench_snapshot_load(ctx, files):
+    root = fixtures.tree_dir(ctx.workdir, files)
+    cache_path = os.path.join(ctx.tmp, "wildcards.cache")
+    warm = ctx.registry(root, cache_path=cache_path)
+    warm.entries()
+    warm.get_options(fixtures.wildcard_name(0))
+    warm.flush()
+    return lambda: ctx.registry(root, cache_path=cache_path).entries()
+
+
+def bench_list_wildcards(ctx, files):
+    ctx.use_registry(ctx.registry(fixtures.tree_dir(ctx.workdir, files)))
+    ctx.pf.list_wildcards()
+    return ctx.pf.list_wildcards
+
+
+def bench_contents_cold(ctx, lines):
+    root = fixtures.make_line_file(ctx.workdir, lines)
+    return lambda: ctx.registry(root).get_options("big")
+
+
+def bench_contents_indexed(ctx, lines):
+    # Every file is served through a line index loaded from its sidecar
+    root = fixtures.make_line_file(ctx.workdir, lines)
+    index_dir = os.path.join(ctx.tmp, "line_index")
+    ctx.registry(root, index_dir=index_dir, large_file_threshold=0).get_options("big")
+    return lambda: ctx.registry(
+        root, index_dir=index_dir, large_file_threshold=0
+    ).get_options("big")
+
+
+def bench_contents_get(ctx, lines):
+    ctx.use_registry(ctx.registry(fixtures.make_line_file(ctx.workdir, lines)))
+    ctx.pf.get_wildcard_contents("big")
+    return lambda: ctx.pf.get_wildcard_contents("big")
+
+
+def bench_contents_pick(ctx, lines):
+    ctx.use_registry(ctx.registry(fixtures.make_line_file(ctx.workdir, lines)))
+    node = ctx.pf.PromptFlowCore()
+    seeds = _seeds()
+    return lambda: node.resolve_prompt("a __big__ b", next(seeds))
+
+
+def bench_variations_extract(ctx, density):
+    node = ctx.pf.PromptFlowVariations()
+    template = fixtures.make_template(density, RESOLVE_TREE)
+    return lambda: node._extract_wildcards(template)
+
+
+def bench_variations_process(ctx, density):
+    ctx.use_registry(ctx.registry(fixtures.tree_dir(ctx.workdir, RESOLVE_TREE)))
+    node = ctx.pf.PromptFlowVariations()
+    template = fixtures.make_template(density, RESOLVE_TREE)
+    seeds = _seeds()
+    return lambda: node.process(template, next(seeds))
+
+
+def bench_bundle_scan(ctx, files, compress=False):
+    path = fixtures.make_bundle(ctx.workdir, files, compress)
+    return lambda: ctx.registry(path).entries()
+
+
+def bench_bundle_get(ctx, files, compress=False):
+    registry = ctx.registry(fixtures.make_bundle(ctx.workdir, files, compress))
+    registry.entries()
+    names = itertools.cycle(fixtures.wildcard_name(i) for i in range(files))
+    return lambda: registry.get_options(next(names))[0]
+
+
+def build_benchmarks(profile):
+    """
+    All benchmarks of a profile as {name: (setup, kwargs, max_iterations)}.
+    setup(ctx, **kwargs) returns the zero-argument callable that is timed.
+    """
+    sizes = PROFILES[profile]
+    benches = {}
+
+    def add(name, setup, max_iterations=100000, **kwargs):
+        benches[name] = (setup, kwargs, max_iterations)
+
+    for density in DENSITIES:
+        add(f"resolve.process.{density}", bench_process, density=density)
+        add(
+            f"resolve.process_wildcards.{density}",
+            bench_process_wildcards,
+            density=density,
+        )
+        add(f"variations.extract.{density}", bench_variations_extract, density=density)
+        add(f"variations.process.{density}", bench_variations_process, density=density)
+    add("resolve.process.shuffle.5", bench_process, density=5, mode="shuffle")
+
+    for tags in (20, 500):
+        add(f"cleanup.{tags}", bench_cleanup, tags=tags)
+
+    for files in sizes["trees"]:
+        cold_iterations = max(3, 20000 // files)
+        add(
+            f"discovery.cold_scan.{files}",
+            bench_cold_scan,
+            cold_iterations,
+            files=files,
+        )
+        add(
+            f"discovery.snapshot_load.{files}",
+            bench_snapshot_load,
+            cold_iterations,
+            files=files,
+        )
+        add(f"discovery.list_wildcards.{files}", bench_list_wildcards, files=files)
+        add(f"bundle.scan.{files}", bench_bundle_scan, cold_iterations, files=files)
+        add(f"bundle.get.{files}", bench_bundle_get, files=files)
+        add(f"bundle.get_zlib.{files}", bench_bundle_get, files=files, compress=True)
+
+    for lines in sizes["lines"]:
+        cold_iterations = max(3, 2000000 // lines)
+        add(f"contents.cold.{lines}", bench_contents_cold, cold_iterations, lines=lines)
+        add(
+            f"contents.indexed_load.{lines}",
+            bench_contents_indexed,
+            cold_iterations,
+            lines=lines,
+        )
+        add(f"contents.get.{lines}", bench_contents_get, lines=lines)
+        add(f"contents.pick.{lines}", bench_contents_pick, lines=lines)
+
+    return benches
+
+
+# ============================================================================
+# MEASUREMENT
+# ============================================================================
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def measure(op, min_time, max_iterations, warmup=3):
+    """Time op() repeatedly; return throughput and latency percentiles"""
+    for _ in range(min(warmup, max_iterations)):
+        op()
+
+    samples = []
+    started = time.perf_counter()
+    while True:
+        t0 = time.perf_counter_ns()
+        op()
+        samples.append(time.perf_counter_ns() - t0)
+        if len(samples) >= max_iterations:
+            break
+        if len(samples) >= 5 and time.perf_counter() - started >= min_time:
+            break
+
+    samples.sort()
+    total_s = sum(samples) / 1e9
+    return {
+        "iterations": len(samples),
+        "ops_per_sec": len(samples) / total_s if total_s else None,
+        "p50_us": _percentile(samples, 0.50) / 1000,
+        "p99_us": _percentile(samples, 0.99) / 1000,
+    }
+
+
+def run_child(name, profile, workdir, output, min_time):
+    """Run one benchmark in this process and write its metrics to output"""
+    setup, kwargs, max_iterations = build_benchmarks(profile)[name]
+    stubs.install_stubs(os.path.join(workdir, "comfy"))
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        pf = stubs.load_promptflow(REPO_DIR)
+        ctx = Context(pf, workdir)
+        op = setup(ctx, **kwargs)
+        metrics = measure(op, min_time, max_iterations)
+
+    metrics["peak_rss_mb"] = _peak_rss_mb()
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(metrics, f)
+
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+
+
+def prepare_fixtures(profile, workdir):
+    sizes = PROFILES[profile]
+    for files in sorted(set(sizes["trees"]) | {RESOLVE_TREE}):
+        print(f"  wildcard tree: {files} files")
+        fixtures.make_tree(workdir, files)
+        fixtures.make_bundle(workdir, files)
+        fixtures.make_bundle(workdir, files, compress=True)
+    for lines in sizes["lines"]:
+        print(f"  wildcard file: {lines} lines")
+        fixtures.make_line_file(workdir, lines)
+
+
+def run_all(names, profile, workdir, min_time):
+    results = {}
+    for name in names:
+        fd, output = tempfile.mkstemp(suffix=".json", dir=workdir)
+        os.close(fd)
+        cmd = [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--child",
+            name,
+            "--profile",
+            profile,
+            "--workdir",
+            workdir,
+            "--output",
+            output,
+            "--min-time",
+            str(min_time),
+        ]
+        proc = subprocess.run(cmd, stderr=subprocess.PIPE, text=True, check=False)
+        try:
+            if proc.returncode != 0:
+                print(f"  {name}: FAILED\n{proc.stderr}")
+                continue
+            with open(output, encoding="utf-8") as f:
+                results[name] = json.load(f)
+        finally:
+            os.remove(output)
+        print(format_row(name, results[name]))
+    return results
+
+
+def format_row(name, metrics, baseline=None):
+    rss = metrics.get("peak_rss_mb")
+    row = (
+        f"  {name:<38} {metrics['ops_per_sec']:>12.1f}/s"
+        f"  p50 {metrics['p50_us']:>11.1f}us  p99 {metrics['p99_us']:>11.1f}us"
+    )
+    if rss is not None:
+        row += f"  rss {rss:>7.1f}MB"
+    if baseline:
+        change = metrics["p50_us"] / baseline["p50_us"] - 1 if baseline["p50_us"] else 0
+        row += f"  p50 {change:+.1%}"
+    return row
+
+
+def compare(results, baseline, tolerance):
+    """Return benchmark names whose p50 latency and throughput regressed"""
+    regressions = []
+    print("\nCompared with baseline (p50 latency change):")
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"  {name:<38} (new)")
+            continue
+        print(format_row(name, metrics, base))
+        slower = metrics["p50_us"] > base["p50_us"] * (1 + tolerance)
+        fewer = metrics["ops_per_sec"] < base["ops_per_sec"] / (1 + tolerance)
+        if slower and fewer:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PromptFlow benchmarks")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--filter", default="", help="Only names containing this")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR)
+    parser.add_argument("--min-time", type=float, default=1.0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--record",
+        "--save-baseline",
+        dest="record",
+        action="store_true",
+        help="Store the results as the baseline instead of comparing",
+    )
+    parser.add_argument("--tolerance", type=float, default=0.20)
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--list", action="store_true", help="List benchmarks")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args.child, args.profile, args.workdir, args.output, args.min_time)
+        return 0
+
+    names = [n for n in build_benchmarks(args.profile) if args.filter in n]
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    os.makedirs(args.workdir, exist_ok=True)
+    print(f"Preparing fixtures in {args.workdir}")
+    prepare_fixtures(args.profile, args.workdir)
+
+    print(f"Running {len(names)} benchmarks ({args.profile} profile)")
+    results = run_all(names, args.profile, args.workdir, args.min_time)
+
+    report = {
+        "meta": {
+            "profile": args.profile,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.record:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.setdefault("results", {}).update(results)
+        baseline["meta"] = report["meta"]
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        # Baselines are per machine: there is none to compare against until
+        # one was recorded here
+        print(
+            f"\nerror: no baseline at {args.baseline}; record one on this "
+            "machine with --record (before the change being measured)",
+            file=sys.stderr,
+        )
+        return 2
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline.get("results", {}), args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for name in regressions:
+            print(f"  {name}")
+        return 1
+    print("\nNo regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
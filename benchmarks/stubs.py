@@ -0,0 +1,93 @@
+"""
+PromptFlow Benchmark Stubs
+Minimal stand-ins for the ComfyUI modules PromptFlow imports, so the package
+can be loaded and timed outside ComfyUI
+"""
+
+import importlib.util
+import os
+import sys
+import types
+
+
+class _Routes:
+    """Accepts route registrations and returns the handlers unchanged"""
+
+    def _register(self, path):
+        return lambda handler: handler
+
+    get = post = put = delete = patch = _register
+
+
+class _PromptServer:
+    instance = None
+
+    def __init__(self):
+        self.routes = _Routes()
+
+    def send_sync(self, event, data, sid=None):
+        pass
+
+
+def _stub_aiohttp():
+    """Tiny aiohttp.web replacement (only used when aiohttp is missing)"""
+    web = types.ModuleType("aiohttp.web")
+
+    class Response:
+        def __init__(self, body=None, status=200, headers=None, **kwargs):
+            self.body = body
+            self.status = status
+            self.headers = dict(headers or {})
+
+    class StreamResponse(Response):
+        pass
+
+    def json_response(data, status=200, headers=None, **kwargs):
+        return Response(body=data, status=status, headers=headers)
+
+    web.Response = Response
+    web.StreamResponse = StreamResponse
+    web.json_response = json_response
+
+    aiohttp = types.ModuleType("aiohttp")
+    aiohttp.web = web
+    sys.modules["aiohttp"] = aiohttp
+    sys.modules["aiohttp.web"] = web
+
+
+def install_stubs(comfy_dir):
+    """
+    Register fake ``server`` and ``folder_paths`` modules (and ``aiohttp``
+    if it is not installed).
+
+    Args:
+        comfy_dir: Directory standing in for the ComfyUI base path
+    """
+    # No background watcher thread skewing the timings
+    os.environ.setdefault("PROMPTFLOW_WATCH", "0")
+
+    folder_paths = types.ModuleType("folder_paths")
+    folder_paths.base_path = comfy_dir
+    folder_paths.get_user_directory = lambda: os.path.join(comfy_dir, "user")
+    sys.modules["folder_paths"] = folder_paths
+
+    server = types.ModuleType("server")
+    _PromptServer.instance = _PromptServer()
+    server.PromptServer = _PromptServer
+    sys.modules["server"] = server
+
+    if importlib.util.find_spec("aiohttp") is None:
+        _stub_aiohttp()
+
+
+def load_promptflow(repo_dir, name="promptflow"):
+    """Import the extension from its directory as package ``name``"""
+    spec = importlib.util.spec_from_file_location(
+        name,
+        os.path.join(repo_dir, "__init__.py"),
+        submodule_search_locations=[repo_dir],
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,36 @@
+"""
+PromptFlow core library
+Pure-Python building blocks shared by the nodes and the API routes.
+Nothing in here imports ComfyUI, the server or aiohttp, and submodules are
+only loaded when one of their names is first used.
+"""
+
+import importlib
+
+# Public name -> submodule defining it
+_EXPORTS = {
+    "PromptEngine": "engine",
+    "default_engine": "engine",
+    "set_default_engine": "engine",
+    "PresetStore": "presets",
+    "VariationSpace": "variations",
+    "WildcardRegistry": "wildcards",
+}
+
+__all__ = [
+    "PresetStore",
+    "PromptEngine",
+    "VariationSpace",
+    "WildcardRegistry",
+    "default_engine",
+    "set_default_engine",
+]
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module("." + module, __name__), name)
+    globals()[name] = value
+    return value
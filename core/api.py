@@ -0,0 +1,684 @@
+"""
+PromptFlow API Requests
+Validation of the HTTP API's request parameters and the payloads it sends
+back. Plain dicts and lists in and out: the routes in __init__.py only move
+data between aiohttp and these functions.
+"""
+
+import json
+import os
+import re
+import sys
+
+from .categorize import Categorizer, load_keyword_file
+from .engine import EXTENDED_FIELDS, SIMPLE_FIELDS
+from .export import FORMATS, ORDERS
+from .variations import build_variation_space, template_from_prompt_input
+from .weights import option_weights
+
+# Maximum page size of /promptflow/wildcards
+MAX_WILDCARD_PAGE = 5000
+
+# Maximum page size of /promptflow/wildcards/search
+MAX_SEARCH_LIMIT = 500
+
+# Maximum number of names per /promptflow/wildcards/batch request
+MAX_BATCH_WILDCARDS = 256
+
+# Maximum number of seeds a single /promptflow/resolve request may ask for
+MAX_RESOLVE_SEEDS = 10000
+
+# Page size limits for /promptflow/variations
+MAX_VARIATIONS_PAGE = 1000
+MAX_VARIATIONS_STREAM = 1000000
+
+# Maximum number of prompts per /promptflow/categorize request
+MAX_CATEGORIZE_PROMPTS = 10000
+
+SEARCH_SCOPES = ("all", "names", "contents")
+CATEGORIZE_MODES = ("extended", "simple")
+
+# Frontend placeholder for "/" in wildcard names used as URL segments
+SLASH_PLACEHOLDER = "---SLASH---"
+
+_WILDCARD_NAME = re.compile(r"^[\w\-/]+$")
+
+
+class RequestError(ValueError):
+    """Raised for invalid request parameters or bodies (answered with 400)"""
+
+
+# ============================================================================
+# PARAMETERS
+# ============================================================================
+
+
+def is_truthy(value):
+    """Query / JSON flag: true for 1, true and yes (any case)"""
+    return str(value).lower() in ("1", "true", "yes")
+
+
+def int_param(params, name, default, minimum=None):
+    """
+    Read an integer request parameter.
+
+    Args:
+        params: Query or JSON body mapping
+        name: Parameter name (used in the error message)
+        default: Value when the parameter is missing
+        minimum: Smallest accepted value, if any
+
+    Raises:
+        RequestError: Naming the parameter, if it is not an integer or below
+            minimum
+    """
+    value = params.get(name, default)
+    if isinstance(value, bool):
+        raise RequestError(f"{name} must be an integer")
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise RequestError(f"{name} must be an integer") from None
+    if minimum is not None and value < minimum:
+        if minimum == 0:
+            raise RequestError(f"{name} must not be negative")
+        raise RequestError(f"{name} must be at least {minimum}")
+    return value
+
+
+def choice_param(params, name, choices, default):
+    """
+    Read a request parameter that must be one of choices.
+
+    Raises:
+        RequestError: If it is not
+    """
+    value = params.get(name, default)
+    if value not in choices:
+        quoted = ", ".join(f"'{choice}'" for choice in choices)
+        raise RequestError(f"{name} must be one of {quoted}")
+    return value
+
+
+def json_object(data):
+    """
+    Check that a request body is a JSON object.
+
+    Raises:
+        RequestError: If it is not
+    """
+    if not isinstance(data, dict):
+        raise RequestError("Expected a JSON object")
+    return data
+
+
+def _is_string_list(value):
+    return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+
+def etag_matches(header, etag):
+    """Check an If-None-Match request header against an ETag"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    # Proxies may weaken ETags (W/"...") when they re-encode the body
+    return any(tag == etag or tag == "W/" + etag for tag in candidates)
+
+
+# ============================================================================
+# WILDCARDS
+# ============================================================================
+
+
+def wildcard_name_from_url(name):
+    """Wildcard name of a URL segment (the frontend escapes "/")"""
+    return name.replace(SLASH_PLACEHOLDER, "/")
+
+
+def wildcard_listing_params(query, parse_fields):
+    """
+    Parse the /promptflow/wildcards query into (view, params).
+
+    Args:
+        query: Query mapping
+        parse_fields: The listing's "fields" parser
+
+    Raises:
+        RequestError: For invalid values
+    """
+    params = {"fields": parse_fields(query.get("fields"))}
+    prefix = query.get("prefix", "")
+
+    if is_truthy(query.get("tree", False)):
+        params["prefix"] = prefix
+        return "tree", params
+
+    if not any(k in query for k in ("prefix", "cursor", "limit")):
+        return "all", params
+
+    limit = None
+    if query.get("limit") is not None:
+        limit = min(int_param(query, "limit", None, minimum=1), MAX_WILDCARD_PAGE)
+    params.update(prefix=prefix, cursor=query.get("cursor") or None, limit=limit)
+    return "page", params
+
+
+def search_params(query):
+    """
+    Parse a /promptflow/wildcards/search query.
+
+    Returns:
+        (q, limit, offset, scope, samples)
+
+    Raises:
+        RequestError: For invalid values
+    """
+    offset = int_param(query, "offset", 0, minimum=0)
+    limit = min(int_param(query, "limit", 50, minimum=0), MAX_SEARCH_LIMIT)
+    scope = choice_param(query, "scope", SEARCH_SCOPES, "all")
+    q = query.get("q", "")
+    if not q.strip():
+        raise RequestError("q is required")
+    return q, limit, offset, scope, is_truthy(query.get("samples", False))
+
+
+def wildcard_contents_payload(registry, wildcard_name):
+    """
+    Look up and serialize one wildcard (blocking).
+    Returns (status, payload dict).
+    """
+    entry, options = registry.get_many([wildcard_name])[wildcard_name]
+    if entry is None:
+        return 404, {"error": f"Wildcard '{wildcard_name}' not found"}
+    if options is None:
+        return 500, {"error": f"Could not read wildcard '{wildcard_name}'"}
+
+    payload = {
+        "name": wildcard_name,
+        "options": list(options),
+        "count": len(options),
+        "source": entry["source"],
+    }
+    weights = option_weights(options)
+    if weights is not None:
+        payload["weights"] = weights
+    return 200, payload
+
+
+def batch_request(data):
+    """
+    Read a /promptflow/wildcards/batch body.
+
+    Returns:
+        (names, sample); sample is None for full option lists
+
+    Raises:
+        RequestError: For invalid values
+    """
+    json_object(data)
+    names = data.get("names")
+    if not _is_string_list(names):
+        raise RequestError("names must be a list of strings")
+    if len(names) > MAX_BATCH_WILDCARDS:
+        raise RequestError(f"At most {MAX_BATCH_WILDCARDS} names per request")
+
+    sample = None
+    if data.get("sample") is not None:
+        try:
+            sample = int_param(data, "sample", None, minimum=0)
+        except RequestError:
+            raise RequestError("sample must be a non-negative integer") from None
+    return [wildcard_name_from_url(name) for name in names], sample
+
+
+def wildcard_batch_payload(registry, names, sample=None):
+    """
+    Look up several wildcards in one registry pass (blocking).
+
+    Args:
+        registry: WildcardRegistry
+        names: Wildcard names
+        sample: None to return full option lists, otherwise the number of
+            leading options to return as "sample" alongside the count
+
+    Returns:
+        dict with "wildcards" (name -> info) and "missing" (unknown or
+        unreadable names)
+    """
+    found = {}
+    missing = []
+    for name, (entry, options) in registry.get_many(names).items():
+        if entry is None or options is None:
+            missing.append(name)
+            continue
+
+        info = {"name": name, "count": len(options), "source": entry["source"]}
+        if sample is None:
+            info["options"] = list(options)
+            weights = option_weights(options)
+        else:
+            info["sample"] = list(options[:sample])
+            weights = option_weights(options, sample)
+        if weights is not None:
+            info["weights"] = weights
+        found[name] = info
+
+    return {"wildcards": found, "missing": missing}
+
+
+def save_request(data):
+    """
+    Read a POST /promptflow/wildcards body.
+
+    Returns:
+        (name, options, overwrite)
+
+    Raises:
+        RequestError: For invalid values
+    """
+    json_object(data)
+    name = data.get("name", "")
+    if not isinstance(name, str) or not name.strip():
+        raise RequestError("Wildcard name is required")
+    options = data.get("options", [])
+    if not options or not isinstance(options, list):
+        raise RequestError("Options must be a non-empty list")
+    return name.strip(), options, bool(data.get("overwrite", False))
+
+
+def _local_wildcard_path(directory, wildcard_name):
+    return os.path.join(directory, wildcard_name.replace("/", os.sep) + ".txt")
+
+
+def save_wildcard_file(registry, directory, wildcard_name, options, overwrite=False):
+    """
+    Save a wildcard file to a wildcard directory (blocking).
+
+    Args:
+        registry: WildcardRegistry to update
+        directory: Wildcard directory the file goes to
+        wildcard_name: Name like "animals" or "styles/anime"
+        options: List of options (one per line)
+        overwrite: Whether to overwrite existing file
+
+    Returns:
+        dict with success status and path/error
+    """
+    # Only alphanumeric, underscores, hyphens and forward slashes
+    if not _WILDCARD_NAME.match(wildcard_name):
+        return {
+            "success": False,
+            "error": "Invalid wildcard name. Use only letters, numbers, underscores, hyphens, and forward slashes.",
+        }
+
+    filepath = _local_wildcard_path(directory, wildcard_name)
+    if os.path.exists(filepath) and not overwrite:
+        return {
+            "success": False,
+            "error": f"Wildcard '{wildcard_name}' already exists. Set overwrite=true to replace.",
+        }
+
+    try:
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write("\n".join(options))
+        registry.put(wildcard_name, "local", filepath, options)
+        return {"success": True, "path": filepath, "name": wildcard_name}
+    except (OSError, TypeError) as e:
+        return {"success": False, "error": str(e)}
+
+
+def delete_wildcard_file(registry, directory, wildcard_name):
+    """
+    Delete a wildcard file from a wildcard directory (blocking).
+    Returns dict with success status and error.
+    """
+    filepath = _local_wildcard_path(directory, wildcard_name)
+    if not os.path.exists(filepath):
+        return {
+            "success": False,
+            "error": f"Wildcard '{wildcard_name}' not found in local directory",
+        }
+
+    try:
+        os.remove(filepath)
+        registry.discard(wildcard_name, filepath)
+        return {"success": True}
+    except OSError as e:
+        return {"success": False, "error": str(e)}
+
+
+# ============================================================================
+# RESOLVE
+# ============================================================================
+
+
+def parse_seed_list(data):
+    """
+    Read the seeds of a resolve request.
+
+    Accepts either an explicit list ("seeds": [1, 2, 3]) or a range
+    ("seed_range": {"start": 0, "count": 100, "step": 1}).
+
+    Raises:
+        RequestError: If the seeds are missing, malformed or too many
+    """
+    if "seeds" in data:
+        seeds = data["seeds"]
+        if not isinstance(seeds, list) or not all(
+            isinstance(s, int) and not isinstance(s, bool) for s in seeds
+        ):
+            raise RequestError("seeds must be a list of integers")
+    elif "seed_range" in data:
+        seed_range = data["seed_range"]
+        if not isinstance(seed_range, dict):
+            raise RequestError("seed_range must be an object")
+        start = int_param(seed_range, "start", 0)
+        count = int_param(seed_range, "count", 1, minimum=0)
+        step = int_param(seed_range, "step", 1)
+        if count > MAX_RESOLVE_SEEDS:
+            raise RequestError(f"At most {MAX_RESOLVE_SEEDS} seeds per request")
+        seeds = [start + i * step for i in range(count)]
+    else:
+        raise RequestError("Provide either seeds or seed_range")
+
+    if len(seeds) > MAX_RESOLVE_SEEDS:
+        raise RequestError(f"At most {MAX_RESOLVE_SEEDS} seeds per request")
+    if any(s < 0 for s in seeds):
+        raise RequestError("Seeds must not be negative")
+    return seeds
+
+
+def resolve_request(data):
+    """
+    Read a /promptflow/resolve body.
+
+    Returns:
+        (resolve_args, seeds); resolve_args is (widget_data, trigger_words,
+        input_prompt) or (prompt, mode)
+
+    Raises:
+        RequestError: For invalid values
+    """
+    json_object(data)
+    seeds = parse_seed_list(data)
+    if "widget_data" in data:
+        widget_data = data["widget_data"]
+        if not isinstance(widget_data, str):
+            widget_data = json.dumps(widget_data)
+        return (
+            widget_data,
+            data.get("trigger_words", ""),
+            data.get("input_prompt", ""),
+        ), seeds
+    if "prompt" in data:
+        if not isinstance(data["prompt"], str):
+            raise RequestError("prompt must be a string")
+        return (data["prompt"], data.get("mode", "random")), seeds
+    raise RequestError("Provide either widget_data or prompt")
+
+
+def resolve_seeds(engine, resolve_args, seeds):
+    """
+    Resolve one template for every seed (blocking).
+
+    Args:
+        engine: PromptEngine
+        resolve_args: (widget_data, trigger_words, input_prompt) or (prompt, mode)
+        seeds: List of seeds
+
+    Returns:
+        List of {"seed", "positive", "negative"} dicts
+    """
+    results = []
+    if len(resolve_args) == 3:
+        positives, negatives, _compiled = engine.resolve_batch(
+            resolve_args[0], seeds, resolve_args[1], resolve_args[2]
+        )
+        for seed, positive, negative in zip(seeds, positives, negatives):
+            results.append({"seed": seed, "positive": positive, "negative": negative})
+    else:
+        prompt, mode = resolve_args
+        for seed in seeds:
+            positive = engine.resolve_prompt(prompt, seed, mode)
+            results.append({"seed": seed, "positive": positive, "negative": ""})
+    return results
+
+
+# ============================================================================
+# VARIATIONS
+# ============================================================================
+
+
+def variations_template(params):
+    """
+    Wildcard template of a variations request: "widget_data" (widget JSON,
+    as string or object) or "prompt".
+
+    Raises:
+        RequestError: If the prompt is not a string
+    """
+    if params.get("widget_data"):
+        text = params["widget_data"]
+        if not isinstance(text, str):
+            text = json.dumps(text)
+    else:
+        text = params.get("prompt", "")
+    if not isinstance(text, str):
+        raise RequestError("prompt must be a string")
+    return template_from_prompt_input(text, SIMPLE_FIELDS, EXTENDED_FIELDS)
+
+
+def variations_params(params):
+    """
+    Read the paging parameters of a variations request.
+
+    Returns:
+        dict with "stream", "offset", "limit" (capped per mode) and "order"
+
+    Raises:
+        RequestError: For invalid values
+    """
+    stream = is_truthy(params.get("stream", False))
+    max_limit = MAX_VARIATIONS_STREAM if stream else MAX_VARIATIONS_PAGE
+    return {
+        "stream": stream,
+        "offset": int_param(params, "offset", 0, minimum=0),
+        "limit": min(int_param(params, "limit", 50, minimum=0), max_limit),
+        "order": choice_param(params, "order", ORDERS, "sequential"),
+    }
+
+
+def variations_space(template, get_options):
+    """
+    VariationSpace of a template and the names of its missing wildcard
+    files (blocking).
+
+    Returns:
+        (space, missing)
+    """
+    space, wildcards = build_variation_space(template, get_options)
+    return space, [w["name"] for w in wildcards if w.get("not_found")]
+
+
+def variations_page_payload(template, space, missing, offset, limit, order):
+    """One page of /promptflow/variations (blocking: options may be on disk)"""
+    return {
+        "template": template,
+        "total": space.total,
+        "offset": offset,
+        "limit": limit,
+        "order": order,
+        "wildcards": space.describe(),
+        "missing": missing,
+        "variations": space.page(offset, limit, order),
+    }
+
+
+def variation_rows(space, offset, limit, order):
+    """
+    Lazy {"index", "prompt", "probability"} rows of a streamed variations
+    request; shuffled rows add the combination index as "variation".
+    """
+    if order == "shuffle":
+        for position, index, prompt, probability in space.iter_shuffled(
+            offset, offset + limit
+        ):
+            yield {
+                "index": position,
+                "variation": index,
+                "prompt": prompt,
+                "probability": probability,
+            }
+    else:
+        for index, prompt, probability in space.iter_range(offset, offset + limit):
+            yield {"index": index, "prompt": prompt, "probability": probability}
+
+
+def export_command(template, params, wildcard_dirs, index_dir, cpu_count=None):
+    """
+    Command line of a `python -m core.export` process for an export request.
+
+    Args:
+        template: Wildcard template
+        params: Query mapping (format, order, start, stop, key, workers)
+        wildcard_dirs: [(source, directory)] in priority order
+        index_dir: Line index directory
+        cpu_count: Upper bound of workers (defaults to os.cpu_count())
+
+    Returns:
+        (command, format)
+
+    Raises:
+        RequestError: For invalid values
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    fmt = choice_param(params, "format", FORMATS, "jsonl")
+    order = choice_param(params, "order", ORDERS, "sequential")
+    start = int_param(params, "start", 0, minimum=0)
+    key = int_param(params, "key", 0)
+    workers = max(1, min(int_param(params, "workers", cpu_count), cpu_count))
+
+    command = [sys.executable, "-m", "core.export", "--out", "-"]
+    command += ["--format", fmt, "--order", order, "--key", str(key)]
+    command += ["--start", str(start), "--workers", str(workers)]
+    if params.get("stop") not in (None, ""):
+        stop = int_param(params, "stop", None, minimum=0)
+        command += ["--stop", str(stop)]
+    for source, directory in wildcard_dirs:
+        command += ["--wildcards", f"{source}={directory}"]
+    command += ["--index-dir", index_dir]
+    return command + ["--", template], fmt
+
+
+def export_error(stderr, returncode):
+    """Last line of an export process's stderr, for the error response"""
+    lines = stderr.decode("utf-8", "replace").strip().splitlines()
+    return lines[-1] if lines else f"export failed (exit code {returncode})"
+
+
+# ============================================================================
+# AUTO-CATEGORIZE
+# ============================================================================
+
+
+def categorize_request(data):
+    """
+    Read a /promptflow/categorize body.
+
+    Returns:
+        (prompts, mode, keywords); keywords is None without extra tables
+
+    Raises:
+        RequestError: For invalid values
+    """
+    json_object(data)
+    prompts = data.get("prompts")
+    if prompts is None and "prompt" in data:
+        prompts = [data["prompt"]]
+    if not _is_string_list(prompts):
+        raise RequestError("prompts must be a list of strings")
+    if len(prompts) > MAX_CATEGORIZE_PROMPTS:
+        raise RequestError(f"At most {MAX_CATEGORIZE_PROMPTS} prompts per request")
+
+    mode = choice_param(data, "mode", CATEGORIZE_MODES, "extended")
+
+    keywords = data.get("keywords")
+    if keywords is not None and not (
+        isinstance(keywords, dict) and all(map(_is_string_list, keywords.values()))
+    ):
+        raise RequestError("keywords must map categories to lists of strings")
+    return prompts, mode, keywords
+
+
+class CategorizerCache:
+    """
+    Compiled default categorizer with the user's keyword tables, rebuilt
+    when the keyword file changes.
+
+    Args:
+        keywords_path: Callable returning the user keyword file path (a
+            JSON {category: [keywords]}), or None without one
+        on_error: Called with (path, exception) when the file is invalid;
+            the built-in tables are used meanwhile
+    """
+
+    def __init__(self, keywords_path, on_error=None):
+        self.keywords_path = keywords_path
+        self.on_error = on_error
+        self._stamp = None
+        self._categorizer = None
+        self._user_keywords = {}
+
+    def get(self, extra=None):
+        """
+        Categorizer with the built-in and user keyword tables (blocking).
+
+        Args:
+            extra: Additional {category: [keywords]} for this call only
+
+        Raises:
+            ValueError: For extra tables named like a fallback field
+        """
+        path = self.keywords_path()
+        try:
+            st = os.stat(path) if path else None
+            stamp = (st.st_mtime_ns, st.st_size) if st else None
+        except OSError:
+            stamp = None
+
+        if self._categorizer is None or self._stamp != stamp:
+            user_keywords = {}
+            if stamp is not None:
+                try:
+                    user_keywords = load_keyword_file(path)
+                    categorizer = Categorizer(extra=user_keywords)
+                except (OSError, ValueError) as e:
+                    if self.on_error is not None:
+                        self.on_error(path, e)
+                    user_keywords = {}
+            if not user_keywords:
+                categorizer = Categorizer()
+            self._categorizer = categorizer
+            self._user_keywords = user_keywords
+            self._stamp = stamp
+
+        if not extra:
+            return self._categorizer
+        merged = {c: list(k) for c, k in self._user_keywords.items()}
+        for category, keywords in extra.items():
+            merged.setdefault(category, []).extend(keywords)
+        return Categorizer(extra=merged)
+
+    def categorize(self, prompts, mode, extra=None):
+        """Categorize a batch of prompts into widget_data dicts (blocking)"""
+        categorizer = self.get(extra)
+        return [
+            {
+                "categories": categorizer.categorize(prompt, mode),
+                "widget_data": categorizer.widget_data(prompt, mode),
+            }
+            for prompt in prompts
+        ]
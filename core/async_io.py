@@ -0,0 +1,74 @@
+"""
+PromptFlow Async I/O
+Runs blocking filesystem work off the event loop, coalescing duplicate calls
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BlockingIOPool:
+    """
+    Bounded thread pool for blocking work called from async handlers.
+
+    Calls made with a ``key`` are single-flight: while a call with that key
+    is running, identical calls await the same result instead of starting
+    another scan. Waiters that are cancelled do not cancel the shared call.
+
+    Args:
+        max_workers: Maximum number of worker threads
+        thread_name_prefix: Name prefix for the worker threads
+    """
+
+    def __init__(self, max_workers=4, thread_name_prefix="promptflow-io"):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._inflight = {}  # key -> asyncio.Future (event loop thread only)
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=self.thread_name_prefix,
+                    )
+        return self._executor
+
+    async def run(self, func, *args, key=None, **kwargs):
+        """
+        Run func(*args, **kwargs) on the pool and return its result.
+
+        Args:
+            func: Blocking callable
+            key: Optional hashable identifying the call for coalescing
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+
+        if key is None:
+            return await loop.run_in_executor(self._get_executor(), call)
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = loop.run_in_executor(self._get_executor(), call)
+            self._inflight[key] = future
+
+            def _forget(done, key=key):
+                if self._inflight.get(key) is done:
+                    del self._inflight[key]
+
+            future.add_done_callback(_forget)
+
+        return await asyncio.shield(future)
+
+    def shutdown(self, wait=False):
+        """Stop the worker threads (a new pool is created on next use)"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
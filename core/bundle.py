@@ -0,0 +1,479 @@
+"""
+PromptFlow Wildcard Bundles
+Many wildcards packed into one file with a built-in index, so listing and
+reading them costs one open() and an mmap instead of one inode per file
+
+Usage (from the PromptFlow directory):
+    python -m core.bundle build wildcards/ wildcards.pfw --compress
+    python -m core.bundle info wildcards.pfw
+"""
+
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+
+from .metrics import METRICS
+from .structured import STRUCTURED_EXTENSIONS, StructuredWildcards
+from .weights import AliasTable
+
+BUNDLE_EXTENSION = ".pfw"
+
+# Layout (little-endian):
+#   header
+#   names      UTF-8 wildcard names joined by "\n", sorted
+#   directory  per wildcard: first option, option count, first weight or -1
+#   blocks     per block: file offset, stored size, raw size
+#   lines      per option: byte offset of the option inside its raw block
+#   weights    per option of a weighted wildcard: float64 weight
+#   data       blocks of up to block_options options joined by "\n",
+#              zlib-compressed when the header says so
+BUNDLE_MAGIC = b"PFWBND01"
+BUNDLE_HEADER = struct.Struct("<8sIIIIQQQQQQQ")
+DIRECTORY_ENTRY = struct.Struct("<QIq")
+BLOCK_ENTRY = struct.Struct("<QII")
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+
+# Options per block: the unit of decompression
+DEFAULT_BLOCK_OPTIONS = 64
+
+# Decompressed blocks kept per bundle
+BLOCK_CACHE_SIZE = 64
+
+_BLOCK_CACHE = METRICS.cache("bundle_blocks")
+
+
+class BundleFormatError(ValueError):
+    """Raised for files that are not valid wildcard bundles"""
+
+
+def _table(data, typecode):
+    """Little-endian table from a buffer (zero-copy where possible)"""
+    if sys.byteorder == "little":
+        return memoryview(data).cast(typecode)
+    table = array(typecode)
+    table.frombytes(bytes(data))
+    table.byteswap()
+    return table
+
+
+class BundleOptions(Sequence):
+    """
+    Read-only option list of one wildcard in a bundle.
+
+    Options are read from the bundle's memory map on access. Weighted
+    wildcards carry ``weights``, ``total_weight`` and an AliasTable like
+    WeightedOptions.
+    """
+
+    def __init__(self, bundle, first, count, weights=None):
+        self.bundle = bundle
+        self._first = first
+        self._count = count
+        self.weights = None
+        self.total_weight = 0.0
+        self.alias = None
+        if weights is not None and count:
+            self.weights = array("d", weights)
+            self.total_weight = float(sum(self.weights))
+            self.alias = AliasTable(self.weights)
+
+    @property
+    def stamp(self):
+        """(mtime_ns, size) of the bundle version the options come from"""
+        return self.bundle.stamp
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("option index out of range")
+        return self.bundle.option(self._first + index)
+
+    def __iter__(self):
+        return self.bundle.iter_options(self._first, self._first + self._count)
+
+    def __repr__(self):
+        return f"<BundleOptions {self.bundle.path!r} ({self._count} options)>"
+
+
+class WildcardBundle:
+    """
+    Memory-mapped wildcard bundle.
+
+    Opening reads only the header, the names and the directory. Option k
+    of a wildcard is found through the line-offset table and read from its
+    block, which is decompressed at most once while it stays in a small
+    LRU cache.
+
+    On Windows a mapped file cannot be replaced or truncated, which would
+    stop the bundle from being rebuilt while it is in use, so the file is
+    read into memory there instead of being mapped.
+
+    Args:
+        path: Bundle file path
+
+    Raises:
+        OSError: If the file cannot be opened
+        BundleFormatError: If it is not a valid bundle
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.stamp = (st.st_mtime_ns, st.st_size)
+            if st.st_size < BUNDLE_HEADER.size:
+                raise BundleFormatError(f"{path} is not a wildcard bundle")
+            if os.name == "nt":
+                self._map = f.read()
+            else:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic,
+            self.block_options,
+            self.compression,
+            count,
+            block_count,
+            self.option_count,
+            names_offset,
+            names_size,
+            directory_offset,
+            blocks_offset,
+            lines_offset,
+            weights_offset,
+        ) = BUNDLE_HEADER.unpack_from(self._map, 0)
+        if magic != BUNDLE_MAGIC:
+            raise BundleFormatError(f"{path} is not a wildcard bundle")
+
+        try:
+            view = memoryview(self._map)
+            names = bytes(view[names_offset : names_offset + names_size])
+            names = names.decode("utf-8").split("\n") if count else []
+            end = directory_offset + count * DIRECTORY_ENTRY.size
+            records = DIRECTORY_ENTRY.iter_unpack(view[directory_offset:end])
+            self._directory = dict(zip(names, records))
+            end = blocks_offset + block_count * BLOCK_ENTRY.size
+            self._blocks = list(BLOCK_ENTRY.iter_unpack(view[blocks_offset:end]))
+            end = lines_offset + self.option_count * 4
+            self._lines = _table(view[lines_offset:end], "I")
+            self._view = view
+            self._weights_offset = weights_offset
+        except (struct.error, TypeError, UnicodeDecodeError) as e:
+            raise BundleFormatError(f"{path} is corrupt: {e}") from None
+        if len(self._directory) != count or len(self._lines) != self.option_count:
+            raise BundleFormatError(f"{path} is corrupt")
+
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # block number -> decompressed bytes
+        self._options = {}  # name -> BundleOptions
+
+    def close(self):
+        """
+        Release the mapping (once the bundle was replaced on disk). Reading
+        options of a closed bundle raises ValueError.
+        """
+        with self._lock:
+            self._options.clear()
+            self._cache.clear()
+            for view in (self._lines, self._view):
+                if isinstance(view, memoryview):
+                    view.release()
+            if isinstance(self._map, mmap.mmap):
+                try:
+                    self._map.close()
+                except BufferError:
+                    # A reader still holds a slice; unmapped once it is gone
+                    pass
+
+    def names(self):
+        """Wildcard names in the bundle, sorted"""
+        return list(self._directory)
+
+    def __contains__(self, name):
+        return name in self._directory
+
+    def __len__(self):
+        return len(self._directory)
+
+    def options(self, name):
+        """BundleOptions of a wildcard, or None if it is not in the bundle"""
+        options = self._options.get(name)
+        if options is not None:
+            return options
+        record = self._directory.get(name)
+        if record is None:
+            return None
+        first, count, weight_start = record
+        weights = None
+        if weight_start >= 0:
+            start = self._weights_offset + weight_start * 8
+            weights = _table(self._view[start : start + count * 8], "d")
+        options = BundleOptions(self, first, count, weights)
+        self._options[name] = options
+        return options
+
+    def _block(self, number):
+        """Raw bytes of a block (decompressed and cached when needed)"""
+        offset, stored, _raw = self._blocks[number]
+        if self.compression == COMPRESSION_NONE:
+            return self._view[offset : offset + stored]
+
+        with self._lock:
+            data = self._cache.get(number)
+            if data is not None:
+                self._cache.move_to_end(number)
+                _BLOCK_CACHE.hit()
+                return data
+        _BLOCK_CACHE.miss()
+        data = zlib.decompress(self._view[offset : offset + stored])
+        with self._lock:
+            self._cache[number] = data
+            if len(self._cache) > BLOCK_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return data
+
+    def _span(self, position, block_size):
+        """(start, end) of an option inside its raw block"""
+        start = self._lines[position]
+        following = position + 1
+        if following % self.block_options and following < self.option_count:
+            return start, self._lines[following] - 1
+        return start, block_size
+
+    def option(self, position):
+        """Text of the option at a bundle-wide position"""
+        number = position // self.block_options
+        data = self._block(number)
+        start, end = self._span(position, len(data))
+        return str(data[start:end], "utf-8")
+
+    def iter_options(self, start, stop):
+        """Yield the options at bundle-wide positions [start, stop)"""
+        position = start
+        while position < stop:
+            number = position // self.block_options
+            block_end = min(stop, (number + 1) * self.block_options)
+            data = self._block(number)
+            size = len(data)
+            for i in range(position, block_end):
+                begin, end = self._span(i, size)
+                yield str(data[begin:end], "utf-8")
+            position = block_end
+
+    def info(self):
+        """Summary of the bundle (for tools)"""
+        return {
+            "path": self.path,
+            "wildcards": len(self._directory),
+            "options": self.option_count,
+            "blocks": len(self._blocks),
+            "block_options": self.block_options,
+            "compression": "zlib" if self.compression == COMPRESSION_ZLIB else None,
+            "size": self.stamp[1],
+        }
+
+
+def write_bundle(wildcards, path, compress=False, block_options=DEFAULT_BLOCK_OPTIONS):
+    """
+    Write a bundle file (atomically replacing path).
+
+    Args:
+        wildcards: Iterable of (name, options); options may be a
+            WeightedOptions list. Names must not contain newlines.
+        path: Output file
+        compress: zlib-compress each block
+        block_options: Options per block
+
+    Returns:
+        Number of wildcards written
+    """
+    items = sorted(wildcards, key=lambda item: item[0])
+    for (name, _o), (following, _p) in zip(items, items[1:]):
+        if name == following:
+            raise ValueError(f"Duplicate wildcard name {name!r}")
+    names = []
+    directory = []
+    blocks = []
+    lines = array("I")
+    weights = array("d")
+    data = []
+    data_size = 0
+
+    block = []
+    block_size = 0
+
+    def flush_block():
+        nonlocal data_size, block, block_size
+        raw = "\n".join(block).encode("utf-8")
+        stored = zlib.compress(raw, 6) if compress else raw
+        blocks.append((data_size, len(stored), len(raw)))
+        data.append(stored)
+        data_size += len(stored)
+        block = []
+        block_size = 0
+
+    position = 0
+    for name, options in items:
+        if "\n" in name:
+            raise ValueError(f"Invalid wildcard name {name!r}")
+        option_weights = getattr(options, "weights", None)
+        weight_start = -1
+        if option_weights is not None:
+            weight_start = len(weights)
+            weights.extend(option_weights)
+        names.append(name)
+        directory.append((position, len(options), weight_start))
+        for option in options:
+            option = option.replace("\n", " ")
+            lines.append(block_size)
+            block.append(option)
+            block_size += len(option.encode("utf-8")) + 1
+            position += 1
+            if len(block) == block_options:
+                flush_block()
+    if block:
+        flush_block()
+
+    if sys.byteorder != "little":
+        lines.byteswap()
+        weights.byteswap()
+    names_data = "\n".join(names).encode("utf-8")
+    directory_data = b"".join(DIRECTORY_ENTRY.pack(*d) for d in directory)
+    blocks_table = [BLOCK_ENTRY.pack(0, 0, 0)] * len(blocks)
+    sections = [names_data, directory_data, b"".join(blocks_table)]
+    sections += [lines.tobytes(), weights.tobytes()]
+
+    offsets = []
+    offset = BUNDLE_HEADER.size
+    for section in sections:
+        offsets.append(offset)
+        offset += len(section)
+    blocks_data = b"".join(
+        BLOCK_ENTRY.pack(offset + start, stored, raw) for start, stored, raw in blocks
+    )
+    sections[2] = blocks_data
+
+    header = BUNDLE_HEADER.pack(
+        BUNDLE_MAGIC,
+        block_options,
+        COMPRESSION_ZLIB if compress else COMPRESSION_NONE,
+        len(names),
+        len(blocks),
+        position,
+        offsets[0],
+        len(names_data),
+        offsets[1],
+        offsets[2],
+        offsets[3],
+        offsets[4],
+    )
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(header)
+            f.writelines(sections)
+            f.writelines(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return len(names)
+
+
+def directory_wildcards(directory, extension=".txt"):
+    """
+    Yield (name, options) for every wildcard file below directory,
+    including the wildcards of YAML / JSON files
+    """
+    # Imported here: wildcards imports this module
+    from .wildcards import read_wildcard_file
+
+    for root, _dirs, files in os.walk(directory):
+        for file in files:
+            path = os.path.join(root, file)
+            if file.endswith(extension):
+                name = os.path.relpath(path, directory)[: -len(extension)]
+                yield name.replace(os.sep, "/"), read_wildcard_file(path)
+            elif file.endswith(STRUCTURED_EXTENSIONS):
+                folder = os.path.relpath(root, directory)
+                prefix = "" if folder == "." else folder.replace(os.sep, "/") + "/"
+                structured = StructuredWildcards(path)
+                for name in structured.names():
+                    yield prefix + name, structured.options(name)
+
+
+def build_bundle(directory, path, compress=False, block_options=DEFAULT_BLOCK_OPTIONS):
+    """Pack every wildcard file below directory into a bundle at path"""
+    return write_bundle(directory_wildcards(directory), path, compress, block_options)
+
+
+def main(argv=None):
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(
+        prog="python -m core.bundle", description="PromptFlow wildcard bundles"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Pack a wildcard folder")
+    build.add_argument("directory", help="Folder of wildcard files")
+    build.add_argument("bundle", help=f"Output file (*{BUNDLE_EXTENSION})")
+    build.add_argument("--compress", action="store_true", help="zlib per block")
+    build.add_argument("--block-options", type=int, default=DEFAULT_BLOCK_OPTIONS)
+    info = commands.add_parser("info", help="Describe a bundle")
+    info.add_argument("bundle")
+    info.add_argument("--names", action="store_true", help="List the wildcards")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        if not os.path.isdir(args.directory):
+            parser.error(f"{args.directory} is not a directory")
+        if args.block_options < 1:
+            parser.error("--block-options must be >= 1")
+        started = time.perf_counter()
+        try:
+            count = build_bundle(
+                args.directory, args.bundle, args.compress, args.block_options
+            )
+        except (OSError, ValueError) as e:
+            print(e, file=sys.stderr)
+            return 1
+        elapsed = time.perf_counter() - started
+        size = os.path.getsize(args.bundle)
+        print(
+            f"Packed {count} wildcards into {args.bundle} "
+            f"({size} bytes, {elapsed:.1f}s)"
+        )
+        return 0
+
+    try:
+        bundle = WildcardBundle(args.bundle)
+    except (OSError, BundleFormatError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    for key, value in bundle.info().items():
+        print(f"{key}: {value}")
+    if args.names:
+        for name in bundle.names():
+            print(f"  {name} ({len(bundle.options(name))})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
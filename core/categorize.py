@@ -0,0 +1,343 @@
+"""
+PromptFlow Auto-Categorize
+Sorts prompt tags into PromptFlow fields by keyword, matching the widget's
+Auto-Sort (autoCategorize in promptflow_widget.js) with a compiled matcher
+"""
+
+import json
+import os
+import re
+
+from .engine import EXTENDED_FIELDS, SIMPLE_FIELDS
+from .metrics import METRICS
+
+_CATEGORIZE_TIMER = METRICS.timer(
+    "categorize", "Auto-categorizing one prompt into fields"
+)
+
+# Keyword tables in priority order: a tag goes to the first category with a
+# matching keyword. The widget loads the same file.
+TAG_DATABASE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "web",
+    "comfyui",
+    "tag_database.json",
+)
+
+with open(TAG_DATABASE_PATH, encoding="utf-8") as _f:
+    TAG_DATABASE = json.load(_f)
+
+# Field order of the node's extended mode
+EXTENDED_ORDER = list(EXTENDED_FIELDS)
+SIMPLE_ORDER = list(SIMPLE_FIELDS)
+
+# Result keys that are not keyword categories
+RESERVED_CATEGORIES = ("custom", "main_prompt", "unmatched")
+
+# Categories that stay separate in simple mode; the rest go to main_prompt
+SIMPLE_KEPT = ("style", "quality")
+
+# Characters String.prototype.trim() removes (str.strip() differs slightly)
+_JS_WHITESPACE = (
+    "\t\n\x0b\x0c\r \xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006"
+    "\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000\ufeff"
+)
+
+_SEGMENT_SPLIT = re.compile(r"[,;]+")
+_DASHES = str.maketrans("_-", "  ")
+
+
+def normalize_tag(tag):
+    """Lowercase, trim and turn "_" / "-" into spaces (as the widget does)"""
+    return tag.lower().strip(_JS_WHITESPACE).translate(_DASHES)
+
+
+def split_segments(text):
+    """Split a prompt on commas / semicolons into trimmed, non-empty tags"""
+    segments = []
+    for segment in _SEGMENT_SPLIT.split(text):
+        segment = segment.strip(_JS_WHITESPACE)
+        if segment:
+            segments.append(segment)
+    return segments
+
+
+class Categorizer:
+    """
+    Compiled keyword matcher for auto-categorizing tags.
+
+    A tag belongs to the first category (in table order) with a keyword
+    that occurs in the tag, or that the whole tag occurs in. The first
+    case is answered by an Aho-Corasick automaton over all keywords, which
+    scans a tag once regardless of the number of keywords; the second by a
+    suffix automaton of the keywords, which accepts exactly their
+    substrings in O(total keyword length) states. Each state of both
+    stores the best (lowest) category index it implies, so a tag costs
+    O(len(tag)).
+
+    Args:
+        tables: {category: [keywords]} in priority order; defaults to
+            TAG_DATABASE
+        extra: Additional {category: [keywords]}; keywords of known
+            categories are added to them, new categories rank after the
+            built-in ones
+
+    Raises:
+        ValueError: For keyword tables named like a fallback field
+    """
+
+    def __init__(self, tables=None, extra=None):
+        tables = {c: list(k) for c, k in (tables or TAG_DATABASE).items()}
+        for category, keywords in (extra or {}).items():
+            tables.setdefault(category, []).extend(keywords)
+        reserved = [c for c in tables if c in RESERVED_CATEGORIES]
+        if reserved:
+            raise ValueError(f"Reserved category name(s): {', '.join(reserved)}")
+
+        self.categories = list(tables)
+        self._goto = [{}]
+        self._best = [None]  # state -> best category index ending there
+        # Suffix automaton: transitions, suffix links, longest string length
+        self._sa_next = [{}]
+        self._sa_link = [-1]
+        self._sa_len = [0]
+
+        keywords = []
+        for index, category_keywords in enumerate(tables.values()):
+            for keyword in category_keywords:
+                keyword = normalize_tag(keyword)
+                if keyword:
+                    self._add_keyword(keyword, index)
+                    keywords.append((keyword, index))
+        self._link()
+        self._within = self._substring_best(keywords)
+
+    def _add_keyword(self, keyword, index):
+        state = 0
+        for char in keyword:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._best.append(None)
+            state = nxt
+        if self._best[state] is None or index < self._best[state]:
+            self._best[state] = index
+
+        state = 0
+        for char in keyword:
+            state = self._extend(state, char)
+
+    def _new_state(self, length, transitions, link):
+        self._sa_next.append(transitions)
+        self._sa_link.append(link)
+        self._sa_len.append(length)
+        return len(self._sa_len) - 1
+
+    def _clone(self, p, q, char):
+        """Split q so that the state after p + char is exactly that long"""
+        sa_next = self._sa_next
+        clone = self._new_state(self._sa_len[p] + 1, dict(sa_next[q]), self._sa_link[q])
+        while p != -1 and sa_next[p].get(char) == q:
+            sa_next[p][char] = clone
+            p = self._sa_link[p]
+        self._sa_link[q] = clone
+        return clone
+
+    def _extend(self, last, char):
+        """Append char to the keyword ending in state last (generalized)"""
+        sa_next = self._sa_next
+        sa_len = self._sa_len
+        q = sa_next[last].get(char)
+        if q is not None:
+            # Another keyword already added this substring
+            if sa_len[last] + 1 == sa_len[q]:
+                return q
+            return self._clone(last, q, char)
+
+        cur = self._new_state(sa_len[last] + 1, {}, 0)
+        p = last
+        while p != -1 and char not in sa_next[p]:
+            sa_next[p][char] = cur
+            p = self._sa_link[p]
+        if p != -1:
+            q = sa_next[p][char]
+            if sa_len[p] + 1 == sa_len[q]:
+                self._sa_link[cur] = q
+            else:
+                self._sa_link[cur] = self._clone(p, q, char)
+        return cur
+
+    def _substring_best(self, keywords):
+        """
+        Best category index of every suffix automaton state: the lowest
+        index of a keyword containing its substrings. Each keyword marks
+        the states of its prefixes; a state's suffix link stands for
+        suffixes of those, so marks flow down the links longest first.
+        """
+        sa_next = self._sa_next
+        best = [None] * len(sa_next)
+        for keyword, index in keywords:
+            state = 0
+            for char in keyword:
+                state = sa_next[state][char]
+                if best[state] is None or index < best[state]:
+                    best[state] = index
+
+        link = self._sa_link
+        longest_first = sorted(range(1, len(best)), key=self._sa_len.__getitem__)
+        for state in reversed(longest_first):
+            parent = link[state]
+            found = best[state]
+            if (
+                parent > 0
+                and found is not None
+                and (best[parent] is None or found < best[parent])
+            ):
+                best[parent] = found
+        return best
+
+    def _link(self):
+        """Compute failure links breadth-first and fold outputs along them"""
+        goto = self._goto
+        best = self._best
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for char, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and char not in goto[f]:
+                    f = fail[f]
+                link = goto[f].get(char, 0)
+                fail[nxt] = link if link != nxt else 0
+                inherited = best[fail[nxt]]
+                if inherited is not None and (
+                    best[nxt] is None or inherited < best[nxt]
+                ):
+                    best[nxt] = inherited
+        self._fail = fail
+
+    def _contained_in(self, normalized):
+        """Best category index of the keywords containing normalized"""
+        if not normalized:
+            return None
+        sa_next = self._sa_next
+        state = 0
+        for char in normalized:
+            state = sa_next[state].get(char)
+            if state is None:
+                return None
+        return self._within[state]
+
+    def category_index(self, normalized):
+        """Best category index for a normalized tag, or None"""
+        result = self._contained_in(normalized)
+        if result == 0:
+            return 0
+
+        goto = self._goto
+        fail = self._fail
+        best = self._best
+        state = 0
+        for char in normalized:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            found = best[state]
+            if found is not None and (result is None or found < result):
+                if found == 0:
+                    return 0
+                result = found
+        return result
+
+    def categorize_tag(self, tag):
+        """Category of one tag, or None if no keyword matches"""
+        index = self.category_index(normalize_tag(tag))
+        return None if index is None else self.categories[index]
+
+    def categorize(self, text, mode="extended"):
+        """
+        Sort the tags of a prompt into categories, like autoCategorize().
+
+        Returns:
+            {category: [tags]} with every category (plus "custom",
+            "main_prompt" and "unmatched"); unmatched tags go to "custom",
+            or to "main_prompt" in simple mode
+        """
+        with _CATEGORIZE_TIMER.time():
+            result = {category: [] for category in self.categories}
+            result.update(custom=[], main_prompt=[], unmatched=[])
+            fallback = result["main_prompt" if mode == "simple" else "custom"]
+            categories = self.categories
+            for segment in split_segments(text):
+                index = self.category_index(normalize_tag(segment))
+                if index is None:
+                    fallback.append(segment)
+                else:
+                    result[categories[index]].append(segment)
+            return result
+
+    def widget_data(self, text, mode="extended"):
+        """
+        Categorize a prompt into a PromptFlow widget_data dict, as the
+        widget's Auto-Sort "Apply" does on an empty node: simple mode keeps
+        style and quality and merges everything else into main_prompt,
+        repeated tags (ignoring case) are dropped and every field is fixed.
+        """
+        categorized = self.categorize(text, mode)
+        if mode == "simple":
+            main_prompt = []
+            for category, tags in categorized.items():
+                if category != "unmatched" and category not in SIMPLE_KEPT:
+                    main_prompt.extend(tags)
+            categorized = {
+                "main_prompt": main_prompt,
+                "style": categorized.get("style", []),
+                "quality": categorized.get("quality", []),
+            }
+            order = list(SIMPLE_ORDER)
+        else:
+            order = EXTENDED_ORDER + [
+                c for c in self.categories if c not in EXTENDED_ORDER
+            ]
+
+        fields = {}
+        for category, tags in categorized.items():
+            if category == "unmatched" or not tags:
+                continue
+            seen = set()
+            unique = []
+            for tag in tags:
+                key = tag.lower().strip(_JS_WHITESPACE)
+                if key not in seen:
+                    seen.add(key)
+                    unique.append(tag)
+            fields[category] = {"value": ", ".join(unique), "mode": "fixed"}
+
+        return {"mode": mode, "categoryOrder": order, "categories": fields}
+
+
+def load_keyword_file(path):
+    """
+    Read user keyword tables: a JSON object of {category: [keywords]}.
+    Returns an empty dict if the file does not exist.
+
+    Raises:
+        ValueError: If the file is not shaped like that
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if not isinstance(data, dict) or not all(
+        isinstance(k, list) and all(isinstance(w, str) for w in k)
+        for k in data.values()
+    ):
+        raise ValueError(f"{path}: expected {{category: [keywords]}}")
+    return data
@@ -0,0 +1,264 @@
+"""
+PromptFlow Prompt Engine
+Resolves PromptFlow widget data and raw wildcard prompts against a wildcard
+registry. Pure Python: no ComfyUI, server or aiohttp imports, so it can be
+used from scripts, benchmarks and worker processes.
+
+Usage (with the PromptFlow directory on sys.path):
+    from core.engine import PromptEngine
+
+    engine = PromptEngine(["/path/to/wildcards"])
+    positive, negative, _compiled = engine.resolve(widget_data, seed=42)
+"""
+
+import os
+import random
+
+from .expansion import FILE_PATTERN
+from .metrics import METRICS
+from .sampling import shuffled_indices, shuffled_indices_batch
+from .templates import (
+    OptionSelector,
+    cached_lookup,
+    cleanup_join,
+    cleanup_prompt,
+    compile_text,
+    compile_widget_data,
+)
+from .wildcards import WildcardRegistry
+
+_RESOLVE_TIMER = METRICS.timer(
+    "wildcard_resolve", "Resolving the wildcards of a prompt for one seed"
+)
+
+# Simple mode fields
+SIMPLE_FIELDS = ["main_prompt", "style", "quality"]
+
+# Extended mode fields (ordered by prompt importance)
+EXTENDED_FIELDS = [
+    "subject",
+    "character",
+    "outfit",
+    "pose",
+    "location",
+    "style",
+    "camera",
+    "lighting",
+    "quality",
+    "custom",
+]
+
+# Largest batch resolved in one call
+MAX_BATCH_SIZE = 4096
+
+# Wildcard directories of the default engine outside ComfyUI
+# (os.pathsep separated, highest priority first)
+WILDCARD_DIRS_ENV = "PROMPTFLOW_WILDCARD_DIRS"
+
+
+def batch_seeds(seed, batch_size=1, seed_stride=1):
+    """Seeds of a batch: seed, seed + stride, seed + 2 * stride, ..."""
+    batch_size = max(1, min(int(batch_size), MAX_BATCH_SIZE))
+    return [seed + k * seed_stride for k in range(batch_size)]
+
+
+def wildcard_roots(dirs):
+    """
+    Normalize a wildcard directory list to [(source, directory), ...].
+    Plain directory strings get the sources "dir0", "dir1", ...
+    """
+    roots = []
+    for i, item in enumerate(dirs or ()):
+        if isinstance(item, (str, os.PathLike)):
+            roots.append((f"dir{i}", os.fspath(item)))
+        else:
+            source, directory = item
+            roots.append((source, os.fspath(directory)))
+    return roots
+
+
+class PromptEngine:
+    """
+    Prompt resolution over one wildcard registry.
+
+    Args:
+        wildcard_dirs: Wildcard directories, highest priority first: a list
+            of paths or (source, path) pairs, or a callable returning
+            (source, path) pairs (called on every freshness check, so the
+            directories may change at runtime)
+        registry: Existing WildcardRegistry to use instead
+        **registry_options: WildcardRegistry arguments (check_interval,
+            index_dir, cache_path, ...)
+    """
+
+    SIMPLE_FIELDS = SIMPLE_FIELDS
+    EXTENDED_FIELDS = EXTENDED_FIELDS
+
+    def __init__(self, wildcard_dirs=(), registry=None, **registry_options):
+        if registry is None:
+            if callable(wildcard_dirs):
+                provider = wildcard_dirs
+            else:
+                roots = wildcard_roots(wildcard_dirs)
+                provider = lambda: roots
+            registry = WildcardRegistry(provider, **registry_options)
+        self.registry = registry
+
+    def get_options(self, name):
+        """Option list of a wildcard file, or None if it does not exist"""
+        return self.registry.get_options(name)
+
+    def fingerprint(self, texts):
+        """
+        Fingerprint of the wildcard files referenced by texts (recursively),
+        or None when they reference none
+        """
+        names = set()
+        for text in texts:
+            if "__" in text:
+                names.update(FILE_PATTERN.findall(text))
+        if not names:
+            return None
+        return self.registry.fingerprint(names)
+
+    def resolve(self, widget_data, seed=0, trigger_words="", input_prompt=""):
+        """
+        Resolve the positive and negative prompts for one seed.
+
+        Returns:
+            Tuple of (positive, negative, compiled widget data)
+        """
+        positives, negatives, compiled = self.resolve_batch(
+            widget_data, [seed], trigger_words, input_prompt
+        )
+        return (positives[0], negatives[0], compiled)
+
+    def resolve_batch(self, widget_data, seeds, trigger_words="", input_prompt=""):
+        """
+        Resolve the positive and negative prompts for several seeds in one
+        pass. The widget data is compiled once, each wildcard file is looked
+        up once for the whole batch, the shuffle space is counted once and
+        the (seed independent) negative prompt is resolved once. Seed k
+        gives the same prompts as resolve(widget_data, k).
+
+        Args:
+            widget_data: JSON string containing all field values and settings
+            seeds: List of seeds
+            trigger_words: Optional trigger words from LoRA Manager
+            input_prompt: Optional prompt to prepend
+
+        Returns:
+            Tuple of (positives, negatives, compiled widget data), one
+            prompt per seed
+        """
+        # Parse and compile widget data (cached across seeds)
+        compiled = compile_widget_data(
+            widget_data, self.SIMPLE_FIELDS, self.EXTENDED_FIELDS
+        )
+        get_options = cached_lookup(self.registry.get_options)
+
+        # 1. Trigger words first (from LoRA Manager), 2. input prompt
+        prefix_parts = []
+        if trigger_words and trigger_words.strip():
+            prefix_parts.append(trigger_words.strip())
+        if input_prompt and input_prompt.strip():
+            prefix_parts.append(input_prompt.strip())
+
+        positives = []
+        with _RESOLVE_TIMER.time():
+            # Shuffle-mode fields share one permuted variation space, so seeds
+            # 0..N-1 give N distinct combinations across those fields
+            shuffle_texts = [t for _f, m, t in compiled.fields if m == "shuffle"]
+            seed_indices, counter = shuffled_indices_batch(
+                shuffle_texts, seeds, get_options
+            )
+
+            for seed, indices in zip(seeds, seed_indices):
+                # Initialize random with seed for deterministic results
+                rng = random.Random(seed)
+                indices = iter(indices)
+
+                # Process each field
+                prompt_parts = []
+                for _field, field_mode, text in compiled.fields:
+                    # Process wildcards based on field mode
+                    if field_mode == "shuffle":
+                        processed = text.render(next(indices), get_options, counter)
+                    else:
+                        selector = OptionSelector(field_mode, rng, seed)
+                        processed = text.resolve(selector, get_options)
+
+                    if processed:
+                        prompt_parts.append(processed)
+
+                # 3. Main prompt content; joined and cleaned up (duplicate
+                # commas, whitespace) in one pass
+                positives.append(cleanup_join(prefix_parts + prompt_parts))
+
+            # Negative prompt (fixed mode: the same for every seed)
+            negative = compiled.negative.resolve(
+                OptionSelector("fixed", None, seeds[0] if seeds else 0), get_options
+            )
+        negative = cleanup_prompt(negative)
+
+        return (positives, [negative] * len(seeds), compiled)
+
+    def resolve_prompt(self, prompt, seed=0, mode="random"):
+        """
+        Resolve a raw wildcard prompt (not PromptFlow widget data) for one
+        seed, using the same wildcard and cleanup rules as a category.
+        """
+        rng = random.Random(seed)
+        return cleanup_prompt(self.resolve_text(prompt, mode, rng, seed))
+
+    def resolve_text(self, text, mode, rng, seed):
+        """
+        Process wildcard syntax in text.
+        Supports both:
+        - Inline wildcards: {option1|option2|option3}, which may nest
+        - File wildcards: __wildcard_name__, expanded recursively
+
+        Args:
+            text: Text containing wildcards
+            mode: Processing mode (fixed, random, increment, decrement,
+                shuffle)
+            rng: Random number generator instance
+            seed: Seed value for increment/decrement modes
+
+        Returns:
+            Processed text with wildcards resolved
+        """
+        if not text:
+            return text
+
+        compiled = compile_text(text)
+        get_options = self.registry.get_options
+
+        with _RESOLVE_TIMER.time():
+            if mode == "shuffle":
+                indices, counter = shuffled_indices([compiled], seed, get_options)
+                return compiled.render(indices[0], get_options, counter)
+
+            return compiled.resolve(OptionSelector(mode, rng, seed), get_options)
+
+
+# Engine used by the nodes; the ComfyUI bindings install theirs at import
+_default_engine = None
+
+
+def default_engine():
+    """
+    The shared engine. Unless set_default_engine() installed one, it reads
+    the directories in $PROMPTFLOW_WILDCARD_DIRS (none if unset).
+    """
+    global _default_engine
+    if _default_engine is None:
+        dirs = os.environ.get(WILDCARD_DIRS_ENV, "")
+        _default_engine = PromptEngine([d for d in dirs.split(os.pathsep) if d])
+    return _default_engine
+
+
+def set_default_engine(engine):
+    """Make engine the shared engine used by the nodes"""
+    global _default_engine
+    _default_engine = engine
@@ -0,0 +1,488 @@
+"""
+PromptFlow Wildcard Expansion
+Recursive-descent parsing, expansion and counting of nested wildcard templates
+"""
+
+import logging
+import re
+from bisect import bisect_right
+from functools import lru_cache
+
+from .metrics import METRICS
+from .weights import WeightedOptions, option_probability, split_weight
+
+logger = logging.getLogger("promptflow.expansion")
+
+
+# File-based wildcards: __name__ or __path/name__
+FILE_PATTERN = re.compile(r"__([a-zA-Z0-9_\-/]+)__")
+
+# Everything the parser cares about: file references and brace syntax
+TOKEN_PATTERN = re.compile(FILE_PATTERN.pattern + r"|[{}|]")
+
+# Node kinds. A template parses into a sequence (tuple) of nodes:
+#   "literal text"
+#   (CHOICE, alternatives, source)      -- {a|b|c}, alternatives may nest;
+#                                          a tuple of sequences, or a
+#                                          WeightedOptions for {2::a|b}
+#   (FILE, name, source)                -- __name__
+CHOICE = "choice"
+FILE = "file"
+
+# Maximum number of wildcard files expanded inside each other
+MAX_DEPTH = 16
+
+
+def _append_literal(seq, text):
+    if not text:
+        return
+    if seq and seq[-1].__class__ is str:
+        seq[-1] += text
+    else:
+        seq.append(text)
+
+
+def _strip_sequence(seq):
+    """Strip surrounding whitespace of an alternative, like str.strip()"""
+    if seq and seq[0].__class__ is str:
+        seq[0] = seq[0].lstrip()
+        if not seq[0]:
+            del seq[0]
+    if seq and seq[-1].__class__ is str:
+        seq[-1] = seq[-1].rstrip()
+        if not seq[-1]:
+            del seq[-1]
+    return tuple(seq)
+
+
+def _choice_alternatives(inner):
+    """
+    Strip the alternatives of a choice and take off "2::" weight prefixes.
+    Returns a tuple, or a WeightedOptions when any weight is given.
+    """
+    alternatives = []
+    weights = []
+    for alt in inner:
+        weight = None
+        if alt and alt[0].__class__ is str:
+            weight, alt[0] = split_weight(alt[0])
+        weights.append(1.0 if weight is None else weight)
+        alternatives.append(_strip_sequence(alt))
+    if all(weight == 1.0 for weight in weights):
+        return tuple(alternatives)
+    return WeightedOptions(alternatives, weights)
+
+
+def _build(text, tokens, pairs, lo, hi, start, stop, split):
+    """
+    Build node sequences from tokens[lo:hi], which cover text[start:stop].
+    Inside braces (split=True) "|" separates alternatives; returns the list
+    of alternatives (a single one outside braces).
+    """
+    alternatives = []
+    seq = []
+    pos = start
+    i = lo
+    while i < hi:
+        token_start, token_end, name, char = tokens[i]
+        if name is not None:
+            _append_literal(seq, text[pos:token_start])
+            seq.append((FILE, name, text[token_start:token_end]))
+            pos = token_end
+        elif char == "|" and split:
+            _append_literal(seq, text[pos:token_start])
+            alternatives.append(seq)
+            seq = []
+            pos = token_end
+        elif char == "{" and i in pairs:
+            close = pairs[i]
+            close_start, close_end = tokens[close][0], tokens[close][1]
+            _append_literal(seq, text[pos:token_start])
+            if close_start == token_end:
+                # "{}" is not a choice; keep it as text
+                _append_literal(seq, "{}")
+            else:
+                inner = _build(
+                    text, tokens, pairs, i + 1, close, token_end, close_start, True
+                )
+                seq.append(
+                    (CHOICE, _choice_alternatives(inner), text[token_start:close_end])
+                )
+            pos = close_end
+            i = close
+        # Unmatched braces and top-level pipes stay part of the literal text
+        i += 1
+
+    _append_literal(seq, text[pos:stop])
+    alternatives.append(seq)
+    return alternatives
+
+
+@lru_cache(maxsize=4096)
+def parse_template(text):
+    """
+    Parse wildcard text into a tuple of nodes (see CHOICE / FILE).
+
+    Braces nest: ``{red|{dark|light} blue}`` is a choice whose second
+    alternative holds another choice. Unbalanced braces, a bare ``{}`` and
+    pipes outside braces are kept as literal text. Parsed templates are
+    cached, so each wildcard option is parsed at most once.
+    """
+    tokens = [
+        (m.start(), m.end(), m.group(1), m.group(0))
+        for m in TOKEN_PATTERN.finditer(text)
+    ]
+
+    # Pair braces with a stack; whatever stays unpaired is literal
+    pairs = {}
+    opened = []
+    for i, token in enumerate(tokens):
+        if token[2] is not None:
+            continue
+        if token[3] == "{":
+            opened.append(i)
+        elif token[3] == "}" and opened:
+            pairs[opened.pop()] = i
+
+    seq = _build(text, tokens, pairs, 0, len(tokens), 0, len(text), False)[0]
+    return tuple(seq)
+
+
+METRICS.register_cache_info("parse_template", parse_template.cache_info)
+
+
+def sequence_source(seq):
+    """Original text of a parsed sequence"""
+    return "".join(node if node.__class__ is str else node[2] for node in seq)
+
+
+def is_plain_option(option):
+    """True when an option has no syntax and expands to itself"""
+    return "{" not in option and "__" not in option
+
+
+# Plain-file checks keyed by id(options); the options object is kept in the
+# entry so a recycled id can never match a different list
+_plain_files = {}
+_PLAIN_FILES_MAX = 256
+
+
+def is_plain_file(options):
+    """True when no option of a wildcard file needs parsing (cached)"""
+    # Line-indexed files know from their index; iterating would read them
+    has_syntax = getattr(options, "has_syntax", None)
+    if has_syntax is not None:
+        return not has_syntax
+
+    cached = _plain_files.get(id(options))
+    if cached is not None and cached[0] is options:
+        return cached[1]
+
+    plain = not any("{" in option or "__" in option for option in options)
+    if len(_plain_files) >= _PLAIN_FILES_MAX:
+        _plain_files.clear()
+    _plain_files[id(options)] = (options, plain)
+    return plain
+
+
+def _warn_missing(name):
+    logger.warning("[PromptFlow] Wildcard '__%s__' not found or empty", name)
+
+
+def _warn_unexpanded(name, stack, max_depth):
+    if name in stack:
+        chain = " -> ".join(f"__{n}__" for n in stack + [name])
+        logger.warning("[PromptFlow] Wildcard cycle %s; left unexpanded", chain)
+    else:
+        logger.warning(
+            "[PromptFlow] Wildcard '__%s__' nested deeper than %d levels; "
+            "left unexpanded",
+            name,
+            max_depth,
+        )
+
+
+def slot_order(seq, inline_first=False):
+    """
+    Indices of the choice and file nodes of a sequence in selection order.
+    Resolution picks files first, then choices (left to right); the
+    variations preview lists choices first.
+    """
+    files = []
+    choices = []
+    for i, node in enumerate(seq):
+        if node.__class__ is str:
+            continue
+        (files if node[0] == FILE else choices).append(i)
+    return choices + files if inline_first else files + choices
+
+
+def expand(seq, selector, get_options, max_depth=MAX_DEPTH, stack=None):
+    """
+    Resolve a parsed template for one run.
+
+    Within a sequence, file wildcards are picked first and then inline
+    choices, each left to right; whatever a pick contains is expanded right
+    away. A wildcard file that is already being expanded (a cycle) or that
+    would exceed max_depth is left as ``__name__``.
+
+    Args:
+        seq: Parsed template from parse_template()
+        selector: Object with select(options) (see OptionSelector)
+        get_options: Callable mapping a wildcard name to its options
+        max_depth: Maximum wildcard file nesting
+        stack: Names of the wildcard files being expanded (internal)
+
+    Returns:
+        Resolved text
+    """
+    if stack is None:
+        stack = []
+    out = [node if node.__class__ is str else node[2] for node in seq]
+
+    for i in slot_order(seq):
+        node = seq[i]
+        if node[0] == CHOICE:
+            out[i] = expand(
+                selector.select(node[1]), selector, get_options, max_depth, stack
+            )
+            continue
+
+        name = node[1]
+        if name in stack or len(stack) >= max_depth:
+            _warn_unexpanded(name, stack, max_depth)
+            continue
+        options = get_options(name)
+        if not options:
+            # Wildcard file not found or empty, keep the original text
+            _warn_missing(name)
+            continue
+
+        picked = selector.select(options)
+        if is_plain_option(picked):
+            out[i] = picked
+            continue
+        stack.append(name)
+        try:
+            out[i] = expand(
+                parse_template(picked), selector, get_options, max_depth, stack
+            )
+        finally:
+            stack.pop()
+
+    return "".join(out)
+
+
+class ExpansionCounter:
+    """
+    Exact counting and index-addressed rendering of template expansions.
+
+    The expansions of a sequence form a mixed-radix space over its slots
+    (in slot_order), and a choice or wildcard file concatenates the spaces
+    of its alternatives, so every expansion has one index in
+    [0, count(seq)) and can be rendered without generating the others.
+    Two different indices may still render the same text when alternatives
+    happen to coincide.
+
+    Wildcard files are counted once per counter. Counts that depended on
+    the expansion context (a cycle cut or the depth limit) are not reused
+    where that context differs.
+
+    Args:
+        get_options: Callable mapping a wildcard name to its options
+        max_depth: Maximum wildcard file nesting
+    """
+
+    def __init__(self, get_options, max_depth=MAX_DEPTH):
+        self.get_options = get_options
+        self.max_depth = max_depth
+        # name -> (options, count, cumulative counts or None, height, reach,
+        #          context_dependent)
+        self._files = {}
+        # id(seq) -> (seq, count, height, reach, context_dependent)
+        self._sequences = {}
+
+    # ------------------------------------------------------------------
+    # Counting
+    # ------------------------------------------------------------------
+
+    def count(self, seq):
+        """Number of distinct expansion indices of a parsed template"""
+        return self._count_seq(seq, [])[0]
+
+    def count_node(self, node, stack=()):
+        """Number of expansions of a single choice or file node"""
+        return self._count_node(node, list(stack))[0]
+
+    def _count_seq(self, seq, stack):
+        """Return (count, height, reach, context_dependent)"""
+        cached = self._sequences.get(id(seq))
+        if (
+            cached is not None
+            and cached[0] is seq
+            and not cached[4]
+            and self._reusable(cached[2], cached[3], stack)
+        ):
+            return cached[1:]
+
+        count = 1
+        height = 0
+        reach = frozenset()
+        dependent = False
+        for node in seq:
+            if node.__class__ is str:
+                continue
+            n, h, r, d = self._count_node(node, stack)
+            count *= n
+            height = max(height, h)
+            reach |= r
+            dependent |= d
+
+        result = (count, height, reach, dependent)
+        self._sequences[id(seq)] = (seq,) + result
+        return result
+
+    def _count_node(self, node, stack):
+        if node[0] == CHOICE:
+            count = 0
+            height = 0
+            reach = frozenset()
+            dependent = False
+            for alternative in node[1]:
+                n, h, r, d = self._count_seq(alternative, stack)
+                count += n
+                height = max(height, h)
+                reach |= r
+                dependent |= d
+            return count, height, reach, dependent
+
+        entry = self._file_entry(node[1], stack)
+        if entry is None:
+            # Left unexpanded (cycle or depth limit): depends on the context
+            return 1, 0, frozenset(), True
+        if entry is False:
+            # Missing or empty file: kept as text
+            return 1, 0, frozenset(), False
+        return entry[1], entry[3], entry[4], entry[5]
+
+    def _reusable(self, height, reach, stack):
+        return len(stack) + height <= self.max_depth and not reach.intersection(stack)
+
+    def _file_entry(self, name, stack):
+        """
+        Counting data for a wildcard file in the current context: None when
+        the file would be left unexpanded here, False when it is missing,
+        otherwise the (options, count, cumulative, ...) entry.
+        """
+        if name in stack or len(stack) >= self.max_depth:
+            return None
+
+        options = self.get_options(name)
+        if not options:
+            return False
+
+        cached = self._files.get(name)
+        if (
+            cached is not None
+            and cached[0] is options
+            and self._reusable(cached[3], cached[4], stack)
+        ):
+            return cached
+
+        if is_plain_file(options):
+            entry = (options, len(options), None, 1, frozenset((name,)), False)
+            self._files[name] = entry
+            return entry
+
+        stack.append(name)
+        try:
+            cumulative = []
+            total = 0
+            height = 0
+            reach = frozenset((name,))
+            dependent = False
+            for option in options:
+                if is_plain_option(option):
+                    total += 1
+                else:
+                    n, h, r, d = self._count_seq(parse_template(option), stack)
+                    total += n
+                    height = max(height, h)
+                    reach |= r
+                    dependent |= d
+                cumulative.append(total)
+        finally:
+            stack.pop()
+
+        entry = (options, total, cumulative, height + 1, reach, dependent)
+        if not dependent:
+            self._files[name] = entry
+        return entry
+
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+
+    def render(self, seq, index):
+        """Render expansion number index (0 <= index < count(seq))"""
+        return self._render_seq(seq, index, [])[0]
+
+    def render_with_probability(self, seq, index):
+        """
+        Render expansion number index and return (text, probability), the
+        probability being that of a random-mode run taking this path
+        (option weights included).
+        """
+        return self._render_seq(seq, index, [])
+
+    def render_node(self, node, index, stack=()):
+        """Render expansion index of a single node; returns (text, probability)"""
+        return self._render_node(node, index, list(stack))
+
+    def _render_seq(self, seq, index, stack):
+        order = slot_order(seq)
+        if not order:
+            return "".join(seq), 1.0
+
+        radices = [self._count_node(seq[i], stack)[0] for i in order]
+        digits = [0] * len(radices)
+        for k in range(len(radices) - 1, -1, -1):
+            index, digits[k] = divmod(index, radices[k])
+
+        out = [node if node.__class__ is str else node[2] for node in seq]
+        probability = 1.0
+        for i, digit in zip(order, digits):
+            out[i], p = self._render_node(seq[i], digit, stack)
+            probability *= p
+        return "".join(out), probability
+
+    def _render_node(self, node, index, stack):
+        if node[0] == CHOICE:
+            alternatives = node[1]
+            for k, alternative in enumerate(alternatives):
+                n = self._count_seq(alternative, stack)[0]
+                if index < n:
+                    text, p = self._render_seq(alternative, index, stack)
+                    return text, p * option_probability(alternatives, k)
+                index -= n
+            raise IndexError("expansion index out of range")
+
+        entry = self._file_entry(node[1], stack)
+        if not entry:
+            return node[2], 1.0
+        options, cumulative = entry[0], entry[2]
+        if cumulative is None:
+            return options[index], option_probability(options, index)
+
+        k = bisect_right(cumulative, index)
+        option = options[k]
+        p = option_probability(options, k)
+        if is_plain_option(option):
+            return option, p
+        offset = cumulative[k - 1] if k else 0
+        stack.append(node[1])
+        try:
+            text, sub = self._render_seq(parse_template(option), index - offset, stack)
+        finally:
+            stack.pop()
+        return text, p * sub
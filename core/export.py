@@ -0,0 +1,367 @@
+"""
+PromptFlow Variation Export
+Streams every resolved combination of a template to JSONL or CSV in index
+order, optionally rendering index ranges on several processes
+
+Usage (from the PromptFlow directory):
+    python -m core.export "a {red|blue} __animals__" -o prompts.jsonl
+    python -m core.export --widget-data workflow_widget.json --format csv \\
+        --wildcards ../../wildcards --workers 8 -o prompts.csv --resume
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+
+from .engine import EXTENDED_FIELDS, SIMPLE_FIELDS
+from .variations import VariationSpace, template_from_prompt_input
+from .wildcards import WildcardRegistry
+
+FORMATS = ("jsonl", "csv")
+ORDERS = ("sequential", "shuffle")
+
+# Combinations rendered per task; also the checkpoint granularity
+DEFAULT_SHARD_SIZE = 5000
+
+# Tasks queued per worker process; bounds memory to a few shards
+SHARDS_IN_FLIGHT_PER_WORKER = 2
+
+CONTENT_TYPES = {
+    "jsonl": "application/x-ndjson; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+}
+
+_DEFAULT_WILDCARDS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "wildcards"
+)
+
+
+def csv_header(order="sequential"):
+    """CSV header line (bytes) for an export"""
+    columns = ["index", "prompt", "probability"]
+    if order == "shuffle":
+        columns.insert(1, "variation")
+    return (",".join(columns) + "\r\n").encode("utf-8")
+
+
+def render_range(space, start, stop, fmt="jsonl", order="sequential", key=0):
+    """
+    Render combinations [start, stop) of a VariationSpace as encoded lines.
+
+    Rows match the streaming /promptflow/variations API: "index", "prompt"
+    and "probability", plus the combination index as "variation" when
+    ``order`` is "shuffle" (where "index" is the shuffled position).
+
+    Returns:
+        bytes
+    """
+    if order == "shuffle":
+        rows = space.iter_shuffled(start, stop, key)
+    else:
+        rows = space.iter_range(start, stop)
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+    dumps = json.dumps
+    if order == "shuffle":
+        lines = [
+            dumps(
+                {
+                    "index": position,
+                    "variation": index,
+                    "prompt": prompt,
+                    "probability": probability,
+                }
+            )
+            for position, index, prompt, probability in rows
+        ]
+    else:
+        lines = [
+            dumps({"index": index, "prompt": prompt, "probability": probability})
+            for index, prompt, probability in rows
+        ]
+    return ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+
+
+def open_registry(roots, index_dir=None):
+    """Read-only wildcard registry over [(source, directory), ...]"""
+    return WildcardRegistry(
+        lambda: roots, check_interval=float("inf"), index_dir=index_dir
+    )
+
+
+# Per-process state of pool workers
+_worker = {}
+
+
+def _init_worker(template, roots, index_dir):
+    registry = open_registry(roots, index_dir)
+    _worker["space"] = VariationSpace(template, registry.get_options)
+
+
+def _render_shard(start, stop, fmt, order, key):
+    return render_range(_worker["space"], start, stop, fmt, order, key)
+
+
+def export_variations(
+    template,
+    out,
+    roots,
+    start=0,
+    stop=None,
+    fmt="jsonl",
+    order="sequential",
+    key=0,
+    workers=1,
+    shard_size=DEFAULT_SHARD_SIZE,
+    index_dir=None,
+    checkpoint=None,
+):
+    """
+    Write combinations [start, stop) of a template to a binary stream.
+
+    Rows are produced shard by shard and written in index order. With
+    ``workers`` > 1 the shards are rendered by a process pool, keeping at
+    most a few shards per worker in flight, so memory stays constant no
+    matter how many rows are exported.
+
+    Args:
+        template: Prompt text with wildcards
+        out: Binary file object
+        roots: Wildcard directories as [(source, directory), ...]
+        start: First combination (or shuffled position) to write
+        stop: End of the range (None = all combinations)
+        fmt: "jsonl" or "csv" (no header; see csv_header)
+        order: "sequential" or "shuffle"
+        key: Shuffle key
+        workers: Number of processes (1 renders in this process)
+        shard_size: Combinations per shard
+        index_dir: Directory for line index sidecars of large files
+        checkpoint: Called with the next index after each shard is written
+
+    Returns:
+        Number of rows written
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    if order not in ORDERS:
+        raise ValueError(f"order must be one of {', '.join(ORDERS)}")
+
+    registry = open_registry(roots, index_dir)
+    space = VariationSpace(template, registry.get_options)
+    stop = space.total if stop is None else min(stop, space.total)
+    if start >= stop:
+        return 0
+
+    shards = (
+        (begin, min(begin + shard_size, stop))
+        for begin in range(start, stop, shard_size)
+    )
+
+    def write(end, data):
+        out.write(data)
+        if checkpoint is not None:
+            out.flush()
+            checkpoint(end)
+
+    if workers <= 1:
+        for begin, end in shards:
+            write(end, render_range(space, begin, end, fmt, order, key))
+        return stop - start
+
+    # Imported here: the API server only needs this module's constants
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(template, roots, index_dir),
+    ) as pool:
+        pending = deque()
+        limit = workers * SHARDS_IN_FLIGHT_PER_WORKER
+        for begin, end in shards:
+            pending.append(
+                (end, pool.submit(_render_shard, begin, end, fmt, order, key))
+            )
+            if len(pending) >= limit:
+                end, future = pending.popleft()
+                write(end, future.result())
+        while pending:
+            end, future = pending.popleft()
+            write(end, future.result())
+    return stop - start
+
+
+# ============================================================================
+# COMMAND LINE
+# ============================================================================
+
+
+def _job_hash(template, fmt, order, key, start, stop, roots):
+    """Identity of an export for --resume: everything that shapes its rows"""
+    text = json.dumps([template, fmt, order, key, start, stop, roots])
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _read_progress(path, job):
+    """(next index, byte size) of a matching interrupted export, or None"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            progress = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if progress.get("job") != job:
+        return None
+    return progress["next"], progress["bytes"]
+
+
+def _write_progress(path, job, next_index, size):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"job": job, "next": next_index, "bytes": size}, f)
+    os.replace(tmp, path)
+
+
+def _parse_roots(values):
+    """--wildcards values ("DIR" or "SOURCE=DIR") as [(source, dir), ...]"""
+    roots = []
+    for i, value in enumerate(values or [_DEFAULT_WILDCARDS]):
+        source, sep, directory = value.partition("=")
+        if not sep or os.path.isdir(value):
+            source, directory = f"dir{i}", value
+        roots.append((source, os.path.abspath(directory)))
+    return roots
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m core.export",
+        description="Export every variation of a PromptFlow prompt",
+    )
+    parser.add_argument("template", nargs="?", help="Prompt with wildcards")
+    parser.add_argument(
+        "--widget-data", help="File with PromptFlow widget_data / prompt_data JSON"
+    )
+    parser.add_argument(
+        "--wildcards",
+        action="append",
+        metavar="[SOURCE=]DIR",
+        help="Wildcard directory, highest priority first (repeatable; "
+        "default: the PromptFlow wildcards folder)",
+    )
+    parser.add_argument("-o", "--out", default="-", help="Output file (- = stdout)")
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument("--order", choices=ORDERS, default="sequential")
+    parser.add_argument("--key", type=int, default=0, help="Shuffle key")
+    parser.add_argument("--start", type=int, default=0)
+    parser.add_argument("--stop", type=int, help="End index (exclusive)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument("--index-dir", help="Line index cache for large files")
+    parser.add_argument("--no-header", action="store_true", help="Omit the CSV header")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted export to the same --out file",
+    )
+    parser.add_argument(
+        "--count", action="store_true", help="Print the number of variations"
+    )
+    args = parser.parse_args(argv)
+
+    if args.widget_data:
+        with open(args.widget_data, "r", encoding="utf-8") as f:
+            text = f.read()
+        template = template_from_prompt_input(text, SIMPLE_FIELDS, EXTENDED_FIELDS)
+    elif args.template is not None:
+        template = args.template
+    else:
+        parser.error("a template or --widget-data is required")
+    if args.start < 0 or args.shard_size < 1:
+        parser.error("--start must be >= 0 and --shard-size >= 1")
+
+    roots = _parse_roots(args.wildcards)
+    if args.count:
+        registry = open_registry(roots, args.index_dir)
+        print(VariationSpace(template, registry.get_options).total)
+        return 0
+
+    if args.out == "-" and args.resume:
+        parser.error("--resume needs an --out file")
+
+    def export_to(out, start, header, checkpoint=None):
+        if header:
+            out.write(csv_header(args.order))
+        rows = export_variations(
+            template,
+            out,
+            roots,
+            start=start,
+            stop=args.stop,
+            fmt=args.format,
+            order=args.order,
+            key=args.key,
+            workers=args.workers,
+            shard_size=args.shard_size,
+            index_dir=args.index_dir,
+            checkpoint=checkpoint,
+        )
+        out.flush()
+        return rows
+
+    header = args.format == "csv" and not args.no_header
+    began = time.perf_counter()
+    if args.out == "-":
+        try:
+            rows = export_to(sys.stdout.buffer, args.start, header)
+        except BrokenPipeError:
+            # Reader went away (e.g. piped into head)
+            return 1
+    else:
+        job = _job_hash(
+            template,
+            args.format,
+            args.order,
+            args.key,
+            args.start,
+            args.stop,
+            roots,
+        )
+        progress_path = args.out + ".progress"
+        resumed = _read_progress(progress_path, job) if args.resume else None
+        with open(args.out, "wb" if resumed is None else "r+b") as out:
+            start = args.start
+            if resumed is not None:
+                start, size = resumed
+                # Drop anything written after the last checkpoint
+                out.truncate(size)
+                out.seek(size)
+                header = False
+                print(f"Resuming at {start}", file=sys.stderr)
+
+            def save_progress(next_index):
+                _write_progress(progress_path, job, next_index, out.tell())
+
+            rows = export_to(out, start, header, save_progress)
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+
+    elapsed = time.perf_counter() - began
+    rate = rows / elapsed if elapsed > 0 else 0.0
+    print(f"Exported {rows} rows in {elapsed:.1f}s ({rate:.0f}/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""
+PromptFlow Line-Indexed Wildcard Files
+Random access to options of very large wildcard files without loading them
+"""
+
+import hashlib
+import logging
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections.abc import Sequence
+
+from .metrics import METRICS
+from .weights import AliasTable, split_weight
+
+logger = logging.getLogger("promptflow.line_index")
+
+_BUILD_TIMER = METRICS.timer(
+    "line_index_build", "Scanning a large wildcard file for its line index"
+)
+_SIDECAR_CACHE = METRICS.cache("line_index_sidecar")
+
+
+# Sidecar layout: header, then one little-endian uint64 offset per option,
+# then (weighted files only) one little-endian float64 weight per option
+INDEX_MAGIC = b"PFLIDX04"
+INDEX_HEADER = struct.Struct("<8sQqQQ")  # magic, size, mtime_ns, count, flags
+
+# Header flags
+FLAG_WEIGHTS = 1  # weights follow the offsets (some weight differs from 1)
+FLAG_PREFIXED = 2  # some option has a weight prefix to strip
+FLAG_SYNTAX = 4  # some option uses {inline} or __file__ wildcards
+
+
+def _is_option(line_text):
+    """Same filter as parse_wildcard_lines: non-empty, not a # comment"""
+    return bool(line_text) and not line_text.startswith("#")
+
+
+def scan_option_offsets(filepath):
+    """
+    Scan a wildcard file once and return (offsets, weights, prefixed,
+    has_syntax): an array('Q') with the byte offset of every option line,
+    an array('d') with the option weights ("3::option") or None when they
+    are all 1, whether any line has a weight prefix (even "1::"), and
+    whether any option contains wildcard syntax that needs parsing.
+    """
+    offsets = array("Q")
+    weights = array("d")
+    weighted = False
+    prefixed = False
+    has_syntax = False
+    pos = 0
+    with open(filepath, "rb") as f:
+        for raw in f:
+            text = raw.decode("utf-8").strip()
+            if _is_option(text):
+                offsets.append(pos)
+                weight, option = split_weight(text)
+                if not has_syntax and ("{" in option or "__" in option):
+                    has_syntax = True
+                if weight is None:
+                    weight = 1.0
+                else:
+                    prefixed = True
+                    weighted = weighted or weight != 1.0
+                weights.append(weight)
+            pos += len(raw)
+    return offsets, (weights if weighted else None), prefixed, has_syntax
+
+
+class LineIndexedOptions(Sequence):
+    """
+    Read-only option list backed by a line-offset index.
+
+    Only the byte offset of each option is kept in memory (8 bytes per
+    option); picking option k seeks to its offset and reads one line. The
+    index is built by one sequential scan per file version and persisted as
+    a sidecar in ``index_dir`` so later runs skip the scan.
+
+    Weighted files also keep one weight per option and an AliasTable for
+    O(1) weighted picks (``weights``, ``total_weight``, ``alias``). Weight
+    prefixes are removed from the options returned, including "1::"
+    prefixes of files whose weights are all 1. ``has_syntax`` tells from the
+    index whether any option uses wildcard syntax, without reading them.
+
+    If the file changes underneath (size or mtime differ when reading), the
+    index is rebuilt before the read.
+
+    Args:
+        path: Wildcard file path
+        index_dir: Directory for persisted indexes (None = memory only)
+    """
+
+    def __init__(self, path, index_dir=None):
+        self.path = path
+        self.index_dir = index_dir
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._offsets = array("Q")
+        self.weights = None
+        self.total_weight = 0.0
+        self.alias = None
+        self._prefixed = False
+        self.has_syntax = True
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Index management
+    # ------------------------------------------------------------------
+
+    def _sidecar_path(self):
+        if not self.index_dir:
+            return None
+        digest = hashlib.blake2b(
+            os.path.abspath(self.path).encode("utf-8"), digest_size=16
+        ).hexdigest()
+        return os.path.join(self.index_dir, digest + ".idx")
+
+    def _read_sidecar(self, sidecar, stamp):
+        """
+        Return (offsets, weights, prefixed, has_syntax) from a sidecar
+        matching stamp, or None
+        """
+        try:
+            with open(sidecar, "rb") as f:
+                header = f.read(INDEX_HEADER.size)
+                if len(header) != INDEX_HEADER.size:
+                    return None
+                magic, size, mtime_ns, count, flags = INDEX_HEADER.unpack(header)
+                if magic != INDEX_MAGIC or (mtime_ns, size) != stamp:
+                    return None
+                offsets = array("Q")
+                offsets.frombytes(f.read(count * 8))
+                weights = None
+                if flags & FLAG_WEIGHTS:
+                    weights = array("d")
+                    weights.frombytes(f.read(count * 8))
+        except (OSError, ValueError):
+            return None
+
+        if len(offsets) != count or (weights is not None and len(weights) != count):
+            return None
+        if sys.byteorder != "little":
+            offsets.byteswap()
+            if weights is not None:
+                weights.byteswap()
+        return (
+            offsets,
+            weights,
+            bool(flags & FLAG_PREFIXED),
+            bool(flags & FLAG_SYNTAX),
+        )
+
+    def _write_sidecar(self, sidecar, stamp, offsets, weights, prefixed, has_syntax):
+        """Persist the index atomically; failures only cost a rescan later"""
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            data = array("Q", offsets)
+            weight_data = array("d", weights) if weights is not None else None
+            if sys.byteorder != "little":
+                data.byteswap()
+                if weight_data is not None:
+                    weight_data.byteswap()
+            flags = (
+                (FLAG_WEIGHTS if weight_data is not None else 0)
+                | (FLAG_PREFIXED if prefixed else 0)
+                | (FLAG_SYNTAX if has_syntax else 0)
+            )
+            tmp = f"{sidecar}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(
+                    INDEX_HEADER.pack(
+                        INDEX_MAGIC,
+                        stamp[1],
+                        stamp[0],
+                        len(data),
+                        flags,
+                    )
+                )
+                f.write(data.tobytes())
+                if weight_data is not None:
+                    f.write(weight_data.tobytes())
+            os.replace(tmp, sidecar)
+        except OSError as e:
+            logger.warning(
+                "[PromptFlow] Could not save line index for %s: %s", self.path, e
+            )
+
+    def _load(self):
+        """Load the index for the current file version, building if needed"""
+        st = os.stat(self.path)
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        sidecar = self._sidecar_path()
+        index = self._read_sidecar(sidecar, stamp) if sidecar else None
+        if index is None:
+            if sidecar:
+                _SIDECAR_CACHE.miss()
+            with _BUILD_TIMER.time():
+                index = scan_option_offsets(self.path)
+            if sidecar:
+                self._write_sidecar(sidecar, stamp, *index)
+        elif sidecar:
+            _SIDECAR_CACHE.hit()
+
+        offsets, weights, prefixed, has_syntax = index
+        self._stamp = stamp
+        self._offsets = offsets
+        self._prefixed = prefixed
+        self.has_syntax = has_syntax
+        self.weights = weights
+        if weights is not None:
+            self.total_weight = float(sum(weights))
+            self.alias = AliasTable(weights)
+        else:
+            self.total_weight = 0.0
+            self.alias = None
+
+    @property
+    def stamp(self):
+        """(mtime_ns, size) of the file version the index describes"""
+        return self._stamp
+
+    # ------------------------------------------------------------------
+    # Sequence interface
+    # ------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def _read_at(self, index):
+        with self._lock, open(self.path, "rb") as f:
+            st = os.fstat(f.fileno())
+            if (st.st_mtime_ns, st.st_size) != self._stamp:
+                self._load()
+                if not 0 <= index < len(self._offsets):
+                    raise IndexError("option index out of range")
+            f.seek(self._offsets[index])
+            text = f.readline().decode("utf-8").strip()
+        if self._prefixed:
+            text = split_weight(text)[1].lstrip()
+        return text
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._read_at(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("option index out of range")
+        return self._read_at(index)
+
+    def __iter__(self):
+        """Stream all options with one sequential read"""
+        prefixed = self._prefixed
+        with open(self.path, "rb") as f:
+            for raw in f:
+                text = raw.decode("utf-8").strip()
+                if _is_option(text):
+                    yield split_weight(text)[1].lstrip() if prefixed else text
+
+    def __repr__(self):
+        return f"<LineIndexedOptions {self.path!r} ({len(self)} options)>"
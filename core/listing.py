@@ -0,0 +1,257 @@
+"""
+PromptFlow Wildcard Listing
+Sorted, paginated and folder-by-folder views of the wildcard registry,
+serialized and compressed once per registry version
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+from bisect import bisect_left, bisect_right
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Fields of a wildcard entry that a listing can select
+WILDCARD_FIELDS = ("name", "source", "path", "file")
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+
+# Serialized views kept per registry version
+MAX_CACHED_VIEWS = 256
+
+# Sorts after every character that can appear in a wildcard name
+_MAX_CHAR = "\U0010ffff"
+
+
+def accepted_encoding(header):
+    """
+    Pick the response compression for an Accept-Encoding header.
+    Returns "br" (when the brotli package is installed), "gzip" or None.
+    """
+    offered = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        offered[coding] = quality
+
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if offered.get(coding, offered.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+def compress(body, encoding):
+    """Compress a response body with "br" or "gzip" (None returns it as is)"""
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    return body
+
+
+def parse_fields(value):
+    """
+    Parse a comma separated field selector.
+
+    Returns:
+        Tuple of field names, or None for all fields
+
+    Raises:
+        ValueError: For unknown fields
+    """
+    if not value:
+        return None
+    fields = tuple(f.strip() for f in value.split(",") if f.strip())
+    unknown = [f for f in fields if f not in WILDCARD_FIELDS]
+    if unknown:
+        raise ValueError(
+            f"Unknown field(s) {', '.join(unknown)}; "
+            f"expected {', '.join(WILDCARD_FIELDS)}"
+        )
+    return fields or None
+
+
+def folder_prefix(prefix):
+    """Normalize a folder name to the "a/b/" form ("" for the root)"""
+    prefix = (prefix or "").strip().strip("/")
+    return prefix + "/" if prefix else ""
+
+
+class WildcardListing:
+    """
+    Views of the wildcard registry for the listing API.
+
+    The entries are sorted once per registry version. Pages are located by
+    binary search on the sorted names: a page starts right after the
+    ``cursor`` name (or at the first name with the ``prefix``), so paging
+    costs O(log n + limit) and stays stable when wildcards are added.
+    Folder views list the immediate children of a folder and skip each
+    subfolder with one binary search.
+
+    Serialized bodies, their ETags and compressed variants are cached until
+    the registry version changes.
+
+    Args:
+        registry: WildcardRegistry to list
+        directories: Extra "directories" info for the full listing
+    """
+
+    def __init__(self, registry, directories=None):
+        self.registry = registry
+        self.directories = directories or {}
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries = []
+        self._names = []
+        self._views = {}  # (view key, encoding) -> (body, etag, encoding)
+
+    def _sorted(self):
+        """(entries, names) sorted by name, for the current registry version"""
+        entries = self.registry.entries()
+        version = self.registry.version
+        with self._lock:
+            if self._version != version:
+                self._entries = sorted(entries.values(), key=lambda e: e["name"])
+                self._names = [e["name"] for e in self._entries]
+                self._views = {}
+                self._version = version
+            return self._entries, self._names
+
+    @staticmethod
+    def _select(entry, fields):
+        if fields is None:
+            return entry
+        return {field: entry[field] for field in fields}
+
+    def _range(self, names, prefix):
+        """Index range of the names starting with prefix"""
+        start = bisect_left(names, prefix)
+        end = bisect_left(names, prefix + _MAX_CHAR, start) if prefix else len(names)
+        return start, end
+
+    def all(self, fields=None):
+        """Payload listing every wildcard"""
+        entries, _names = self._sorted()
+        return {
+            "wildcards": [self._select(e, fields) for e in entries],
+            "directories": self.directories,
+        }
+
+    def page(self, prefix="", cursor=None, limit=None, fields=None):
+        """
+        Payload of one page of wildcards whose names start with prefix.
+
+        Args:
+            prefix: Name prefix, e.g. "styles/" for one folder
+            cursor: "next_cursor" of the previous page
+            limit: Maximum number of wildcards (None for all)
+            fields: Entry fields to include (None for all)
+
+        Returns:
+            dict with "wildcards", "total" (names with the prefix) and
+            "next_cursor" (None on the last page)
+        """
+        entries, names = self._sorted()
+        start, end = self._range(names, prefix)
+        total = end - start
+        if cursor:
+            start = max(start, bisect_right(names, cursor, 0, end))
+        stop = end if limit is None else min(end, start + limit)
+        return {
+            "prefix": prefix,
+            "total": total,
+            "wildcards": [self._select(e, fields) for e in entries[start:stop]],
+            "next_cursor": names[stop - 1] if stop < end and stop > start else None,
+        }
+
+    def tree(self, prefix="", fields=None):
+        """
+        Payload of one folder: its subfolders (with wildcard counts) and
+        the wildcards directly inside it.
+        """
+        folder = folder_prefix(prefix)
+        entries, names = self._sorted()
+        start, end = self._range(names, folder)
+
+        folders = []
+        wildcards = []
+        i = start
+        while i < end:
+            head, sep, _rest = names[i][len(folder) :].partition("/")
+            if sep:
+                child = folder + head + "/"
+                stop = bisect_left(names, child + _MAX_CHAR, i, end)
+                folders.append({"name": folder + head, "count": stop - i})
+                i = stop
+            else:
+                wildcards.append(self._select(entries[i], fields))
+                i += 1
+
+        return {
+            "prefix": folder,
+            "total": end - start,
+            "folders": folders,
+            "wildcards": wildcards,
+        }
+
+    def serialized(self, view="all", encoding=None, **params):
+        """
+        Serialize a view, compressed with encoding when the body is large
+        enough. The returned encoding is None if the body was left
+        uncompressed.
+
+        Args:
+            view: "all", "page" or "tree"
+            encoding: "br", "gzip" or None
+            **params: Arguments of the view method
+
+        Returns:
+            (body, etag, encoding)
+        """
+        self._sorted()
+        key = (view, tuple(sorted(params.items())))
+        with self._lock:
+            version = self._version
+            cached = self._views.get((key, encoding))
+            plain = self._views.get((key, None))
+        if cached is not None:
+            return cached
+
+        if plain is None:
+            payload = getattr(self, view)(**params)
+            body = json.dumps(payload).encode("utf-8")
+            etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+            plain = (body, etag, None)
+
+        result = plain
+        if encoding is not None and len(plain[0]) >= MIN_COMPRESS_SIZE:
+            body, etag, _none = plain
+            # Each representation needs its own ETag
+            etag = etag[:-1] + "-" + encoding + '"'
+            result = (compress(body, encoding), etag, encoding)
+
+        with self._lock:
+            if self._version != version:
+                return result
+            if len(self._views) >= MAX_CACHED_VIEWS:
+                self._views = {}
+            self._views[(key, None)] = plain
+            self._views[(key, encoding)] = result
+        return result
@@ -0,0 +1,351 @@
+"""
+PromptFlow Metrics
+In-process counters, timers and cache statistics for the hot paths,
+exported as JSON or Prometheus text
+"""
+
+import functools
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+logger = logging.getLogger("promptflow.metrics")
+
+# Upper bounds (seconds) of the latency histogram buckets
+TIMER_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+METRIC_PREFIX = "promptflow_"
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class _NullTiming:
+    """Context manager used while metrics are disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMING = _NullTiming()
+
+
+class _Timing:
+    __slots__ = ("_start", "_timer")
+
+    def __init__(self, timer):
+        self._timer = timer
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._timer.observe(time.perf_counter() - self._start)
+        return False
+
+
+class Counter:
+    """Monotonic counter; inc() is a no-op while metrics are disabled"""
+
+    def __init__(self, metrics, name, labels):
+        self._metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount=1):
+        if self._metrics.enabled:
+            with self._metrics._lock:
+                self.value += amount
+
+
+class Timer:
+    """Latency histogram with count, sum and max"""
+
+    def __init__(self, metrics, name, labels):
+        self._metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(TIMER_BUCKETS) + 1)  # last one is +Inf
+
+    def observe(self, seconds):
+        if not self._metrics.enabled:
+            return
+        with self._metrics._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self.buckets[bisect_left(TIMER_BUCKETS, seconds)] += 1
+
+    def time(self):
+        """Context manager timing its block"""
+        if not self._metrics.enabled:
+            return _NULL_TIMING
+        return _Timing(self)
+
+    def wrap(self, func):
+        """Decorator timing every call of func"""
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self._metrics.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.observe(time.perf_counter() - start)
+
+        return wrapper
+
+
+class CacheStats:
+    """Hit and miss counters of one cache"""
+
+    def __init__(self, metrics, name):
+        self.name = name
+        self.hits = metrics.counter("cache_requests_total", cache=name, result="hit")
+        self.misses = metrics.counter("cache_requests_total", cache=name, result="miss")
+
+    def hit(self, amount=1):
+        self.hits.inc(amount)
+
+    def miss(self, amount=1):
+        self.misses.inc(amount)
+
+
+class Metrics:
+    """
+    Registry of counters, timers, caches and gauges.
+
+    Instruments are created once (usually at import time) and updated from
+    the hot paths; while ``enabled`` is False every update returns right
+    away. Gauges and external caches (e.g. functools.lru_cache) are read
+    through callbacks when a snapshot is taken.
+
+    Args:
+        enabled: Whether updates are recorded
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> Counter
+        self._timers = {}  # (name, labels) -> Timer
+        self._caches = {}  # name -> CacheStats
+        self._cache_infos = {}  # name -> callable returning (hits, misses)
+        self._gauges = {}  # name -> callable returning a number
+        self._help = {}  # name -> description
+
+    # ------------------------------------------------------------------
+    # Instruments
+    # ------------------------------------------------------------------
+
+    def counter(self, name, help=None, **labels):
+        """Get or create the counter name{labels}"""
+        if help:
+            self._help[name] = help
+        key = (name, _label_key(labels))
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = Counter(self, name, key[1])
+        return counter
+
+    def timer(self, name, help=None, **labels):
+        """Get or create the timer name{labels}"""
+        if help:
+            self._help[name] = help
+        key = (name, _label_key(labels))
+        with self._lock:
+            timer = self._timers.get(key)
+            if timer is None:
+                timer = self._timers[key] = Timer(self, name, key[1])
+        return timer
+
+    def cache(self, name):
+        """Get or create the hit/miss counters of a cache"""
+        stats = self._caches.get(name)
+        if stats is None:
+            stats = self._caches[name] = CacheStats(self, name)
+        return stats
+
+    def register_cache_info(self, name, info):
+        """
+        Report a cache that keeps its own statistics.
+
+        Args:
+            name: Cache name
+            info: Callable returning an object with ``hits`` and ``misses``
+                (such as functools.lru_cache's ``cache_info``)
+        """
+        self._cache_infos[name] = info
+
+    def gauge(self, name, func, help=None):
+        """Report func() as the current value of name"""
+        if help:
+            self._help[name] = help
+        self._gauges[name] = func
+
+    def reset(self):
+        """Zero all counters and timers"""
+        with self._lock:
+            for counter in self._counters.values():
+                counter.value = 0
+            for timer in self._timers.values():
+                timer.count = 0
+                timer.total = 0.0
+                timer.max = 0.0
+                timer.buckets = [0] * (len(TIMER_BUCKETS) + 1)
+            self.started_at = time.time()
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+
+    def _cache_totals(self):
+        """{cache name: (hits, misses)} for all caches"""
+        totals = {}
+        for name, stats in self._caches.items():
+            totals[name] = (stats.hits.value, stats.misses.value)
+        for name, info in self._cache_infos.items():
+            try:
+                result = info()
+                totals[name] = (result.hits, result.misses)
+            except Exception:
+                logger.debug("[PromptFlow] Cache info %s failed", name, exc_info=True)
+        return totals
+
+    def _gauge_values(self):
+        values = {}
+        for name, func in self._gauges.items():
+            try:
+                values[name] = func()
+            except Exception:
+                logger.debug("[PromptFlow] Gauge %s failed", name, exc_info=True)
+        return values
+
+    def snapshot(self):
+        """All metrics as a JSON-serializable dict"""
+        with self._lock:
+            counters = [
+                {"name": c.name, "labels": dict(c.labels), "value": c.value}
+                for c in self._counters.values()
+                if c.name != "cache_requests_total"
+            ]
+            timers = [
+                {
+                    "name": t.name,
+                    "labels": dict(t.labels),
+                    "count": t.count,
+                    "total_seconds": t.total,
+                    "mean_seconds": t.total / t.count if t.count else 0.0,
+                    "max_seconds": t.max,
+                }
+                for t in self._timers.values()
+            ]
+
+        caches = {}
+        for name, (hits, misses) in self._cache_totals().items():
+            requests = hits + misses
+            caches[name] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": hits / requests if requests else None,
+            }
+
+        return {
+            "enabled": self.enabled,
+            "uptime_seconds": time.time() - self.started_at,
+            "counters": counters,
+            "timers": timers,
+            "caches": caches,
+            "gauges": self._gauge_values(),
+        }
+
+    def prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+
+        def header(name, kind, suffix=""):
+            full = METRIC_PREFIX + name + suffix
+            if name in self._help:
+                lines.append(f"# HELP {full} {self._help[name]}")
+            lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        with self._lock:
+            counters = {}
+            for c in self._counters.values():
+                if c.name != "cache_requests_total":
+                    counters.setdefault(c.name, []).append((c.labels, c.value))
+            timers = {}
+            for t in self._timers.values():
+                timers.setdefault(t.name, []).append(
+                    (t.labels, t.count, t.total, list(t.buckets))
+                )
+
+        for name, samples in sorted(counters.items()):
+            full = header(name, "counter")
+            for labels, value in samples:
+                lines.append(f"{full}{_format_labels(labels)} {value}")
+
+        cache_totals = self._cache_totals()
+        if cache_totals:
+            full = header("cache_requests_total", "counter")
+            for cache, (hits, misses) in sorted(cache_totals.items()):
+                for result, value in (("hit", hits), ("miss", misses)):
+                    labels = _format_labels((("cache", cache), ("result", result)))
+                    lines.append(f"{full}{labels} {value}")
+
+        for name, samples in sorted(timers.items()):
+            full = header(name, "histogram", "_seconds")
+            for labels, count, total, buckets in samples:
+                cumulative = 0
+                for bound, bucket in zip(TIMER_BUCKETS, buckets):
+                    cumulative += bucket
+                    le = _format_labels(labels, (("le", repr(bound)),))
+                    lines.append(f"{full}_bucket{le} {cumulative}")
+                le = _format_labels(labels, (("le", "+Inf"),))
+                lines.append(f"{full}_bucket{le} {count}")
+                lines.append(f"{full}_sum{_format_labels(labels)} {total!r}")
+                lines.append(f"{full}_count{_format_labels(labels)} {count}")
+
+        for name, value in sorted(self._gauge_values().items()):
+            full = header(name, "gauge")
+            lines.append(f"{full} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _env_enabled():
+    value = os.environ.get("PROMPTFLOW_METRICS", "1").strip().lower()
+    return value not in ("0", "false", "no", "off")
+
+
+# Process-wide metrics (disable with PROMPTFLOW_METRICS=0)
+METRICS = Metrics(enabled=_env_enabled())
@@ -0,0 +1,163 @@
+"""
+PromptFlow Preset Store
+Loads preset files once and serves pre-serialized JSON with ETags
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from .metrics import METRICS
+
+logger = logging.getLogger("promptflow.presets")
+
+_LOAD_TIMER = METRICS.timer("preset_load", "Reading and merging preset files")
+_PRESET_CACHE = METRICS.cache("presets")
+
+PRESET_TYPES = ("styles", "quality", "negatives")
+
+
+def _file_stamp(path):
+    """(mtime_ns, size) of a file, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _make_etag(body):
+    """Strong ETag for a response body"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+class PresetStore:
+    """
+    Cached, merged index of preset files.
+
+    Each directory may hold styles.json, quality.json and negatives.json
+    (lists of {"name", "value"}). Directories are merged in order; a preset
+    in a later directory replaces an earlier one with the same name, so user
+    directories can override built-ins.
+
+    Files are re-read only when their mtime or size changes, checked at most
+    once every ``check_interval`` seconds. Serialized JSON bodies and their
+    ETags are computed once per load.
+
+    Args:
+        dirs_provider: Callable returning preset directories in merge order
+        check_interval: Minimum seconds between mtime checks
+    """
+
+    def __init__(self, dirs_provider, check_interval=2.0):
+        self._dirs_provider = dirs_provider
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._stamps = None  # {path: stamp} used for the last load
+        self._presets = {}
+        self._bodies = {}  # None (all) or preset type -> (body, etag)
+        self._checked_at = 0.0
+
+    def _preset_files(self):
+        """All preset file paths, in merge order"""
+        return [
+            os.path.join(directory, f"{preset_type}.json")
+            for directory in self._dirs_provider()
+            for preset_type in PRESET_TYPES
+        ]
+
+    def _load(self, paths):
+        """Read and merge preset files; return (presets, bodies)"""
+        presets = {preset_type: [] for preset_type in PRESET_TYPES}
+        positions = {preset_type: {} for preset_type in PRESET_TYPES}
+
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            preset_type = os.path.basename(path)[: -len(".json")]
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(
+                    "[PromptFlow] Error loading %s presets %s: %s", preset_type, path, e
+                )
+                continue
+            if not isinstance(entries, list):
+                logger.warning(
+                    "[PromptFlow] Ignoring %s: expected a list of presets", path
+                )
+                continue
+
+            merged = presets[preset_type]
+            seen = positions[preset_type]
+            for entry in entries:
+                name = entry.get("name") if isinstance(entry, dict) else None
+                if name is not None and name in seen:
+                    merged[seen[name]] = entry
+                else:
+                    if name is not None:
+                        seen[name] = len(merged)
+                    merged.append(entry)
+
+        bodies = {}
+        body = json.dumps(presets).encode("utf-8")
+        bodies[None] = (body, _make_etag(body))
+        for preset_type, entries in presets.items():
+            body = json.dumps(entries).encode("utf-8")
+            bodies[preset_type] = (body, _make_etag(body))
+
+        total = sum(len(entries) for entries in presets.values())
+        logger.info("[PromptFlow] Loaded %d presets", total)
+        return presets, bodies
+
+    def _ensure_fresh(self):
+        """Load presets if needed and re-check file stamps when due"""
+        now = time.monotonic()
+        if self._stamps is not None and now - self._checked_at < self.check_interval:
+            _PRESET_CACHE.hit()
+            return
+
+        with self._lock:
+            if (
+                self._stamps is not None
+                and time.monotonic() - self._checked_at < self.check_interval
+            ):
+                _PRESET_CACHE.hit()
+                return
+
+            paths = self._preset_files()
+            stamps = {path: _file_stamp(path) for path in paths}
+            if stamps != self._stamps:
+                _PRESET_CACHE.miss()
+                with _LOAD_TIMER.time():
+                    self._presets, self._bodies = self._load(paths)
+                self._stamps = stamps
+            else:
+                _PRESET_CACHE.hit()
+            self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        """Force a reload on the next access"""
+        with self._lock:
+            self._stamps = None
+
+    def presets(self):
+        """
+        Merged presets as {type: [preset, ...]}.
+        The returned dict is shared; treat it as read-only.
+        """
+        self._ensure_fresh()
+        return self._presets
+
+    def serialized(self, preset_type=None):
+        """
+        Return (json_bytes, etag) for all presets, or for one preset type.
+        Returns None for an unknown preset type.
+        """
+        self._ensure_fresh()
+        return self._bodies.get(preset_type)
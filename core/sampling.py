@@ -0,0 +1,153 @@
+"""
+PromptFlow Variation Sampling
+Seeded bijective shuffles of the variation index space
+"""
+
+import hashlib
+from functools import lru_cache
+
+from .expansion import ExpansionCounter
+
+
+class IndexPermutation:
+    """
+    Seeded bijection on [0, size).
+
+    A balanced Feistel network permutes the smallest even-bit power-of-two
+    domain covering ``size``; values that land outside [0, size) are walked
+    through the network again until they fall inside (cycle walking). The
+    domain is at most 4x ``size``, so the expected number of passes is
+    small and constant, and no visited set is ever stored.
+
+    Consecutive inputs 0..N-1 therefore map to N distinct indices.
+
+    Args:
+        size: Number of elements (> 0)
+        key: Anything with a stable str(); different keys give different
+            shuffles of the same space
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, size, key=0):
+        if size <= 0:
+            raise ValueError("IndexPermutation size must be positive")
+
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        bits += bits % 2
+        self.half_bits = bits // 2
+        self.half_mask = (1 << self.half_bits) - 1
+        self._half_bytes = (self.half_bits + 7) // 8
+        self._key = hashlib.blake2b(
+            f"promptflow:{key}:{size}".encode(), digest_size=32
+        ).digest()
+
+    def _round(self, round_index, value):
+        """Keyed round function mapping a half to half_bits of output"""
+        data = value.to_bytes(self._half_bytes, "little")
+        out = b""
+        counter = 0
+        while len(out) < self._half_bytes:
+            out += hashlib.blake2b(
+                data,
+                key=self._key,
+                digest_size=min(64, self._half_bytes - len(out)),
+                person=bytes((round_index, counter)),
+            ).digest()
+            counter += 1
+        return int.from_bytes(out, "little") & self.half_mask
+
+    def _encrypt(self, value):
+        left, right = value >> self.half_bits, value & self.half_mask
+        for r in range(self.ROUNDS):
+            left, right = right, left ^ self._round(r, right)
+        return (left << self.half_bits) | right
+
+    def _decrypt(self, value):
+        left, right = value >> self.half_bits, value & self.half_mask
+        for r in reversed(range(self.ROUNDS)):
+            left, right = right ^ self._round(r, left), left
+        return (left << self.half_bits) | right
+
+    def forward(self, index):
+        """Map a position in [0, size) to its shuffled index"""
+        if not 0 <= index < self.size:
+            raise IndexError(f"Index {index} out of range")
+        if self.size == 1:
+            return 0
+
+        value = self._encrypt(index)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+    def inverse(self, value):
+        """Map a shuffled index back to its position"""
+        if not 0 <= value < self.size:
+            raise IndexError(f"Index {value} out of range")
+        if self.size == 1:
+            return 0
+
+        index = self._decrypt(value)
+        while index >= self.size:
+            index = self._decrypt(index)
+        return index
+
+
+def decode_mixed_radix(index, radices):
+    """Split an index into digits (first radix is the most significant)"""
+    digits = [0] * len(radices)
+    for i in range(len(radices) - 1, -1, -1):
+        index, digits[i] = divmod(index, radices[i])
+    return digits
+
+
+@lru_cache(maxsize=64)
+def get_permutation(size, key=0):
+    """Cached IndexPermutation for a space size and key"""
+    return IndexPermutation(size, key)
+
+
+def shuffled_indices(texts, seed, get_options, key=0):
+    """
+    Pick expansion indices for several compiled texts from one shuffled
+    space.
+
+    The expansions of all texts form a single mixed-radix space; the seed
+    (modulo its size) is passed through a seeded permutation, so seeds
+    0..N-1 select N distinct combinations.
+
+    Args:
+        texts: CompiledText objects, in resolution order
+        seed: Seed / position in the shuffled order
+        get_options: Callable mapping a wildcard name to its options
+        key: Shuffle key
+
+    Returns:
+        Tuple of (one expansion index per text, shared ExpansionCounter)
+    """
+    indices, counter = shuffled_indices_batch(texts, [seed], get_options, key)
+    return indices[0], counter
+
+
+def shuffled_indices_batch(texts, seeds, get_options, key=0):
+    """
+    shuffled_indices for many seeds; the space is counted only once.
+
+    Returns:
+        Tuple of (list of index lists, one per seed, shared ExpansionCounter)
+    """
+    counter = ExpansionCounter(get_options)
+    counts = [text.count(get_options, counter) for text in texts]
+
+    total = 1
+    for count in counts:
+        total *= count
+    if total <= 1:
+        return [[0] * len(texts) for _seed in seeds], counter
+
+    permutation = get_permutation(total, key)
+    return [
+        decode_mixed_radix(permutation.forward(seed % total), counts) for seed in seeds
+    ], counter
@@ -0,0 +1,405 @@
+"""
+PromptFlow Wildcard Search
+Server-side search over wildcard names and option text: sorted token
+arrays for prefix matches and an inverted index from tokens to files
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from .metrics import METRICS
+
+logger = logging.getLogger("promptflow.search")
+
+_SEARCH_TIMER = METRICS.timer("wildcard_search", "Wildcard search queries")
+_INDEX_TIMER = METRICS.timer(
+    "wildcard_search_index", "Updating the wildcard search index"
+)
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+# Comment lines and "3::" weight prefixes are not searchable text
+_NOT_TEXT = re.compile(r"(?m)^[ \t]*(?:#.*|(?:\d+(?:\.\d*)?|\.\d+)::)")
+
+# Prefix terms shorter than this only match whole tokens
+MIN_PREFIX_LENGTH = 2
+
+# A prefix term expands to at most this many tokens
+MAX_PREFIX_EXPANSION = 1000
+
+# Wildcard files are tokenized in chunks of about this many bytes
+FILE_TOKENS_CHUNK = 1 << 20
+
+# Score tiers (results are ordered by score, then shorter names first)
+SCORE_EXACT_NAME = 1000
+SCORE_NAME_PREFIX = 500
+SCORE_NAME_TERMS = 100
+SCORE_CONTENT_TERMS = 10
+
+
+_NAME = 1
+_CONTENT = 2
+_MATCHED = {_NAME: "name", _CONTENT: "content", _NAME | _CONTENT: "both"}
+
+
+def _rank(scores):
+    """
+    Names by descending score, then shorter and alphabetically first.
+    Stable sorts on plain keys; per-name key tuples would make large
+    result sets pay for garbage collection over the whole index.
+    """
+    tiers = {}
+    for name, score in scores.items():
+        tiers.setdefault(score, []).append(name)
+    ranked = []
+    for score in sorted(tiers, reverse=True):
+        names = sorted(tiers[score])
+        names.sort(key=len)
+        ranked.extend(names)
+    return ranked
+
+
+def tokenize(text):
+    """Lowercase word tokens of a text (underscores and punctuation split)"""
+    return _TOKEN.findall(text.lower())
+
+
+def file_tokens(path):
+    """Set of searchable tokens in a wildcard file (read in whole-line chunks)"""
+    tokens = set()
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            lines = f.readlines(FILE_TOKENS_CHUNK)
+            if not lines:
+                break
+            tokens.update(tokenize(_NOT_TEXT.sub(" ", "".join(lines))))
+    return frozenset(tokens)
+
+
+def option_tokens(options):
+    """Set of searchable tokens in a parsed option list (bundles, YAML, JSON)"""
+    return frozenset(tokenize("\n".join(options)))
+
+
+def normalize_query(query):
+    """Lowercase a query and strip wildcard markers (``__name__``)"""
+    return query.strip().strip("_").strip().lower()
+
+
+class _TokenIndex:
+    """Inverted index token -> set of ids, with sorted tokens for prefixes"""
+
+    def __init__(self):
+        self.postings = {}
+        self._sorted = None
+
+    def add(self, item, tokens):
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                self.postings[token] = {item}
+                self._sorted = None
+            else:
+                ids.add(item)
+
+    def remove(self, item, tokens):
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is not None:
+                ids.discard(item)
+                if not ids:
+                    del self.postings[token]
+                    self._sorted = None
+
+    def lookup(self, term, prefix=False):
+        """Ids of items containing term (or a token starting with it)"""
+        if not prefix or len(term) < MIN_PREFIX_LENGTH:
+            return set(self.postings.get(term, ()))
+
+        if self._sorted is None:
+            self._sorted = sorted(self.postings)
+        tokens = self._sorted
+        result = set()
+        start = bisect_left(tokens, term)
+        for i in range(start, min(len(tokens), start + MAX_PREFIX_EXPANSION)):
+            if not tokens[i].startswith(term):
+                break
+            result.update(self.postings[tokens[i]])
+        return result
+
+    def match_all(self, terms):
+        """Ids containing every term; the last term may be a prefix"""
+        *whole, last = terms
+        # Rarest terms first keeps the intersections small
+        whole.sort(key=lambda term: len(self.postings.get(term, ())))
+        result = None
+        for term in whole:
+            ids = self.postings.get(term)
+            if not ids:
+                return set()
+            result = set(ids) if result is None else result & ids
+            if not result:
+                return set()
+        ids = self.lookup(last, prefix=True)
+        return ids if result is None else result & ids
+
+
+class WildcardSearchIndex:
+    """
+    Search index over a WildcardRegistry.
+
+    Names are kept in a sorted array (prefix matches on the full name) and
+    in a token index (matches on path segments and words). Option text is
+    tokenized into an inverted index token -> files, so a content query
+    touches only the files containing its terms.
+
+    The first search indexes every file. After that, names reported by the
+    registry's change listener are re-indexed before the next search.
+    Edits the registry does not track (files it never read) are caught by
+    re-checking the files of the directories a watcher reports events in,
+    or, without a watcher delivering events, by comparing all file stamps
+    every ``rescan_interval`` seconds.
+
+    Args:
+        registry: WildcardRegistry to index
+        rescan_interval: Seconds between full stamp comparisons
+        watcher: Optional WildcardWatcher of the same registry
+    """
+
+    def __init__(self, registry, rescan_interval=60.0, watcher=None):
+        self.registry = registry
+        self.rescan_interval = rescan_interval
+        self.watcher = watcher
+        self._lock = threading.Lock()
+        self._files = {}  # name -> (path or (bundle, member), stamp, tokens)
+        self._names = []  # sorted lowercase names
+        self._lower = {}  # lowercase name -> name
+        self._name_tokens = _TokenIndex()
+        self._content_tokens = _TokenIndex()
+        self._swept_at = None
+        # Separate lock: listeners may run while self._lock is held
+        self._dirty_lock = threading.Lock()
+        self._dirty = set()
+        self._dirty_dirs = set()
+        registry.add_listener(self._on_change)
+        if watcher is not None:
+            watcher.add_listener(self._on_directories)
+
+    def _on_change(self, diff):
+        with self._dirty_lock:
+            for key in ("added", "removed", "modified"):
+                self._dirty.update(diff[key])
+
+    def _on_directories(self, directories):
+        with self._dirty_lock:
+            if directories is None:
+                self._swept_at = None
+            else:
+                self._dirty_dirs.update(directories)
+
+    def _sweep_due(self, now):
+        if self._swept_at is None:
+            return True
+        if self.watcher is not None and self.watcher.delivers_events:
+            return False
+        return now - self._swept_at >= self.rescan_interval
+
+    def _update(self):
+        """Bring the index in line with the registry (lock held)"""
+        entries = self.registry.entries()
+        now = time.monotonic()
+        with self._dirty_lock:
+            if self._sweep_due(now):
+                names = set(entries) | set(self._files)
+                self._swept_at = now
+                self._dirty.clear()
+                self._dirty_dirs.clear()
+            elif not (self._dirty or self._dirty_dirs):
+                return entries
+            else:
+                names, self._dirty = self._dirty, set()
+                directories, self._dirty_dirs = self._dirty_dirs, set()
+                if directories:
+                    names.update(
+                        name
+                        for name, (source, _stamp, _tokens) in self._files.items()
+                        if os.path.dirname(
+                            source if isinstance(source, str) else source[0]
+                        )
+                        in directories
+                    )
+
+        with _INDEX_TIMER.time():
+            changes = [self._reindex(name, entries.get(name)) for name in names]
+            reindexed = len(changes) - changes.count(None)
+            if _NAME in changes:
+                self._lower = {name.lower(): name for name in self._files}
+                self._names = sorted(self._lower)
+
+        if reindexed:
+            logger.debug("[PromptFlow] Search index: %d files re-indexed", reindexed)
+        return entries
+
+    def _reindex(self, name, entry):
+        """
+        Index one wildcard again if its file changed.
+        Returns _NAME if the name was added or removed, _CONTENT if only
+        its contents were re-indexed, None if nothing changed.
+        """
+        known = self._files.get(name)
+        if entry is None:
+            if known is None:
+                return None
+            del self._files[name]
+            self._name_tokens.remove(name, tokenize(name))
+            self._content_tokens.remove(name, known[2])
+            return _NAME
+
+        path = entry["path"]
+        member = entry.get("member")
+        source = path if member is None else (path, member)
+        try:
+            st = os.stat(path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamp = None
+        if known is not None and known[0] == source and known[1] == stamp:
+            return None
+
+        if known is None:
+            self._name_tokens.add(name, tokenize(name))
+        else:
+            self._content_tokens.remove(name, known[2])
+        tokens = frozenset()
+        try:
+            if stamp is not None and member is None:
+                tokens = file_tokens(path)
+            elif stamp is not None:
+                tokens = option_tokens(self.registry.get_options(name) or ())
+        except (OSError, ValueError) as e:
+            logger.warning("[PromptFlow] Could not index %s: %s", name, e)
+        self._content_tokens.add(name, tokens)
+        self._files[name] = (source, stamp, tokens)
+        return _NAME if known is None else _CONTENT
+
+    def _name_prefix_matches(self, query):
+        """Names starting with query (case-insensitive)"""
+        if not query:
+            return []
+        names = self._names
+        result = []
+        for i in range(bisect_left(names, query), len(names)):
+            if not names[i].startswith(query):
+                break
+            result.append(self._lower[names[i]])
+        return result
+
+    def search(self, query, limit=50, offset=0, scope="all", samples=False):
+        """
+        Ranked search over wildcard names and contents (blocking).
+
+        Args:
+            query: Search text; "__styles/an" style wildcard references
+                are accepted. The last word matches as a prefix.
+            limit: Maximum number of results to return
+            offset: Number of ranked results to skip (pagination)
+            scope: "all", "names" or "contents"
+            samples: Add the first matching option of each content match
+
+        Returns:
+            dict with "query", "total", "offset", "limit" and "results"
+            (name, source, score and "matched": "name", "content" or both)
+        """
+        with _SEARCH_TIMER.time():
+            normalized = normalize_query(query)
+            terms = tokenize(normalized)
+
+            with self._lock:
+                entries = self._update()
+                scores = {}
+                matched = {}  # name -> _NAME | _CONTENT bits
+
+                def add(names, score, kind):
+                    for name in names:
+                        scores[name] = scores.get(name, 0) + score
+                        matched[name] = matched.get(name, 0) | kind
+
+                if scope in ("all", "names"):
+                    exact = self._lower.get(normalized)
+                    if exact is not None:
+                        add((exact,), SCORE_EXACT_NAME, _NAME)
+                    prefixed = self._name_prefix_matches(normalized)
+                    add(prefixed, SCORE_NAME_PREFIX, _NAME)
+                    if terms:
+                        named = self._name_tokens.match_all(terms)
+                        add(named, SCORE_NAME_TERMS, _NAME)
+                if scope in ("all", "contents") and terms:
+                    add(
+                        self._content_tokens.match_all(terms),
+                        SCORE_CONTENT_TERMS,
+                        _CONTENT,
+                    )
+
+            ranked = _rank(scores)
+            page = ranked[offset : offset + limit]
+            results = []
+            for name in page:
+                entry = entries.get(name)
+                kinds = matched[name]
+                result = {
+                    "name": name,
+                    "source": entry["source"] if entry else None,
+                    "score": scores[name],
+                    "matched": _MATCHED[kinds],
+                }
+                if samples and kinds & _CONTENT and entry is not None:
+                    result["sample"] = self._sample(entry, terms)
+                results.append(result)
+
+        return {
+            "query": query,
+            "total": len(ranked),
+            "offset": offset,
+            "limit": limit,
+            "results": results,
+        }
+
+    def _sample(self, entry, terms):
+        """First option of a wildcard whose words match all terms, or None"""
+        try:
+            if entry.get("member") is not None:
+                lines = self.registry.get_options(entry["name"]) or ()
+                return self._first_match(lines, terms)
+            with open(entry["path"], "r", encoding="utf-8", errors="replace") as f:
+                return self._first_match(f, terms)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _first_match(lines, terms):
+        for line in lines:
+            line = _NOT_TEXT.sub("", line).strip()
+            if not line:
+                continue
+            tokens = tokenize(line)
+            if all(
+                any(token.startswith(term) for token in tokens)
+                if i == len(terms) - 1 and len(term) >= MIN_PREFIX_LENGTH
+                else term in tokens
+                for i, term in enumerate(terms)
+            ):
+                return line
+        return None
+
+    def stats(self):
+        """Sizes of the index (no disk access)"""
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "name_tokens": len(self._name_tokens.postings),
+                "content_tokens": len(self._content_tokens.postings),
+            }
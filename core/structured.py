@@ -0,0 +1,128 @@
+"""
+PromptFlow Structured Wildcards
+YAML and JSON wildcard files (the Impact Pack layout): nested keys name the
+wildcards and the lists at the leaves hold their options
+
+    animals:
+      cats:
+        big: [lion, tiger, "2::jaguar"]    ->  __animals/cats/big__
+"""
+
+import json
+import os
+
+from .metrics import METRICS
+
+STRUCTURED_EXTENSIONS = (".yaml", ".yml", ".json")
+
+_STRUCTURED_PARSE_TIMER = METRICS.timer(
+    "wildcard_structured_parse", "Parsing a YAML or JSON wildcard file"
+)
+
+
+class StructuredFormatError(ValueError):
+    """Raised for YAML / JSON wildcard files that cannot be parsed"""
+
+
+def parse_document(data, path):
+    """
+    Parse the bytes of a YAML or JSON file (chosen by path's extension).
+    YAML needs PyYAML, which is imported on first use.
+
+    Raises:
+        StructuredFormatError: If the document cannot be parsed
+    """
+    if path.endswith(".json"):
+        try:
+            return json.loads(data)
+        except ValueError as e:
+            raise StructuredFormatError(f"{path}: {e}") from e
+
+    try:
+        import yaml
+    except ImportError:
+        raise StructuredFormatError(
+            f"{path}: PyYAML is not installed (pip install pyyaml)"
+        ) from None
+    # The libyaml loader is much faster on large packs when available
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    try:
+        return yaml.load(data, Loader=loader)
+    except yaml.YAMLError as e:
+        raise StructuredFormatError(f"{path}: {e}") from e
+
+
+def _collect(node, name, leaves):
+    """Add name -> option lines for every leaf below node"""
+    if isinstance(node, dict):
+        for key, value in node.items():
+            key = str(key).strip().strip("/")
+            if key:
+                _collect(value, f"{name}/{key}" if name else key, leaves)
+    elif not name or node is None:
+        return
+    elif isinstance(node, list):
+        leaves[name] = tuple(
+            str(item) for item in node if isinstance(item, (str, int, float))
+        )
+    elif isinstance(node, str):
+        leaves[name] = tuple(node.splitlines())
+    elif isinstance(node, (int, float)):
+        leaves[name] = (str(node),)
+
+
+class StructuredWildcards:
+    """
+    The wildcards of one YAML or JSON file.
+
+    The file is parsed once, when opened, into a flat map of wildcard name
+    -> option lines (keys joined with "/"). Options are parsed per name on
+    request with the same rules as .txt lines (weights, # comments). A
+    document whose root is a list or a string is a single wildcard named
+    after the file.
+
+    Args:
+        path: File path
+
+    Raises:
+        OSError: If the file cannot be read
+        StructuredFormatError: If it cannot be parsed
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with _STRUCTURED_PARSE_TIMER.time(), open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.stamp = (st.st_mtime_ns, st.st_size)
+            document = parse_document(f.read(), path)
+
+        self._leaves = {}
+        if isinstance(document, dict):
+            _collect(document, "", self._leaves)
+        else:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            _collect(document, stem, self._leaves)
+
+    def close(self):
+        """Drop the parsed document (once the file was replaced on disk)"""
+        self._leaves = {}
+
+    def names(self):
+        """Wildcard names in the file, sorted"""
+        return sorted(self._leaves)
+
+    def __contains__(self, name):
+        return name in self._leaves
+
+    def __len__(self):
+        return len(self._leaves)
+
+    def options(self, name):
+        """Parsed option list of a wildcard, or None if it is not in the file"""
+        # Imported here: wildcards imports this module
+        from .wildcards import parse_wildcard_lines
+
+        lines = self._leaves.get(name)
+        if lines is None:
+            return None
+        return parse_wildcard_lines(lines)
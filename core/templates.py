@@ -0,0 +1,271 @@
+"""
+PromptFlow Compiled Templates
+Parses prompt text once into token lists so repeated runs only select options
+"""
+
+import json
+from functools import lru_cache
+
+from .expansion import CHOICE, FILE, ExpansionCounter, expand, parse_template
+from .metrics import METRICS
+
+
+class OptionSelector:
+    """
+    Picks options for one piece of text according to its field mode.
+
+    Random picks honour option weights ("3::option", "{2::a|b}"); the
+    cycling modes ignore them. Shuffle mode is resolved by index (see
+    CompiledText.render); a selector in shuffle mode only picks seeded
+    random options.
+
+    Args:
+        mode: Processing mode (fixed, random, increment, decrement, shuffle)
+        rng: Random number generator instance
+        seed: Seed value for increment/decrement modes
+    """
+
+    __slots__ = ("index", "mode", "rng", "seed")
+
+    def __init__(self, mode, rng, seed):
+        self.mode = mode
+        self.rng = rng
+        self.seed = seed
+        # Counter for increment/decrement within same text
+        self.index = 0
+
+    def select(self, options):
+        """Select an option based on mode"""
+        if not options:
+            return ""
+
+        if self.mode in ("random", "shuffle"):
+            alias = getattr(options, "alias", None)
+            if alias is not None:
+                # Weighted options: O(1) pick from the prebuilt alias table
+                return options[alias.sample(self.rng)]
+            return self.rng.choice(options)
+        elif self.mode == "increment":
+            idx = (self.seed + self.index) % len(options)
+            self.index += 1
+            return options[idx]
+        elif self.mode == "decrement":
+            idx = (-(self.seed + self.index) - 1) % len(options)
+            self.index += 1
+            return options[idx]
+        else:  # fixed - use first option
+            return options[0]
+
+
+class CompiledText:
+    """
+    A piece of prompt text parsed into literals, inline choices and file
+    wildcard references (see core.expansion).
+
+    Choices nest and wildcard file options are expanded recursively. Within
+    each level every file wildcard is picked first (left to right), then
+    every inline choice.
+    """
+
+    __slots__ = ("choice_slots", "file_slots", "source", "tokens")
+
+    def __init__(self, source):
+        self.source = source
+        self.tokens = parse_template(source)
+        self.file_slots = []
+        self.choice_slots = []
+        for i, token in enumerate(self.tokens):
+            if token.__class__ is str:
+                continue
+            if token[0] == FILE:
+                self.file_slots.append(i)
+            elif token[0] == CHOICE:
+                self.choice_slots.append(i)
+
+    @property
+    def is_static(self):
+        """True when the text contains no wildcards at all"""
+        return not self.file_slots and not self.choice_slots
+
+    def count(self, get_options, counter=None):
+        """
+        Exact number of expansions of this text, including nested choices
+        and wildcard files referencing other wildcards.
+
+        Args:
+            get_options: Callable mapping a wildcard name to its options
+            counter: ExpansionCounter to share between texts (optional)
+        """
+        if self.is_static:
+            return 1
+        counter = counter or ExpansionCounter(get_options)
+        return counter.count(self.tokens)
+
+    def render(self, index, get_options, counter=None):
+        """Render expansion number index (0 <= index < count())"""
+        if self.is_static:
+            return self.source
+        counter = counter or ExpansionCounter(get_options)
+        return counter.render(self.tokens, index)
+
+    def resolve(self, selector, get_options):
+        """
+        Resolve the text for one run.
+
+        Args:
+            selector: OptionSelector carrying mode, rng and seed
+            get_options: Callable mapping a wildcard name to its options
+
+        Returns:
+            Text with wildcards resolved
+        """
+        if self.is_static:
+            return self.source
+        return expand(self.tokens, selector, get_options)
+
+
+def cleanup_prompt(text):
+    """
+    Clean up duplicate commas and whitespace in prompt text: tags are
+    separated by exactly ", ", whitespace runs become one space and empty
+    tags are dropped. (Byte-identical to the former four regex passes,
+    see benchmarks/golden_cleanup.py.)
+    """
+    if not text:
+        return text
+    return cleanup_join((text,))
+
+
+def cleanup_join(parts):
+    """
+    Join prompt parts with ", " and clean up the result in one pass.
+    Same result as cleanup_prompt(", ".join(parts)), without building the
+    joined string first.
+    """
+    tags = []
+    for part in parts:
+        for segment in part.split(","):
+            words = segment.split()
+            if words:
+                tags.append(" ".join(words))
+    return ", ".join(tags)
+
+
+def cached_lookup(get_options):
+    """
+    Wrap a wildcard lookup so each name is fetched once; used while
+    resolving a batch of seeds against the same wildcard files.
+    """
+    cache = {}
+
+    def lookup(name):
+        try:
+            return cache[name]
+        except KeyError:
+            options = cache[name] = get_options(name)
+            return options
+
+    return lookup
+
+
+@lru_cache(maxsize=1024)
+def compile_text(text):
+    """Compile (and cache) a piece of prompt text"""
+    return CompiledText(text)
+
+
+METRICS.register_cache_info("compile_text", compile_text.cache_info)
+
+
+class CompiledPrompt:
+    """
+    Parsed PromptFlow widget_data: mode, categories and compiled texts.
+
+    Attributes:
+        data: Parsed widget_data dict (shared; treat as read-only)
+        mode: "simple" or "extended"
+        categories: Category dict from widget_data
+        fields: [(field, field_mode, CompiledText), ...] in prompt order
+        negative: CompiledText for the negative prompt
+    """
+
+    __slots__ = (
+        "_categories_json",
+        "categories",
+        "data",
+        "fields",
+        "mode",
+        "negative",
+    )
+
+    def __init__(self, data, simple_fields, extended_fields):
+        self.data = data
+        self.mode = data.get("mode", "simple")
+        fields = simple_fields if self.mode == "simple" else extended_fields
+
+        # Get category order (for extended mode with drag-reorder)
+        category_order = data.get("categoryOrder", fields)
+        self.categories = data.get("categories", {})
+
+        self.fields = []
+        for field in category_order:
+            if field not in self.categories:
+                continue
+
+            field_data = self.categories[field]
+            value = field_data.get("value", "").strip()
+            if not value:
+                continue
+
+            field_mode = field_data.get("mode", "fixed")
+            self.fields.append((field, field_mode, compile_text(value)))
+
+        self.negative = compile_text(data.get("negative", "").strip())
+
+        # Pre-serialized categories, indented one level for prompt_data
+        self._categories_json = json.dumps(self.categories, indent=2).replace(
+            "\n", "\n  "
+        )
+
+    def prompt_data(self, positive, negative, seed):
+        """
+        Build the prompt_data JSON output. Produces the same text as
+        json.dumps(..., indent=2) without re-serializing the categories.
+        """
+        dumps = json.dumps
+        return (
+            f'{{\n  "mode": {dumps(self.mode)},'
+            f'\n  "categories": {self._categories_json},'
+            f'\n  "negative": {dumps(negative)},'
+            f'\n  "seed": {dumps(seed)},'
+            f'\n  "processed": {{\n    "positive": {dumps(positive)},'
+            f'\n    "negative": {dumps(negative)}'
+            "\n  }\n}"
+        )
+
+
+@lru_cache(maxsize=128)
+def _compile_widget_data(widget_data, simple_fields, extended_fields):
+    try:
+        data = json.loads(widget_data) if widget_data else {}
+    except json.JSONDecodeError:
+        data = {}
+    return CompiledPrompt(data, simple_fields, extended_fields)
+
+
+def compile_widget_data(widget_data, simple_fields, extended_fields):
+    """
+    Parse and compile widget_data, cached in a bounded LRU keyed by the
+    widget_data string so queue runs that only change the seed skip parsing.
+
+    Args:
+        widget_data: JSON string from the PromptFlow widget
+        simple_fields: Field order for simple mode
+        extended_fields: Field order for extended mode
+    """
+    return _compile_widget_data(
+        widget_data, tuple(simple_fields), tuple(extended_fields)
+    )
+
+
+METRICS.register_cache_info("compile_widget_data", _compile_widget_data.cache_info)
@@ -0,0 +1,261 @@
+"""
+PromptFlow Variation Enumeration
+Index-addressable access to every wildcard combination of a prompt
+"""
+
+import json
+
+from .expansion import (
+    CHOICE,
+    MAX_DEPTH,
+    ExpansionCounter,
+    parse_template,
+    sequence_source,
+    slot_order,
+)
+from .sampling import decode_mixed_radix, get_permutation
+from .templates import cleanup_prompt
+from .weights import option_weights
+
+
+def _describe_slot(node):
+    if node[0] == CHOICE:
+        wildcard = {
+            "type": "inline",
+            "full": node[2],
+            "options": [sequence_source(alt) for alt in node[1]],
+        }
+        weights = option_weights(node[1])
+        if weights is not None:
+            wildcard["weights"] = weights
+        return wildcard
+    return {"type": "file", "full": node[2], "name": node[1], "options": None}
+
+
+def extract_wildcards(text):
+    """
+    Extract the top-level wildcards from text, in the same order as the
+    variations widget: inline groups first, then file wildcards.
+
+    Returns list of wildcard objects. Inline groups list their alternatives
+    as written (they may contain nested wildcards); file wildcards have
+    options=None until they are loaded.
+    """
+    if not text:
+        return []
+    tokens = parse_template(text)
+    return [_describe_slot(tokens[i]) for i in slot_order(tokens, inline_first=True)]
+
+
+def template_from_prompt_input(text, simple_fields, extended_fields):
+    """
+    Get the wildcard template for a prompt input.
+
+    PromptFlow widget_data / prompt_data JSON is turned into the joined raw
+    category values (the same template the variations widget previews);
+    anything else is used as-is.
+    """
+    stripped = text.lstrip() if text else ""
+    if not stripped.startswith("{"):
+        return text
+
+    try:
+        data = json.loads(text)
+    except (ValueError, TypeError):
+        return text
+    if not isinstance(data, dict) or not isinstance(data.get("categories"), dict):
+        return text
+
+    categories = data["categories"]
+    mode = data.get("mode", "simple")
+    field_order = data.get("categoryOrder") or (
+        simple_fields if mode == "simple" else extended_fields
+    )
+
+    parts = []
+    for field in field_order:
+        value = (categories.get(field) or {}).get("value", "")
+        if isinstance(value, str) and value.strip():
+            parts.append(value.strip())
+    return ", ".join(parts)
+
+
+class VariationSpace:
+    """
+    Mixed-radix view over all expansions of a prompt.
+
+    Each top-level wildcard is one digit whose radix is its exact number of
+    expansions (nested choices and wildcard files that reference other
+    wildcards included). Combination ``index`` is decoded digit by digit
+    (first wildcard is the most significant digit), so any variation can be
+    produced without generating the ones before it. Top-level wildcards are
+    ordered like the variations widget's preview list.
+
+    Args:
+        template: Prompt text containing the wildcards
+        get_options: Callable mapping a wildcard name to its options
+        max_depth: Maximum wildcard file nesting
+    """
+
+    def __init__(self, template, get_options, max_depth=MAX_DEPTH):
+        self.template = template
+        self.tokens = parse_template(template)
+        self.counter = ExpansionCounter(get_options, max_depth)
+        self.slots = slot_order(self.tokens, inline_first=True)
+
+        self.wildcards = []
+        self.radices = []
+        for i in self.slots:
+            node = self.tokens[i]
+            wildcard = _describe_slot(node)
+            if wildcard["type"] == "file":
+                options = get_options(wildcard["name"])
+                wildcard["options"] = options or []
+                wildcard["not_found"] = options is None
+                wildcard["weighted"] = option_weights(options) is not None
+            wildcard["count"] = self.counter.count_node(node)
+            self.wildcards.append(wildcard)
+            self.radices.append(wildcard["count"])
+
+        total = 1
+        for radix in self.radices:
+            total *= radix
+        self.total = total
+
+    def digits(self, index):
+        """Decode a combination index into one option index per wildcard"""
+        if not 0 <= index < self.total:
+            raise IndexError(f"Variation index {index} out of range")
+        return decode_mixed_radix(index, self.radices)
+
+    def index_of(self, digits):
+        """Encode one option index per wildcard back into a combination index"""
+        index = 0
+        for digit, radix in zip(digits, self.radices):
+            index = index * radix + digit
+        return index
+
+    def render_with_probability(self, digits):
+        """
+        Build the cleaned-up prompt for one expansion index per wildcard,
+        with the probability that random mode produces this combination
+        (option weights included)
+        """
+        tokens = self.tokens
+        out = [token if token.__class__ is str else token[2] for token in tokens]
+        render_node = self.counter.render_node
+        probability = 1.0
+        for i, digit in zip(self.slots, digits):
+            out[i], p = render_node(tokens[i], digit)
+            probability *= p
+        return cleanup_prompt("".join(out)), probability
+
+    def render(self, digits):
+        """Build the cleaned-up prompt for one expansion index per wildcard"""
+        return self.render_with_probability(digits)[0]
+
+    def probability(self, index):
+        """Probability that random mode produces combination index"""
+        return self.render_with_probability(self.digits(index))[1]
+
+    def __getitem__(self, index):
+        return self.render(self.digits(index))
+
+    def shuffled_index(self, position, key=0):
+        """
+        Combination index at a position of the seeded shuffled order.
+        Positions 0..N-1 give N distinct combinations.
+        """
+        return get_permutation(self.total, key).forward(position)
+
+    def iter_range(self, start=0, stop=None):
+        """
+        Yield (index, prompt, probability) for combinations in [start, stop).
+        Steps an odometer instead of decoding each index from scratch.
+        """
+        stop = self.total if stop is None else min(stop, self.total)
+        if start >= stop:
+            return
+
+        digits = self.digits(start)
+        radices = self.radices
+        for index in range(start, stop):
+            yield (index,) + self.render_with_probability(digits)
+
+            # Increment the odometer (last wildcard changes fastest)
+            i = len(radices) - 1
+            while i >= 0:
+                digits[i] += 1
+                if digits[i] < radices[i]:
+                    break
+                digits[i] = 0
+                i -= 1
+
+    def iter_shuffled(self, start=0, stop=None, key=0):
+        """
+        Yield (position, index, prompt, probability) in the seeded shuffled
+        order
+        """
+        stop = self.total if stop is None else min(stop, self.total)
+        permutation = get_permutation(self.total, key)
+        for position in range(start, stop):
+            index = permutation.forward(position)
+            prompt, probability = self.render_with_probability(self.digits(index))
+            yield position, index, prompt, probability
+
+    def page(self, offset=0, limit=50, order="sequential"):
+        """
+        Return one page of variations.
+
+        Sequential pages are [{"index": i, "prompt": text, "probability": p},
+        ...]; shuffled pages list positions in the shuffled order and add the
+        combination index as "variation". "probability" is the chance that
+        random mode produces the combination.
+        """
+        if order == "shuffle":
+            return [
+                {
+                    "index": position,
+                    "variation": index,
+                    "prompt": prompt,
+                    "probability": probability,
+                }
+                for position, index, prompt, probability in self.iter_shuffled(
+                    offset, offset + limit
+                )
+            ]
+        return [
+            {"index": index, "prompt": prompt, "probability": probability}
+            for index, prompt, probability in self.iter_range(offset, offset + limit)
+        ]
+
+    def describe(self):
+        """Summary of the wildcards that make up this space"""
+        info = []
+        for wildcard in self.wildcards:
+            item = {
+                "type": wildcard["type"],
+                "full": wildcard["full"],
+                "count": wildcard["count"],
+            }
+            if wildcard["type"] == "file":
+                item["name"] = wildcard["name"]
+                item["weighted"] = wildcard["weighted"]
+            elif "weights" in wildcard:
+                item["weights"] = wildcard["weights"]
+            info.append(item)
+        return info
+
+
+def build_variation_space(template, get_options):
+    """
+    Build the VariationSpace of a template and return (space, wildcards).
+    File wildcards come with their loaded options; missing ones keep an
+    empty option list and are flagged with not_found.
+
+    Args:
+        template: Prompt text containing wildcards
+        get_options: Callable mapping a wildcard name to its options
+    """
+    space = VariationSpace(template, get_options)
+    return space, space.wildcards
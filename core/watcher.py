@@ -0,0 +1,285 @@
+"""
+PromptFlow Wildcard Watcher
+Background thread that notices wildcard edits on disk and syncs the registry,
+so its change listeners fire without waiting for the next lookup
+"""
+
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+logger = logging.getLogger("promptflow.watcher")
+
+# inotify(7) constants
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_IGNORED = 0x00008000
+_IN_Q_OVERFLOW = 0x00004000
+_IN_ONLYDIR = 0x01000000
+_WATCH_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+    | _IN_ONLYDIR
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Minimal ctypes binding of the Linux inotify API (directories only)"""
+
+    def __init__(self):
+        # ctypes is only loaded where inotify is actually used
+        import ctypes
+        import ctypes.util
+
+        self._get_errno = ctypes.get_errno
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.fd = fd
+        self._watches = {}  # directory -> watch descriptor
+        # Directories with events since the last take_changed()
+        self._changed = set()
+        self._overflowed = False
+
+    def sync_watches(self, directories):
+        """Watch exactly the given directories"""
+        wanted = set(directories)
+        for directory in list(self._watches):
+            if directory not in wanted:
+                self._rm_watch(self.fd, self._watches.pop(directory))
+
+        for directory in wanted:
+            if directory in self._watches:
+                continue
+            wd = self._add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+            if wd < 0:
+                err = self._get_errno()
+                if err == errno.ENOENT:
+                    continue  # vanished meanwhile; the next sync drops it
+                raise OSError(err, os.strerror(err), directory)
+            self._watches[directory] = wd
+
+    def wait(self, timeout):
+        """Block until events arrive (or timeout); True if there were any"""
+        readable, _w, _x = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        self.drain()
+        return True
+
+    def drain(self):
+        """Read all pending events and note the directories they came from"""
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            if not data:
+                return
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size + length
+                if mask & _IN_Q_OVERFLOW:
+                    logger.debug("[PromptFlow] inotify queue overflowed")
+                    self._overflowed = True
+                    continue
+                for directory, watched in list(self._watches.items()):
+                    if watched == wd:
+                        self._changed.add(directory)
+                        if mask & _IN_IGNORED:
+                            # The kernel removed the watch (directory deleted)
+                            del self._watches[directory]
+
+    def take_changed(self):
+        """
+        Directories with events since the last call, or None if events were
+        lost (queue overflow)
+        """
+        changed = None if self._overflowed else self._changed
+        self._changed = set()
+        self._overflowed = False
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+        self._watches.clear()
+
+
+class WildcardWatcher:
+    """
+    Keeps a WildcardRegistry in sync with the disk from a daemon thread.
+
+    On Linux the wildcard directories are watched with inotify: a burst of
+    events is debounced, then registry.refresh() re-lists only the
+    directories that changed. A full refresh also runs every
+    ``rescan_interval`` seconds to pick up new wildcard roots. Elsewhere
+    (or when inotify is unavailable or out of watches) the registry is
+    refreshed every ``poll_interval`` seconds, which costs one stat() per
+    directory and per cached file. Until the registry's index has been
+    built, nothing is refreshed.
+
+    In inotify mode, listeners added with add_listener() learn which
+    directories had events, so caches of files the registry never read
+    can be checked without sweeping every root.
+
+    Args:
+        registry: WildcardRegistry to keep fresh
+        poll_interval: Seconds between refreshes in polling mode
+        rescan_interval: Seconds between safety refreshes in inotify mode
+        debounce: Seconds to wait for an event burst to settle
+        backend: "auto", "inotify" or "poll"
+    """
+
+    def __init__(
+        self,
+        registry,
+        poll_interval=2.0,
+        rescan_interval=30.0,
+        debounce=0.2,
+        backend="auto",
+    ):
+        self.registry = registry
+        self.poll_interval = poll_interval
+        self.rescan_interval = rescan_interval
+        self.debounce = debounce
+        self.backend = backend
+        self._stop = threading.Event()
+        self._thread = None
+        self._listeners = []
+        self._inotify_active = False
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def delivers_events(self):
+        """True while directory events reach the listeners (inotify mode)"""
+        return self._inotify_active and self.running
+
+    def add_listener(self, callback):
+        """
+        Call callback(directories) after the registry was refreshed for
+        inotify events in those directories. directories is None when
+        events were lost and everything may have changed. Callbacks run on
+        the watcher thread.
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, directories):
+        for callback in list(self._listeners):
+            try:
+                callback(directories)
+            except Exception:
+                logger.exception("[PromptFlow] Wildcard watcher listener failed")
+
+    def start(self):
+        """Start the watcher thread (no-op if it is already running)"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="promptflow-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop the watcher thread and wait for it to exit"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _refresh(self):
+        # Nothing to keep in sync before the index is first built
+        if not self.registry.built:
+            return
+        try:
+            self.registry.refresh()
+        except Exception:
+            logger.exception("[PromptFlow] Wildcard refresh failed")
+
+    def _run(self):
+        if self.backend != "poll" and sys.platform.startswith("linux"):
+            try:
+                inotify = _Inotify()
+            except (OSError, AttributeError, ImportError) as e:
+                if self.backend == "inotify":
+                    logger.warning("[PromptFlow] inotify unavailable: %s", e)
+            else:
+                try:
+                    self._inotify_active = True
+                    self._run_inotify(inotify)
+                except OSError as e:
+                    # Typically ENOSPC: fs.inotify.max_user_watches reached
+                    logger.warning(
+                        "[PromptFlow] Falling back to polling the wildcard "
+                        "directories: %s",
+                        e,
+                    )
+                finally:
+                    self._inotify_active = False
+                    inotify.close()
+                    if not self._stop.is_set():
+                        # Events may have been missed while switching to polling
+                        self._notify(None)
+        self._run_poll()
+
+    def _run_poll(self):
+        logger.debug("[PromptFlow] Watching wildcards by polling")
+        while not self._stop.wait(self.poll_interval):
+            self._refresh()
+
+    def _run_inotify(self, inotify):
+        logger.debug("[PromptFlow] Watching wildcards with inotify")
+        inotify.sync_watches(self.registry.directories())
+        next_rescan = time.monotonic() + self.rescan_interval
+        while not self._stop.is_set():
+            timeout = max(0.0, min(1.0, next_rescan - time.monotonic()))
+            if inotify.wait(timeout):
+                # Let editors finish their write/rename dance
+                while not self._stop.wait(self.debounce):
+                    if not inotify.wait(0):
+                        break
+            elif time.monotonic() < next_rescan:
+                continue
+            else:
+                next_rescan = time.monotonic() + self.rescan_interval
+
+            if self._stop.is_set():
+                return
+            self._refresh()
+            changed = inotify.take_changed()
+            if changed is None or changed:
+                self._notify(changed)
+            inotify.sync_watches(self.registry.directories())
@@ -0,0 +1,131 @@
+"""
+PromptFlow Weighted Options
+Parses "3::option" weights and samples them in O(1) with alias tables
+"""
+
+import re
+from array import array
+
+# Optional weight prefix of an option: "3::option", "0.5::option"
+WEIGHT_PATTERN = re.compile(r"^\s*(\d+(?:\.\d*)?|\.\d+)::")
+
+
+def split_weight(text):
+    """
+    Split an optional weight prefix off an option.
+
+    Returns:
+        Tuple of (weight or None, option text without the prefix)
+    """
+    match = WEIGHT_PATTERN.match(text)
+    if match is None:
+        return None, text
+    return float(match.group(1)), text[match.end() :]
+
+
+class AliasTable:
+    """
+    Walker/Vose alias table for sampling indices in proportion to weights.
+
+    Built once in O(n); every sample costs one random number and one
+    comparison, however many options there are. When all weights are zero
+    the table samples uniformly.
+
+    Args:
+        weights: Non-negative weights, one per option
+    """
+
+    __slots__ = ("_alias", "_prob", "size")
+
+    def __init__(self, weights):
+        size = len(weights)
+        if size == 0:
+            raise ValueError("AliasTable needs at least one weight")
+
+        total = float(sum(weights))
+        if total <= 0:
+            scaled = [1.0] * size
+        else:
+            scaled = [w * size / total for w in weights]
+
+        prob = array("d", [1.0]) * size
+        alias = array("q", range(size))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            g = large[-1]
+            prob[s] = scaled[s]
+            alias[s] = g
+            scaled[g] -= 1.0 - scaled[s]
+            if scaled[g] < 1.0:
+                large.pop()
+                small.append(g)
+        # Leftovers are 1.0 up to rounding error
+        for i in small + large:
+            prob[i] = 1.0
+
+        self.size = size
+        self._prob = prob
+        self._alias = alias
+
+    def sample(self, rng):
+        """Draw an index using rng.random()"""
+        u = rng.random() * self.size
+        i = int(u)
+        return i if u - i < self._prob[i] else self._alias[i]
+
+    def __len__(self):
+        return self.size
+
+
+class WeightedOptions(list):
+    """
+    Option list whose entries carry weights.
+
+    Behaves like the plain option list (weight prefixes removed) and keeps
+    the weights and a prebuilt AliasTable next to it, so weighted random
+    picks are O(1).
+
+    Args:
+        options: Option texts without weight prefixes
+        weights: Weight per option
+    """
+
+    def __init__(self, options, weights):
+        super().__init__(options)
+        self.weights = array("d", weights)
+        self.total_weight = float(sum(self.weights))
+        self.alias = AliasTable(self.weights)
+
+
+def weighted_list(items, weights):
+    """
+    A WeightedOptions for items if any weight differs from 1, otherwise
+    the plain list.
+    """
+    if all(w == 1.0 for w in weights):
+        return items if isinstance(items, list) else list(items)
+    return WeightedOptions(items, weights)
+
+
+def option_weights(options, limit=None):
+    """
+    Weights of an option list (the first ``limit`` ones if given), or None
+    when it is unweighted
+    """
+    weights = getattr(options, "weights", None)
+    if weights is None:
+        return None
+    return list(weights if limit is None else weights[:limit])
+
+
+def option_probability(options, index):
+    """Probability that a random pick from options selects options[index]"""
+    weights = getattr(options, "weights", None)
+    if weights is None:
+        return 1.0 / len(options)
+    total = options.total_weight
+    if total <= 0:
+        return 1.0 / len(options)
+    return weights[index] / total
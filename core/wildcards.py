@@ -0,0 +1,1028 @@
+"""
+PromptFlow Wildcard Registry
+Keeps an in-memory index of every wildcard file and its parsed options
+"""
+
+import atexit
+import logging
+import os
+import pickle
+import threading
+import time
+
+from .bundle import (
+    BUNDLE_EXTENSION,
+    BundleFormatError,
+    BundleOptions,
+    WildcardBundle,
+)
+from .expansion import FILE_PATTERN
+from .line_index import LineIndexedOptions
+from .metrics import METRICS
+from .structured import (
+    STRUCTURED_EXTENSIONS,
+    StructuredFormatError,
+    StructuredWildcards,
+)
+from .weights import split_weight, weighted_list
+
+logger = logging.getLogger("promptflow.wildcards")
+
+_DISCOVERY_TIMER = METRICS.timer(
+    "wildcard_discovery", "Full scans of the wildcard directories"
+)
+_SYNC_TIMER = METRICS.timer(
+    "wildcard_sync", "Re-listing the wildcard directories that changed"
+)
+_PARSE_TIMER = METRICS.timer("wildcard_parse", "Reading and parsing a wildcard file")
+_SNAPSHOT_TIMER = METRICS.timer(
+    "wildcard_snapshot_load", "Loading the persisted wildcard registry"
+)
+_CONTENTS_CACHE = METRICS.cache("wildcard_contents")
+
+
+WILDCARD_EXTENSION = ".txt"
+
+# Files holding several wildcards: bundles and YAML / JSON files
+MULTI_EXTENSIONS = (BUNDLE_EXTENSION,) + STRUCTURED_EXTENSIONS
+
+# Bump when the layout of the persisted registry snapshot changes
+SNAPSHOT_FORMAT = 2
+
+
+def parse_wildcard_lines(lines):
+    """
+    Turn raw wildcard file lines into a list of options.
+    Strips whitespace and skips empty lines and # comments.
+
+    Lines may start with a weight ("3::option"); if any line does, the
+    result is a WeightedOptions list (prefixes removed, alias table built).
+    """
+    options = []
+    weights = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            weight, text = split_weight(line)
+            if weight is None:
+                options.append(line)
+                weights.append(1.0)
+            else:
+                options.append(text.lstrip())
+                weights.append(weight)
+    return weighted_list(options, weights)
+
+
+def read_wildcard_file(filepath):
+    """Read and parse a wildcard file from disk"""
+    with open(filepath, "r", encoding="utf-8") as f:
+        return parse_wildcard_lines(f)
+
+
+def open_multi_file(path):
+    """
+    Open a file holding several wildcards: a StructuredWildcards for YAML /
+    JSON files, otherwise a WildcardBundle
+    """
+    if path.endswith(STRUCTURED_EXTENSIONS):
+        return StructuredWildcards(path)
+    return WildcardBundle(path)
+
+
+def _stamp(st):
+    """Change-detection stamp for a stat result"""
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _content_key(entry):
+    """Contents cache key of an entry: its path, or (path, member)"""
+    member = entry.get("member")
+    return entry["path"] if member is None else (entry["path"], member)
+
+
+class WildcardRegistry:
+    """
+    Index of wildcard files across all wildcard directories.
+
+    The directory tree is walked once and kept in memory. Name lookups are
+    dictionary hits and parsed option lists are cached per file. Changes on
+    disk are picked up by re-checking directory and file mtimes, at most
+    once every ``check_interval`` seconds, so repeated resolves within that
+    window never touch the filesystem.
+
+    With a ``cache_path`` the index, the directory stamps and the parsed
+    option lists are persisted, and the first lookup after a restart loads
+    them in one read instead of walking the trees and parsing every file.
+    Only directories and files whose stamps changed since are re-read.
+    Nothing is loaded before the first lookup; saves are batched
+    ``save_delay`` seconds after the last change.
+
+    Wildcard bundles (``.pfw`` files, see core.bundle) and YAML / JSON
+    files (see core.structured) inside a directory contribute all their
+    wildcards, named relative to the directory they sit in; a root may
+    also be a bundle file. Their entries carry the name inside the file as
+    "member". Bundle options are read from the bundle's memory map; a
+    YAML / JSON file is parsed once and kept open like a bundle, and its
+    option lists are cached per wildcard like those of .txt files.
+
+    Args:
+        dirs_provider: Callable returning [(source, directory or bundle),
+            ...] in priority order (first entry wins on name clashes)
+        check_interval: Minimum seconds between mtime checks
+        large_file_threshold: Files of at least this many bytes are served
+            through a line-offset index instead of being loaded into memory
+        index_dir: Where line-offset indexes are persisted (None = memory)
+        cache_path: File the registry snapshot is persisted to (None = off)
+        save_delay: Seconds to wait after a change before saving
+    """
+
+    def __init__(
+        self,
+        dirs_provider,
+        check_interval=2.0,
+        large_file_threshold=2 * 1024 * 1024,
+        index_dir=None,
+        cache_path=None,
+        save_delay=5.0,
+    ):
+        self._dirs_provider = dirs_provider
+        self.check_interval = check_interval
+        self.large_file_threshold = large_file_threshold
+        self.index_dir = index_dir
+        self.cache_path = cache_path
+        self.save_delay = save_delay
+
+        # Snapshot state: loaded at most once, saved when dirty
+        self._snapshot_tried = cache_path is None
+        self._dirty = False
+        self._save_timer = None
+        if cache_path is not None:
+            atexit.register(self.flush)
+
+        self._lock = threading.RLock()
+        self._roots = None  # [(source, directory), ...] used for the last build
+        self._candidates = {}  # name -> [(priority, entry), ...] sorted
+        self._index = {}  # name -> winning entry
+        self._dir_stamps = {}  # directory -> mtime_ns
+        self._bundle_stamps = {}  # bundle / YAML / JSON path -> stamp
+        self._bundles = {}  # path -> open WildcardBundle or StructuredWildcards
+        self._contents = {}  # content key -> (stamp, options)
+        self._references = {}  # content key -> (stamp, names its options use)
+        self._fingerprints = {}  # names -> fingerprint, for _fingerprint_version
+        self._fingerprint_version = None
+        self._listeners = []
+        self._first_use = []  # callbacks waiting for the index to be built
+        self._checked_at = 0.0
+
+        # Bumped whenever the index or any cached contents change
+        self.version = 0
+
+    # ------------------------------------------------------------------
+    # Index building and validation
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _entry(source, base_dir, path):
+        """Index entry for a wildcard file below base_dir"""
+        rel_path = os.path.relpath(path, base_dir)
+        return {
+            "name": rel_path[: -len(WILDCARD_EXTENSION)].replace(os.sep, "/"),
+            "source": source,
+            "path": path,
+            "file": os.path.basename(path),
+        }
+
+    def _bundle_entries(self, priority, source, base_dir, path, found, bundles):
+        """
+        Add (priority, entry) for every wildcard of a bundle or YAML / JSON
+        file. A file that is already open and unchanged is not read again.
+        """
+        try:
+            bundle = self._bundles.get(path)
+            if bundle is None or bundle.stamp != _stamp(os.stat(path)):
+                bundle = open_multi_file(path)
+        except (OSError, BundleFormatError, StructuredFormatError) as e:
+            logger.warning("[PromptFlow] Skipping wildcard file %s: %s", path, e)
+            return
+        bundles[path] = bundle
+
+        prefix = ""
+        if path != base_dir:
+            folder = os.path.relpath(os.path.dirname(path), base_dir)
+            if folder != ".":
+                prefix = folder.replace(os.sep, "/") + "/"
+        file = os.path.basename(path)
+        for member in bundle.names():
+            entry = {
+                "name": prefix + member,
+                "source": source,
+                "path": path,
+                "file": file,
+                "member": member,
+            }
+            found.append((priority, entry))
+
+    def _walk(self, priority, source, base_dir, top, found, dir_stamps, bundles):
+        """Walk top (inside base_dir), adding (priority, entry) to found"""
+        for root, dirs, files in os.walk(top):
+            try:
+                dir_stamps[root] = os.stat(root).st_mtime_ns
+            except OSError:
+                continue
+
+            for file in files:
+                if file.endswith(WILDCARD_EXTENSION):
+                    entry = self._entry(source, base_dir, os.path.join(root, file))
+                    found.append((priority, entry))
+                elif file.endswith(MULTI_EXTENSIONS):
+                    path = os.path.join(root, file)
+                    self._bundle_entries(
+                        priority, source, base_dir, path, found, bundles
+                    )
+
+    def _scan(self, roots):
+        """Walk all roots and return (candidates, dir_stamps, bundles)"""
+        found = []
+        dir_stamps = {}
+        bundles = {}
+        for priority, (source, base_dir) in enumerate(roots):
+            if os.path.isdir(base_dir):
+                self._walk(
+                    priority, source, base_dir, base_dir, found, dir_stamps, bundles
+                )
+            elif base_dir.endswith(BUNDLE_EXTENSION) and os.path.isfile(base_dir):
+                self._bundle_entries(
+                    priority, source, base_dir, base_dir, found, bundles
+                )
+
+        candidates = {}
+        for priority, entry in found:
+            candidates.setdefault(entry["name"], []).append((priority, entry))
+        return candidates, dir_stamps, bundles
+
+    def _rebuild(self, roots=None):
+        """
+        Rebuild the full index from disk.
+        Returns the set of cached file paths whose contents changed.
+        """
+        if roots is None:
+            roots = list(self._dirs_provider())
+        with _DISCOVERY_TIMER.time():
+            candidates, dir_stamps, bundles = self._scan(roots)
+        logger.debug(
+            "[PromptFlow] Indexed %d wildcards in %d directories",
+            len(candidates),
+            len(dir_stamps),
+        )
+
+        with self._lock:
+            self._roots = roots
+            self._candidates = candidates
+            self._index = {name: entries[0][1] for name, entries in candidates.items()}
+            self._dir_stamps = dir_stamps
+            for path, bundle in self._bundles.items():
+                if bundles.get(path) is not bundle:
+                    bundle.close()
+            self._bundles = bundles
+            self._bundle_stamps = {path: b.stamp for path, b in bundles.items()}
+
+            # Drop cached contents for files that no longer exist in the index
+            live_paths = {
+                _content_key(e) for entries in candidates.values() for _p, e in entries
+            }
+            for path in list(self._contents):
+                if path not in live_paths:
+                    del self._contents[path]
+            for path in list(self._references):
+                if path not in live_paths:
+                    del self._references[path]
+            changed_paths = self._revalidate_contents()
+
+            self._checked_at = time.monotonic()
+            self.version += 1
+            self._mark_dirty()
+        return changed_paths
+
+    def _sync(self):
+        """
+        Bring the index up to date incrementally (lock held): only
+        directories whose mtime changed are listed again, and only files
+        with cached contents are re-checked.
+
+        Returns:
+            Diff dict (see add_listener), or None when nothing changed
+        """
+        roots = list(self._dirs_provider())
+        changed_bundles = self._changed_bundles()
+        root_paths = {directory for _s, directory in roots}
+        if roots != self._roots or not root_paths.isdisjoint(changed_bundles):
+            previous = self._index
+            changed_paths = self._rebuild(roots)
+            touched = set(previous) | set(self._index)
+            return self._diff(previous, touched, changed_paths)
+
+        changed_dirs = []
+        for directory, mtime_ns in self._dir_stamps.items():
+            try:
+                current = os.stat(directory).st_mtime_ns
+            except OSError:
+                current = None
+            if current != mtime_ns:
+                changed_dirs.append(directory)
+        for path in changed_bundles:
+            directory = os.path.dirname(path)
+            if directory not in changed_dirs:
+                changed_dirs.append(directory)
+
+        previous = {}
+        touched = set()
+        if changed_dirs:
+            with _SYNC_TIMER.time():
+                self._relist(changed_dirs, previous, touched)
+        changed_paths = self._revalidate_contents()
+
+        self._checked_at = time.monotonic()
+        if touched:
+            self.version += 1
+            self._mark_dirty()
+        return self._diff(previous, touched, changed_paths)
+
+    def _changed_bundles(self):
+        """Paths of indexed bundles whose file changed or vanished"""
+        changed = []
+        for path, stamp in self._bundle_stamps.items():
+            try:
+                current = _stamp(os.stat(path))
+            except OSError:
+                current = None
+            if current != stamp:
+                changed.append(path)
+        return changed
+
+    def _relist(self, directories, previous, touched):
+        """
+        List changed directories again and update the index (lock held).
+        Records the former winning entry of every affected name in previous
+        and the names in touched.
+        """
+        relisted = set()  # (priority, directory)
+        dropped = []
+        found = []
+        bundles = {}
+        for directory in directories:
+            try:
+                self._dir_stamps[directory] = os.stat(directory).st_mtime_ns
+            except OSError:
+                dropped.append(directory)
+                continue
+
+            for priority, (source, base_dir) in enumerate(self._roots):
+                if directory != base_dir and not directory.startswith(
+                    base_dir + os.sep
+                ):
+                    continue
+                relisted.add((priority, directory))
+                try:
+                    items = list(os.scandir(directory))
+                except OSError:
+                    continue
+                for item in items:
+                    if item.is_dir():
+                        # Directories seen before are checked on their own
+                        if item.path not in self._dir_stamps:
+                            self._walk(
+                                priority,
+                                source,
+                                base_dir,
+                                item.path,
+                                found,
+                                self._dir_stamps,
+                                bundles,
+                            )
+                    elif item.name.endswith(WILDCARD_EXTENSION):
+                        found.append(
+                            (priority, self._entry(source, base_dir, item.path))
+                        )
+                    elif item.name.endswith(MULTI_EXTENSIONS):
+                        self._bundle_entries(
+                            priority, source, base_dir, item.path, found, bundles
+                        )
+
+        dropped_prefixes = tuple(d + os.sep for d in dropped)
+        for directory in list(self._dir_stamps):
+            if directory in dropped or directory.startswith(dropped_prefixes):
+                del self._dir_stamps[directory]
+
+        # Bundles of the relisted directories are replaced by what was found
+        relisted_dirs = {directory for _p, directory in relisted}
+        for path in list(self._bundle_stamps):
+            if path not in bundles and (
+                os.path.dirname(path) in relisted_dirs
+                or path.startswith(dropped_prefixes)
+            ):
+                del self._bundle_stamps[path]
+                bundle = self._bundles.pop(path, None)
+                if bundle is not None:
+                    bundle.close()
+        for path, bundle in bundles.items():
+            replaced = self._bundles.get(path)
+            if replaced is not None and replaced is not bundle:
+                replaced.close()
+            self._bundles[path] = bundle
+        self._bundle_stamps.update((path, b.stamp) for path, b in bundles.items())
+
+        # Forget the entries of relisted / vanished directories, then add
+        # what the listing found
+        for name, entries in list(self._candidates.items()):
+            kept = [
+                (p, e)
+                for p, e in entries
+                if (p, os.path.dirname(e["path"])) not in relisted
+                and not e["path"].startswith(dropped_prefixes)
+            ]
+            if len(kept) != len(entries):
+                touched.add(name)
+                if kept:
+                    self._candidates[name] = kept
+                else:
+                    del self._candidates[name]
+        for priority, entry in found:
+            name = entry["name"]
+            touched.add(name)
+            self._candidates.setdefault(name, []).append((priority, entry))
+
+        # Copy on write: entries() hands the current dict out without the
+        # lock, so it is replaced rather than changed
+        index = dict(self._index) if touched else self._index
+        live_paths = set()
+        for name in touched:
+            if name in index:
+                previous[name] = index[name]
+            entries = self._candidates.get(name)
+            if entries:
+                entries.sort(key=lambda pe: pe[0])
+                index[name] = entries[0][1]
+                live_paths.update(_content_key(e) for _p, e in entries)
+            else:
+                index.pop(name, None)
+        self._index = index
+
+        for name, entry in previous.items():
+            key = _content_key(entry)
+            if key not in live_paths:
+                self._contents.pop(key, None)
+                self._references.pop(key, None)
+
+    def _diff(self, previous, touched, changed_paths):
+        """
+        Build a change diff from the former winning entries of the touched
+        names and the content keys whose contents changed
+        """
+        added = []
+        removed = []
+        modified = set()
+        for name in touched:
+            old = previous.get(name)
+            new = self._index.get(name)
+            if old is None and new is not None:
+                added.append(name)
+            elif old is not None and new is None:
+                removed.append(name)
+            elif old is not None and _content_key(old) != _content_key(new):
+                modified.add(name)
+
+        if changed_paths:
+            for name, entry in self._index.items():
+                if _content_key(entry) in changed_paths and name not in added:
+                    modified.add(name)
+
+        if not (added or removed or modified):
+            return None
+        return {
+            "added": sorted(added),
+            "removed": sorted(removed),
+            "modified": sorted(modified),
+            "version": self.version,
+        }
+
+    def _revalidate_contents(self):
+        """
+        Drop cached option lists whose files changed on disk.
+        Returns the set of their content keys.
+        """
+        changed = set()
+        stamps = {}  # path -> current stamp (bundles hold many wildcards)
+        for key, (stamp, _options) in list(self._contents.items()):
+            path = key[0] if isinstance(key, tuple) else key
+            if path not in stamps:
+                try:
+                    stamps[path] = _stamp(os.stat(path))
+                except OSError:
+                    stamps[path] = None
+            if stamps[path] != stamp:
+                self._contents.pop(key, None)
+                changed.add(key)
+        if changed:
+            self.version += 1
+            self._mark_dirty()
+        return changed
+
+    def _ensure_fresh(self, force=False):
+        """
+        Build the index if needed and re-check mtimes when due.
+        Returns the change diff (None when nothing changed).
+        """
+        now = time.monotonic()
+        if (
+            not force
+            and self._roots is not None
+            and now - self._checked_at < self.check_interval
+        ):
+            return None
+
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if (
+                not force
+                and self._roots is not None
+                and time.monotonic() - self._checked_at < self.check_interval
+            ):
+                return None
+
+            first_use = []
+            if self._roots is None:
+                first_use, self._first_use = self._first_use, []
+
+            if self._roots is None and not self._snapshot_tried:
+                self._snapshot_tried = True
+                with _SNAPSHOT_TIMER.time():
+                    self._load_snapshot()
+
+            if self._roots is None:
+                self._rebuild()
+                diff = None
+            else:
+                diff = self._sync()
+
+        for callback in first_use:
+            try:
+                callback()
+            except Exception:
+                logger.exception("[PromptFlow] Wildcard first-use callback failed")
+        if diff is not None:
+            self._notify(diff)
+        return diff
+
+    @property
+    def built(self):
+        """Whether the index has been built (or loaded) since the last reset"""
+        return self._roots is not None
+
+    def on_first_use(self, callback):
+        """
+        Call callback() once, right after the index is first built or
+        loaded from the snapshot (immediately if that already happened).
+        Lets background work such as a watcher wait until the registry is
+        actually used instead of reading the disk at import.
+        """
+        with self._lock:
+            if self._roots is None:
+                self._first_use.append(callback)
+                return
+        callback()
+
+    def refresh(self):
+        """
+        Re-check the disk now, regardless of ``check_interval``.
+        Returns the change diff (None when nothing changed).
+        """
+        return self._ensure_fresh(force=True)
+
+    def add_listener(self, callback):
+        """
+        Call callback(diff) whenever a change to the wildcards is detected
+        or made through put()/discard(). diff is a dict with sorted
+        "added", "removed" and "modified" name lists and the registry
+        "version". Callbacks run on the thread that noticed the change.
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, diff):
+        for callback in list(self._listeners):
+            try:
+                callback(diff)
+            except Exception:
+                logger.exception("[PromptFlow] Wildcard change listener failed")
+
+    def directories(self):
+        """All indexed directories (for watchers); no disk access"""
+        with self._lock:
+            directories = list(self._dir_stamps)
+            # Bundles used as roots are watched through their folder
+            for _source, path in self._roots or []:
+                if path in self._bundle_stamps:
+                    directories.append(os.path.dirname(path))
+            return directories
+
+    def invalidate(self):
+        """Forget everything; the next access rebuilds from disk"""
+        with self._lock:
+            self._roots = None
+            self._contents.clear()
+            self._references.clear()
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def entries(self):
+        """
+        Mapping of wildcard name -> entry (name, source, path, file).
+        The returned dict is shared; treat it as read-only. Changes replace
+        the registry's dict instead of modifying it, so it is safe to
+        iterate while another thread refreshes.
+        """
+        self._ensure_fresh()
+        return self._index
+
+    def get(self, name):
+        """Return the entry for a wildcard name, or None"""
+        self._ensure_fresh()
+        return self._index.get(name)
+
+    def get_options(self, name):
+        """
+        Return the parsed option list for a wildcard, or None if the
+        wildcard does not exist or cannot be read.
+        The returned list is shared; treat it as read-only. Large files
+        return a LineIndexedOptions and bundled wildcards a BundleOptions
+        sequence, both reading options on demand.
+        """
+        entry = self.get(name)
+        if entry is None:
+            return None
+        return self._options_for(entry)
+
+    def get_many(self, names):
+        """
+        Look up several wildcards with a single freshness check.
+
+        Args:
+            names: Iterable of wildcard names
+
+        Returns:
+            dict mapping each name to (entry, options); entry is None for
+            unknown names and options is None if the file cannot be read
+        """
+        self._ensure_fresh()
+        index = self._index
+        result = {}
+        for name in names:
+            if name in result:
+                continue
+            entry = index.get(name)
+            options = self._options_for(entry) if entry is not None else None
+            result[name] = (entry, options)
+        return result
+
+    def _open_bundle(self, path):
+        """
+        The open bundle or YAML / JSON file at path, reopened when the file
+        was replaced
+        """
+        bundle = self._bundles.get(path)
+        if bundle is None or bundle.stamp != self._bundle_stamps.get(path):
+            bundle = open_multi_file(path)
+            with self._lock:
+                replaced = self._bundles.get(path)
+                if replaced is not None and replaced.stamp == bundle.stamp:
+                    # Another thread reopened it first
+                    bundle.close()
+                    return replaced
+                self._bundles[path] = bundle
+            if replaced is not None:
+                replaced.close()
+        return bundle
+
+    def _options_for(self, entry):
+        """Cached options for an index entry, reading the file on a miss"""
+        path = entry["path"]
+        key = _content_key(entry)
+        cached = self._contents.get(key)
+        if cached is not None:
+            _CONTENTS_CACHE.hit()
+            return cached[1]
+
+        _CONTENTS_CACHE.miss()
+        try:
+            with _PARSE_TIMER.time():
+                if entry.get("member") is not None:
+                    bundle = self._open_bundle(path)
+                    options = bundle.options(entry["member"])
+                    if options is None:
+                        raise KeyError(f"{entry['member']} is not in {path}")
+                    stamp = bundle.stamp
+                elif os.stat(path).st_size >= self.large_file_threshold:
+                    options = LineIndexedOptions(path, self.index_dir)
+                    stamp = options.stamp
+                else:
+                    stamp = _stamp(os.stat(path))
+                    options = read_wildcard_file(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error("[PromptFlow] Error reading wildcard %s: %s", entry["name"], e)
+            return None
+
+        with self._lock:
+            self._contents[key] = (stamp, options)
+            if not isinstance(options, (LineIndexedOptions, BundleOptions)):
+                self._mark_dirty()
+        return options
+
+    def fingerprint(self, names):
+        """
+        Content fingerprint of wildcards and of every wildcard their options
+        reference, recursively.
+
+        Changes whenever one of those files is added, removed, shadowed or
+        edited (as seen by the registry's mtime checks). Results are cached
+        until the registry version changes.
+
+        Args:
+            names: Iterable of wildcard names
+
+        Returns:
+            Hashable tuple of (name, path, stamp); path and stamp are None
+            for wildcards that do not exist
+        """
+        self._ensure_fresh()
+        key = frozenset(names)
+        with self._lock:
+            if self._fingerprint_version != self.version:
+                self._fingerprints = {}
+                self._fingerprint_version = self.version
+            cached = self._fingerprints.get(key)
+        if cached is not None:
+            return cached
+
+        version = self.version
+        seen = {}
+        pending = list(key)
+        while pending:
+            name = pending.pop()
+            if name in seen:
+                continue
+            entry = self._index.get(name)
+            options = self._options_for(entry) if entry is not None else None
+            if options is None:
+                seen[name] = (name, None, None)
+                continue
+            content_key = _content_key(entry)
+            stamp = self._contents.get(content_key, (None,))[0]
+            seen[name] = (name, entry["path"], stamp)
+            pending.extend(self._referenced_names(content_key, stamp, options))
+
+        result = tuple(sorted(seen.values(), key=lambda item: item[0]))
+        with self._lock:
+            if self._fingerprint_version == version:
+                self._fingerprints[key] = result
+        return result
+
+    def _referenced_names(self, key, stamp, options):
+        """Wildcard names used in the options of one file (cached by stamp)"""
+        cached = self._references.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        names = set()
+        if isinstance(options, LineIndexedOptions):
+            # Scan the file instead of seeking to every option
+            try:
+                with open(options.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if "__" in line:
+                            names.update(FILE_PATTERN.findall(line))
+            except (OSError, UnicodeDecodeError):
+                pass
+        else:
+            for option in options:
+                if "__" in option:
+                    names.update(FILE_PATTERN.findall(option))
+
+        names = frozenset(names)
+        self._references[key] = (stamp, names)
+        return names
+
+    def stats(self):
+        """Sizes of the in-memory index (no disk access)"""
+        return {
+            "wildcards": len(self._index),
+            "directories": len(self._dir_stamps),
+            "bundles": len(self._bundle_stamps),
+            "cached_files": len(self._contents),
+            "version": self.version,
+        }
+
+    # ------------------------------------------------------------------
+    # Persistent snapshot
+    # ------------------------------------------------------------------
+
+    def _load_snapshot(self):
+        """Restore the index and parsed contents saved by a previous run"""
+        try:
+            with open(self.cache_path, "rb") as f:
+                snapshot = pickle.load(f)
+            if (
+                not isinstance(snapshot, dict)
+                or snapshot.get("format") != SNAPSHOT_FORMAT
+            ):
+                return False
+
+            contents = {}
+            for path, (stamp, options, weights) in snapshot["contents"].items():
+                if weights is not None:
+                    options = weighted_list(options, weights)
+                contents[path] = (stamp, options)
+
+            candidates = snapshot["candidates"]
+            self._roots = [tuple(root) for root in snapshot["roots"]]
+            self._candidates = candidates
+            self._index = {name: entries[0][1] for name, entries in candidates.items()}
+            self._dir_stamps = snapshot["dir_stamps"]
+            self._bundle_stamps = snapshot["bundle_stamps"]
+            self._bundles = {}
+            self._contents = contents
+        except FileNotFoundError:
+            return False
+        # Unpickling a stale or corrupt file can raise almost any exception
+        except Exception as e:  # noqa: BLE001
+            logger.warning(
+                "[PromptFlow] Ignoring wildcard cache %s: %s", self.cache_path, e
+            )
+            return False
+
+        # Validated against the disk right after loading
+        self._checked_at = 0.0
+        self.version += 1
+        return True
+
+    def _mark_dirty(self):
+        """Schedule a snapshot save (called with the lock held)"""
+        if self.cache_path is None:
+            return
+        self._dirty = True
+        if self._save_timer is None:
+            timer = threading.Timer(self.save_delay, self.flush)
+            timer.daemon = True
+            self._save_timer = timer
+            timer.start()
+
+    def flush(self):
+        """Write the snapshot now if anything changed since the last save"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty or self._roots is None:
+                return
+            contents = {}
+            for key, (stamp, options) in self._contents.items():
+                if isinstance(options, (LineIndexedOptions, BundleOptions)):
+                    continue  # Read from an index on disk anyway
+                weights = getattr(options, "weights", None)
+                contents[key] = (
+                    stamp,
+                    list(options),
+                    list(weights) if weights is not None else None,
+                )
+            snapshot = {
+                "format": SNAPSHOT_FORMAT,
+                "roots": list(self._roots),
+                "candidates": self._candidates,
+                "dir_stamps": self._dir_stamps,
+                "bundle_stamps": self._bundle_stamps,
+                "contents": contents,
+            }
+            data = pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+            self._dirty = False
+
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            logger.warning("[PromptFlow] Could not save wildcard cache: %s", e)
+
+    # ------------------------------------------------------------------
+    # Direct updates (used by save/delete so no rescan is needed)
+    # ------------------------------------------------------------------
+
+    def _restamp_dirs(self, path):
+        """Refresh stamps of the directories between path and its root"""
+        directory = os.path.dirname(path)
+        roots = {d for _s, d in self._roots or []}
+        while directory:
+            try:
+                self._dir_stamps[directory] = os.stat(directory).st_mtime_ns
+            except OSError:
+                self._dir_stamps.pop(directory, None)
+            if directory in roots:
+                break
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                break
+            directory = parent
+
+    def put(self, name, source, path, options=None):
+        """
+        Register (or replace) a wildcard file that was just written.
+
+        Args:
+            name: Wildcard name like "animals" or "styles/anime"
+            source: Source label of the directory the file lives in
+            path: Absolute path of the file; outside every wildcard directory
+                it ranks below all of them until the next rescan
+            options: Parsed options to prime the contents cache with
+        """
+        with self._lock:
+            if self._roots is None:
+                self._rebuild()
+                return
+
+            priority = next(
+                (
+                    i
+                    for i, (_s, d) in enumerate(self._roots)
+                    if path.startswith(d + os.sep)
+                ),
+                None,
+            )
+            if priority is None:
+                # Not below a known root (e.g. a directory created since the
+                # last scan): never let it shadow indexed files, and re-check
+                # the roots on the next lookup
+                priority = len(self._roots)
+                self._checked_at = float("-inf")
+            entry = {
+                "name": name,
+                "source": source,
+                "path": path,
+                "file": os.path.basename(path),
+            }
+
+            previous = {name: self._index[name]} if name in self._index else {}
+            entries = [
+                (p, e) for p, e in self._candidates.get(name, []) if e["path"] != path
+            ]
+            entries.append((priority, entry))
+            entries.sort(key=lambda pe: pe[0])
+            self._candidates[name] = entries
+            index = dict(self._index)  # copy on write, see _relist
+            index[name] = entries[0][1]
+            self._index = index
+
+            try:
+                stamp = _stamp(os.stat(path))
+            except OSError:
+                stamp = None
+            if options is not None and stamp is not None:
+                self._contents[path] = (stamp, parse_wildcard_lines(options))
+            else:
+                self._contents.pop(path, None)
+
+            self._restamp_dirs(path)
+            self.version += 1
+            self._mark_dirty()
+            diff = self._diff(previous, {name}, {path})
+
+        if diff is not None:
+            self._notify(diff)
+
+    def discard(self, name, path):
+        """Forget a wildcard file that was just deleted"""
+        with self._lock:
+            if self._roots is None:
+                return
+
+            previous = {name: self._index[name]} if name in self._index else {}
+            entries = [
+                (p, e) for p, e in self._candidates.get(name, []) if e["path"] != path
+            ]
+            index = dict(self._index)  # copy on write, see _relist
+            if entries:
+                self._candidates[name] = entries
+                index[name] = entries[0][1]
+            else:
+                self._candidates.pop(name, None)
+                index.pop(name, None)
+            self._index = index
+
+            self._contents.pop(path, None)
+            self._restamp_dirs(path)
+            self.version += 1
+            self._mark_dirty()
+            diff = self._diff(previous, {name}, {path})
+
+        if diff is not None:
+            self._notify(diff)
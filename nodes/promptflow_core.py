@@ -3,11 +3,15 @@ PromptFlow Core Node
 Handles prompt building, wildcard processing, and output generation
 """
 
-import json
-import re
-import random
-import os
-from pathlib import Path
+from ..core.engine import (
+    EXTENDED_FIELDS,
+    MAX_BATCH_SIZE,
+    SIMPLE_FIELDS,
+    batch_seeds,
+    default_engine,
+)
+from ..core.metrics import METRICS
+from ..core.templates import cleanup_prompt, compile_widget_data
 
 # Import ComfyUI's PromptServer for sending messages to frontend
 try:
@@ -17,21 +21,9 @@ try:
 except ImportError:
     HAS_SERVER = False
 
-# Import wildcard functions from parent module (lazy import to avoid circular)
-_wildcard_funcs = None
-
-
-def get_wildcard_funcs():
-    """Lazy import of wildcard functions from parent module"""
-    global _wildcard_funcs
-    if _wildcard_funcs is None:
-        try:
-            from .. import list_wildcards, get_wildcard_contents
-
-            _wildcard_funcs = {"list": list_wildcards, "get": get_wildcard_contents}
-        except ImportError:
-            _wildcard_funcs = {"list": lambda: {}, "get": lambda x: None}
-    return _wildcard_funcs
+_PROCESS_TIMER = METRICS.timer(
+    "node_process", "PromptFlow node executions", node="PromptFlow"
+)
 
 
 class PromptFlowCore:
@@ -40,7 +32,9 @@ class PromptFlowCore:
 
     Supports:
     - Simple mode (3 fields) and Extended mode (10 fields)
-    - Wildcard processing {a|b|c}
+    - Wildcard processing {a|b|c}, nested {a|{b|c} d} and __file__ wildcards
+      that reference other wildcards
+    - Shuffle mode: distinct wildcard combinations for consecutive seeds
     - Built-in presets for Style, Quality, Negative
     - LoRA Manager trigger words integration
     """
@@ -50,22 +44,9 @@ class PromptFlowCore:
     FUNCTION = "process"
     OUTPUT_NODE = False
 
-    # Simple mode fields
-    SIMPLE_FIELDS = ["main_prompt", "style", "quality"]
-
-    # Extended mode fields (ordered by prompt importance)
-    EXTENDED_FIELDS = [
-        "subject",
-        "character",
-        "outfit",
-        "pose",
-        "location",
-        "style",
-        "camera",
-        "lighting",
-        "quality",
-        "custom",
-    ]
+    # Field orders of the two modes (see core.engine)
+    SIMPLE_FIELDS = SIMPLE_FIELDS
+    EXTENDED_FIELDS = EXTENDED_FIELDS
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -107,6 +88,24 @@ class PromptFlowCore:
                         "tooltip": "Optional prompt to prepend to output",
                     },
                 ),
+                "batch_size": (
+                    "INT",
+                    {
+                        "default": 1,
+                        "min": 1,
+                        "max": MAX_BATCH_SIZE,
+                        "tooltip": "Number of prompts to output (as lists), one per seed",
+                    },
+                ),
+                "seed_stride": (
+                    "INT",
+                    {
+                        "default": 1,
+                        "min": 1,
+                        "max": 0xFFFFFFFF,
+                        "tooltip": "Seed step between the prompts of a batch",
+                    },
+                ),
             },
             "hidden": {
                 "unique_id": "UNIQUE_ID",
@@ -115,9 +114,18 @@ class PromptFlowCore:
 
     RETURN_TYPES = ("STRING", "STRING", "STRING")
     RETURN_NAMES = ("positive", "negative", "prompt_data")
+    # positive / negative hold one prompt per seed of the batch
+    OUTPUT_IS_LIST = (True, True, False)
 
     def process(
-        self, widget_data, seed=0, trigger_words="", input_prompt="", unique_id=None
+        self,
+        widget_data,
+        seed=0,
+        trigger_words="",
+        input_prompt="",
+        batch_size=1,
+        seed_stride=1,
+        unique_id=None,
     ):
         """
         Process the widget data and generate outputs.
@@ -127,87 +135,23 @@ class PromptFlowCore:
             seed: Seed for deterministic wildcard selection
             trigger_words: Optional trigger words from LoRA Manager
             input_prompt: Optional prompt to prepend
+            batch_size: Number of prompts to resolve
+            seed_stride: Seed step between the prompts of a batch
             unique_id: ComfyUI node unique ID
 
         Returns:
-            Tuple of (positive, negative, prompt_data)
+            Tuple of (positive list, negative list, prompt_data); prompt k
+            of the batch uses seed + k * seed_stride
         """
-        # Parse widget data
-        try:
-            data = json.loads(widget_data) if widget_data else {}
-        except json.JSONDecodeError:
-            data = {}
-
-        # Initialize random with seed for deterministic results
-        rng = random.Random(seed)
+        seeds = batch_seeds(seed, batch_size, seed_stride)
 
-        # Get mode and fields
-        mode = data.get("mode", "simple")
-        fields = self.SIMPLE_FIELDS if mode == "simple" else self.EXTENDED_FIELDS
-
-        # Get category order (for extended mode with drag-reorder)
-        category_order = data.get("categoryOrder", fields)
-
-        # Process each field
-        prompt_parts = []
-        categories = data.get("categories", {})
-
-        for field in category_order:
-            if field not in categories:
-                continue
-
-            field_data = categories[field]
-            value = field_data.get("value", "").strip()
-            field_mode = field_data.get("mode", "fixed")
-
-            if not value:
-                continue
-
-            # Process wildcards based on field mode
-            processed = self._process_wildcards(value, field_mode, rng, seed)
-
-            if processed:
-                prompt_parts.append(processed)
-
-        # Build positive prompt
-        positive_parts = []
-
-        # 1. Trigger words first (from LoRA Manager)
-        if trigger_words and trigger_words.strip():
-            positive_parts.append(trigger_words.strip())
-
-        # 2. Input prompt (if provided)
-        if input_prompt and input_prompt.strip():
-            positive_parts.append(input_prompt.strip())
-
-        # 3. Main prompt content
-        if prompt_parts:
-            positive_parts.append(", ".join(prompt_parts))
-
-        positive = ", ".join(positive_parts) if positive_parts else ""
-
-        # Clean up duplicate commas and whitespace
-        positive = self._cleanup_prompt(positive)
+        with _PROCESS_TIMER.time():
+            positives, negatives, compiled = self.resolve_batch(
+                widget_data, seeds, trigger_words, input_prompt
+            )
 
-        # Get negative prompt
-        negative = data.get("negative", "").strip()
-        negative = self._process_wildcards(negative, "fixed", rng, seed)
-        negative = self._cleanup_prompt(negative)
-
-        # Prepare prompt_data output (full state for debugging/chaining)
-        prompt_data = json.dumps(
-            {
-                "mode": mode,
-                "categories": categories,
-                "negative": negative,
-                "seed": seed,
-                "processed": {
-                    "positive": positive,
-                    "negative": negative,
-                },
-            },
-            indent=2,
-        )
+            # Prepare prompt_data output (full state for debugging/chaining)
+            prompt_data = compiled.prompt_data(positives[0], negatives[0], seed)
 
         # Send resolved prompt to frontend for display
         if HAS_SERVER and unique_id is not None:
@@ -215,121 +159,93 @@ class PromptFlowCore:
                 "promptflow.resolved",
                 {
                     "node_id": unique_id,
-                    "positive": positive,
-                    "negative": negative,
+                    "positive": positives[0],
+                    "negative": negatives[0],
+                    "batch_size": len(seeds),
                 },
             )
 
-        return (positive, negative, prompt_data)
+        return (positives, negatives, prompt_data)
 
-    def _process_wildcards(self, text, mode, rng, seed):
+    def resolve(self, widget_data, seed=0, trigger_words="", input_prompt=""):
         """
-        Process wildcard syntax in text.
-        Supports both:
-        - Inline wildcards: {option1|option2|option3}
-        - File wildcards: __wildcard_name__
-
-        Args:
-            text: Text containing wildcards
-            mode: Processing mode (fixed, random, increment, decrement)
-            rng: Random number generator instance
-            seed: Seed value for increment/decrement modes
+        Resolve the positive and negative prompts for one seed.
+        Same result as process(), without building prompt_data or
+        notifying the frontend.
 
         Returns:
-            Processed text with wildcards resolved
+            Tuple of (positive, negative, compiled widget data)
         """
-        if not text:
-            return text
-
-        # Counter for increment/decrement within same text
-        wildcard_index = [0]
-
-        def select_option(options):
-            """Select an option based on mode"""
-            if not options:
-                return ""
-
-            if mode == "random":
-                return rng.choice(options)
-            elif mode == "increment":
-                idx = (seed + wildcard_index[0]) % len(options)
-                wildcard_index[0] += 1
-                return options[idx]
-            elif mode == "decrement":
-                idx = (-(seed + wildcard_index[0]) - 1) % len(options)
-                wildcard_index[0] += 1
-                return options[idx]
-            else:  # fixed - use first option
-                return options[0]
-
-        # First, process file-based wildcards: __name__ or __path/name__
-        file_pattern = r"__([a-zA-Z0-9_\-/]+)__"
-
-        def replace_file_wildcard(match):
-            wildcard_name = match.group(1)
-            funcs = get_wildcard_funcs()
-            options = funcs["get"](wildcard_name)
-
-            if options is None or len(options) == 0:
-                # Wildcard file not found or empty, return original
-                print(
-                    f"[PromptFlow] Warning: Wildcard '__{wildcard_name}__' not found or empty"
-                )
-                return match.group(0)
-
-            return select_option(options)
-
-        text = re.sub(file_pattern, replace_file_wildcard, text)
+        return default_engine().resolve(widget_data, seed, trigger_words, input_prompt)
 
-        # Then, process inline wildcards: {option1|option2|option3}
-        inline_pattern = r"\{([^}]+)\}"
+    def resolve_batch(self, widget_data, seeds, trigger_words="", input_prompt=""):
+        """
+        Resolve the positive and negative prompts for several seeds in one
+        pass (see PromptEngine.resolve_batch).
 
-        def replace_inline_wildcard(match):
-            options_str = match.group(1)
-            options = [opt.strip() for opt in options_str.split("|")]
-            return select_option(options)
+        Returns:
+            Tuple of (positives, negatives, compiled widget data), one
+            prompt per seed
+        """
+        return default_engine().resolve_batch(
+            widget_data, seeds, trigger_words, input_prompt
+        )
 
-        text = re.sub(inline_pattern, replace_inline_wildcard, text)
+    def resolve_prompt(self, prompt, seed=0, mode="random"):
+        """
+        Resolve a raw wildcard prompt (not PromptFlow widget data) for one
+        seed, using the same wildcard and cleanup rules as a category.
+        """
+        return default_engine().resolve_prompt(prompt, seed, mode)
 
-        return text
+    def _process_wildcards(self, text, mode, rng, seed):
+        """Process wildcard syntax in text (see PromptEngine.resolve_text)"""
+        return default_engine().resolve_text(text, mode, rng, seed)
 
     def _cleanup_prompt(self, text):
         """
         Clean up duplicate commas and whitespace in prompt text.
         """
-        if not text:
-            return text
-
-        # Replace multiple commas (with optional whitespace) with single comma
-        text = re.sub(r",(\s*,)+", ",", text)
-        # Remove leading/trailing commas and whitespace
-        text = re.sub(r"^[\s,]+|[\s,]+$", "", text)
-        # Normalize spaces around commas
-        text = re.sub(r"\s*,\s*", ", ", text)
-        # Remove multiple spaces
-        text = re.sub(r"\s+", " ", text)
-
-        return text.strip()
+        return cleanup_prompt(text)
 
     @classmethod
     def IS_CHANGED(
-        cls, widget_data, seed=0, trigger_words="", input_prompt="", unique_id=None
+        cls,
+        widget_data,
+        seed=0,
+        trigger_words="",
+        input_prompt="",
+        batch_size=1,
+        seed_stride=1,
+        unique_id=None,
     ):
         """
         Tell ComfyUI when to re-execute the node.
-        For random mode, always re-execute. Otherwise, check inputs.
+
+        Resolution is deterministic for a seed (random fields included), so
+        the key covers the inputs plus a fingerprint of every wildcard file
+        the fields reference: re-queueing with the same seed is a cache hit,
+        editing a referenced wildcard file re-executes.
         """
         try:
-            data = json.loads(widget_data) if widget_data else {}
-            categories = data.get("categories", {})
-
-            # Check if any field is in random mode
-            for field_data in categories.values():
-                if field_data.get("mode") == "random":
-                    # Return unique value to force re-execution
-                    return float("nan")
+            compiled = compile_widget_data(
+                widget_data, cls.SIMPLE_FIELDS, cls.EXTENDED_FIELDS
+            )
+            texts = [text.source for _f, _m, text in compiled.fields]
+            texts.append(compiled.negative.source)
 
             # Return hash of inputs for caching
-            return hash((widget_data, seed, trigger_words, input_prompt))
-        except:
+            return hash(
+                (
+                    widget_data,
+                    seed,
+                    trigger_words,
+                    input_prompt,
+                    batch_size,
+                    seed_stride,
+                    default_engine().fingerprint(texts),
+                )
+            )
+        except (TypeError, ValueError, AttributeError, OSError):
+            # Unreadable widget data or wildcards: always re-execute
             return float("nan")
@@ -4,7 +4,19 @@ Displays wildcard variations and enables batch generation
 """
 
 import json
-import re
+
+from ..core.engine import default_engine
+from ..core.metrics import METRICS
+from ..core.variations import (
+    build_variation_space,
+    extract_wildcards,
+    template_from_prompt_input,
+)
+from .promptflow_core import PromptFlowCore
+
+_PROCESS_TIMER = METRICS.timer(
+    "node_process", "PromptFlow node executions", node="PromptFlow Variations"
+)
 
 
 class PromptFlowVariations:
@@ -45,6 +57,13 @@ class PromptFlowVariations:
                         "tooltip": "Starting seed for batch generation",
                     },
                 ),
+                "order": (
+                    ["sequential", "shuffle"],
+                    {
+                        "default": "sequential",
+                        "tooltip": "Which variation a seed selects: in list order, or from a seeded shuffle where consecutive seeds never repeat a combination",
+                    },
+                ),
             },
             "hidden": {
                 "unique_id": "UNIQUE_ID",
@@ -57,39 +76,66 @@ class PromptFlowVariations:
             },
         }
 
-    RETURN_TYPES = ("STRING", "INT", "STRING")
-    RETURN_NAMES = ("prompt", "variation_count", "variations_json")
+    RETURN_TYPES = ("STRING", "INT", "STRING", "STRING")
+    RETURN_NAMES = ("prompt", "variation_count", "variations_json", "variation")
 
-    def process(self, prompt, seed=0, unique_id=None, widget_data="{}"):
+    @_PROCESS_TIMER.wrap
+    def process(
+        self, prompt, seed=0, order="sequential", unique_id=None, widget_data="{}"
+    ):
         """
         Process the prompt and extract wildcard information.
 
         Args:
             prompt: Text containing wildcards
             seed: Starting seed for batch generation
+            order: "sequential" or "shuffle" selection of the variation output
             unique_id: ComfyUI node unique ID
             widget_data: Internal widget state
 
         Returns:
-            Tuple of (prompt, variation_count, variations_json)
+            Tuple of (prompt, variation_count, variations_json, variation)
+            where variation is combination number (seed % variation_count),
+            or that position of the shuffled order
         """
-        # Extract wildcards
-        wildcards = self._extract_wildcards(prompt)
-
-        # Calculate total variations
-        variation_count = 1
+        template = template_from_prompt_input(
+            prompt, PromptFlowCore.SIMPLE_FIELDS, PromptFlowCore.EXTENDED_FIELDS
+        )
+
+        # Extract wildcards and load file wildcard options
+        space, wildcards = build_variation_space(template, default_engine().get_options)
+        variation_count = space.total
+
+        # Pick the variation addressed by the seed (same order as the widget)
+        index = seed % variation_count
+        if order == "shuffle":
+            index = space.shuffled_index(index)
+        variation, probability = space.render_with_probability(space.digits(index))
+
+        # Build variations info for the widget (file options are loaded by
+        # the frontend on demand, only their counts are included)
+        wildcard_info = []
         for wildcard in wildcards:
-            if wildcard.get("options"):
-                variation_count *= len(wildcard["options"])
+            item = dict(wildcard)
+            if wildcard["type"] == "file":
+                item["options"] = None
+            wildcard_info.append(item)
 
-        # Build variations info for the widget
         variations_info = {
-            "wildcards": wildcards,
+            "wildcards": wildcard_info,
             "total_variations": variation_count,
             "seed": seed,
+            "order": order,
+            "variation_index": index,
+            "variation_probability": probability,
         }
 
-        return (prompt, variation_count, json.dumps(variations_info, indent=2))
+        return (
+            prompt,
+            variation_count,
+            json.dumps(variations_info, indent=2),
+            variation,
+        )
 
     def _extract_wildcards(self, text):
         """
@@ -97,39 +143,17 @@ class PromptFlowVariations:
 
         Returns list of wildcard objects with their options.
         """
-        if not text:
-            return []
-
-        wildcards = []
-
-        # Pattern for inline wildcards: {option1|option2|option3}
-        inline_pattern = r"\{([^}]+)\}"
-        for match in re.finditer(inline_pattern, text):
-            options = [opt.strip() for opt in match.group(1).split("|")]
-            if len(options) > 1:
-                wildcards.append(
-                    {
-                        "type": "inline",
-                        "full": match.group(0),
-                        "options": options,
-                    }
-                )
-
-        # Pattern for file-based wildcards: __name__
-        file_pattern = r"__([a-zA-Z0-9_\-/]+)__"
-        for match in re.finditer(file_pattern, text):
-            wildcards.append(
-                {
-                    "type": "file",
-                    "full": match.group(0),
-                    "name": match.group(1),
-                    "options": None,  # Loaded by frontend
-                }
-            )
-
-        return wildcards
+        return extract_wildcards(text)
 
     @classmethod
-    def IS_CHANGED(cls, prompt, seed=0, unique_id=None, widget_data="{}"):
-        """Check if node needs re-execution."""
-        return hash((prompt, seed))
+    def IS_CHANGED(
+        cls, prompt, seed=0, order="sequential", unique_id=None, widget_data="{}"
+    ):
+        """
+        Check if node needs re-execution: inputs plus a fingerprint of the
+        wildcard files the prompt references (their option counts matter).
+        """
+        try:
+            return hash((prompt, seed, order, default_engine().fingerprint([prompt])))
+        except (TypeError, ValueError, OSError):
+            return float("nan")
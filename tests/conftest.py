@@ -0,0 +1,24 @@
+"""
+PromptFlow tests
+Run from the PromptFlow directory with ``python -m pytest tests``. Most tests
+import only the ComfyUI-independent core package; the ``promptflow`` fixture
+loads the whole extension with stub ComfyUI modules.
+"""
+
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+
+@pytest.fixture(scope="session")
+def promptflow(tmp_path_factory):
+    """The whole extension, imported with stand-ins for the ComfyUI modules"""
+    from benchmarks.stubs import install_stubs, load_promptflow
+
+    install_stubs(str(tmp_path_factory.mktemp("comfyui")))
+    return load_promptflow(REPO_DIR, name="promptflow_under_test")
@@ -0,0 +1,232 @@
+"""Tests for core.api (request validation and payloads of the HTTP routes)"""
+
+import json
+import sys
+
+import pytest
+
+from core import api
+from core.listing import parse_fields
+from core.variations import VariationSpace
+from core.wildcards import WildcardRegistry
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def _registry(root):
+    return WildcardRegistry(lambda: [("local", str(root))], check_interval=3600)
+
+
+@pytest.mark.parametrize(
+    ("value", "message"),
+    [
+        ("abc", "limit must be an integer"),
+        (None, "limit must be an integer"),
+        (True, "limit must be an integer"),
+        ("-1", "limit must not be negative"),
+    ],
+)
+def test_int_param_names_the_field(value, message):
+    with pytest.raises(ValueError, match=f"^{message}$"):
+        api.int_param({"limit": value}, "limit", 50, minimum=0)
+
+
+def test_listing_params():
+    assert api.wildcard_listing_params({}, parse_fields)[0] == "all"
+    assert api.wildcard_listing_params({"tree": "1"}, parse_fields)[0] == "tree"
+
+    view, params = api.wildcard_listing_params({"limit": "999999"}, parse_fields)
+    assert view == "page"
+    assert params["limit"] == api.MAX_WILDCARD_PAGE
+    assert params["cursor"] is None
+
+    with pytest.raises(ValueError, match="^limit must be an integer$"):
+        api.wildcard_listing_params({"limit": "abc"}, parse_fields)
+    with pytest.raises(ValueError, match="^limit must be at least 1$"):
+        api.wildcard_listing_params({"limit": "0"}, parse_fields)
+
+
+def test_search_params():
+    assert api.search_params({"q": "red", "limit": "9999"}) == (
+        "red",
+        api.MAX_SEARCH_LIMIT,
+        0,
+        "all",
+        False,
+    )
+    with pytest.raises(ValueError, match="^q is required$"):
+        api.search_params({"q": "  "})
+    with pytest.raises(ValueError, match="^scope must be one of"):
+        api.search_params({"q": "red", "scope": "everything"})
+
+
+def test_seed_list_and_range():
+    assert api.parse_seed_list({"seeds": [3, 1]}) == [3, 1]
+    seed_range = {"start": "10", "count": 3, "step": 5}
+    assert api.parse_seed_list({"seed_range": seed_range}) == [10, 15, 20]
+
+    with pytest.raises(ValueError, match="^seeds must be a list of integers$"):
+        api.parse_seed_list({"seeds": [1, True]})
+    with pytest.raises(ValueError, match="^count must not be negative$"):
+        api.parse_seed_list({"seed_range": {"count": -1}})
+    with pytest.raises(ValueError, match="^step must be an integer$"):
+        api.parse_seed_list({"seed_range": {"step": "x"}})
+    with pytest.raises(ValueError, match="^Seeds must not be negative$"):
+        api.parse_seed_list({"seed_range": {"start": 1, "count": 3, "step": -1}})
+    with pytest.raises(ValueError, match="^At most"):
+        api.parse_seed_list({"seeds": [0] * (api.MAX_RESOLVE_SEEDS + 1)})
+
+
+def test_resolve_request():
+    widget_data = {"mode": "simple", "categories": {}}
+    args, seeds = api.resolve_request({"widget_data": widget_data, "seeds": [1]})
+    assert args == (json.dumps(widget_data), "", "")
+    assert seeds == [1]
+
+    args, _seeds = api.resolve_request({"prompt": "a {b|c}", "seeds": [1]})
+    assert args == ("a {b|c}", "random")
+
+    with pytest.raises(ValueError, match="^Expected a JSON object$"):
+        api.resolve_request([])
+    with pytest.raises(ValueError, match="^Provide either widget_data or prompt$"):
+        api.resolve_request({"seeds": [1]})
+
+
+def test_batch_request():
+    names, sample = api.batch_request({"names": ["styles---SLASH---anime"]})
+    assert names == ["styles/anime"] and sample is None
+    assert api.batch_request({"names": [], "sample": "3"})[1] == 3
+
+    with pytest.raises(ValueError, match="^sample must be a non-negative integer$"):
+        api.batch_request({"names": [], "sample": "-1"})
+    with pytest.raises(ValueError, match="^names must be a list of strings$"):
+        api.batch_request({"names": "colors"})
+
+
+def test_wildcard_payloads(tmp_path):
+    _write(tmp_path / "colors.txt", "2::red\nblue\n")
+    registry = _registry(tmp_path)
+
+    status, payload = api.wildcard_contents_payload(registry, "colors")
+    assert status == 200
+    assert payload["options"] == ["red", "blue"]
+    assert payload["weights"] == [2.0, 1.0]
+    assert api.wildcard_contents_payload(registry, "nope")[0] == 404
+
+    batch = api.wildcard_batch_payload(registry, ["colors", "nope"], sample=1)
+    assert batch["missing"] == ["nope"]
+    assert batch["wildcards"]["colors"]["sample"] == ["red"]
+    assert batch["wildcards"]["colors"]["count"] == 2
+
+
+def test_save_and_delete_wildcard_files(tmp_path):
+    registry = _registry(tmp_path)
+    registry.entries()
+
+    result = api.save_wildcard_file(registry, str(tmp_path), "styles/anime", ["cel"])
+    assert result["success"]
+    assert (tmp_path / "styles" / "anime.txt").read_text(encoding="utf-8") == "cel"
+    assert registry.get_options("styles/anime") == ["cel"]
+
+    again = api.save_wildcard_file(registry, str(tmp_path), "styles/anime", ["x"])
+    assert not again["success"] and "already exists" in again["error"]
+    assert not api.save_wildcard_file(registry, str(tmp_path), "../up", ["x"])[
+        "success"
+    ]
+
+    assert api.delete_wildcard_file(registry, str(tmp_path), "styles/anime")["success"]
+    assert registry.get("styles/anime") is None
+    assert not api.delete_wildcard_file(registry, str(tmp_path), "styles/anime")[
+        "success"
+    ]
+
+
+def test_variations_pages_follow_the_offset_cursor():
+    space = VariationSpace("{a|b|c} {x|y}", lambda name: None)
+    payload = api.variations_page_payload("t", space, [], 4, 50, "sequential")
+    assert payload["total"] == 6
+    assert [row["index"] for row in payload["variations"]] == [4, 5]
+
+    # Paging with the number of rows seen so far visits every index once
+    seen = []
+    while len(seen) < space.total:
+        page = api.variations_page_payload("t", space, [], len(seen), 4, "shuffle")
+        seen.extend(row["variation"] for row in page["variations"])
+    assert sorted(seen) == list(range(6))
+
+    rows = list(api.variation_rows(space, 1, 2, "sequential"))
+    assert [(row["index"], row["prompt"]) for row in rows] == [(1, "a y"), (2, "b x")]
+
+
+def test_variations_params():
+    assert api.variations_params({"limit": "5000"})["limit"] == api.MAX_VARIATIONS_PAGE
+    streamed = api.variations_params({"limit": "5000", "stream": "true"})
+    assert streamed["limit"] == 5000 and streamed["stream"]
+    with pytest.raises(ValueError, match="^offset must not be negative$"):
+        api.variations_params({"offset": "-1"})
+    with pytest.raises(ValueError, match="^prompt must be a string$"):
+        api.variations_template({"prompt": 5})
+
+
+def test_export_command():
+    command, fmt = api.export_command(
+        "a {b|c}",
+        {"format": "csv", "workers": "64", "stop": "10"},
+        [("local", "/w")],
+        "/idx",
+        cpu_count=4,
+    )
+    assert fmt == "csv"
+    assert command[:3] == [sys.executable, "-m", "core.export"]
+    assert command[command.index("--workers") + 1] == "4"
+    assert command[command.index("--stop") + 1] == "10"
+    assert command[command.index("--wildcards") + 1] == "local=/w"
+    assert command[-2:] == ["--", "a {b|c}"]
+
+    with pytest.raises(ValueError, match="^format must be one of"):
+        api.export_command("t", {"format": "xml"}, [], "/idx")
+    with pytest.raises(ValueError, match="^stop must not be negative$"):
+        api.export_command("t", {"stop": "-5"}, [], "/idx")
+
+    assert api.export_error(b"Traceback\nValueError: boom\n", 1) == "ValueError: boom"
+    assert api.export_error(b"", 3) == "export failed (exit code 3)"
+
+
+def test_categorizer_cache_follows_the_keyword_file(tmp_path):
+    path = tmp_path / "categories.json"
+    errors = []
+    cache = api.CategorizerCache(
+        lambda: str(path), on_error=lambda p, e: errors.append(p)
+    )
+    default = cache.get()
+    assert cache.get() is default
+    assert default.categorize_tag("zeppelin") is None
+
+    _write(path, json.dumps({"vehicles": ["zeppelin"]}))
+    assert cache.get().categorize_tag("zeppelin") == "vehicles"
+
+    # Extra tables apply to one call only
+    assert cache.get({"props": ["lantern"]}).categorize_tag("lantern") == "props"
+    assert cache.get().categorize_tag("lantern") is None
+
+    _write(path, "[not an object]")
+    assert cache.get().categorize_tag("zeppelin") is None
+    assert errors == [str(path)]
+
+
+def test_categorize_request():
+    assert api.categorize_request({"prompt": "1girl"}) == (["1girl"], "extended", None)
+    with pytest.raises(ValueError, match="^prompts must be a list of strings$"):
+        api.categorize_request({"prompts": [1]})
+    with pytest.raises(ValueError, match="^keywords must map categories"):
+        api.categorize_request({"prompt": "x", "keywords": {"a": "b"}})
+
+
+def test_etag_matches():
+    assert api.etag_matches('"x", W/"abc"', '"abc"')
+    assert api.etag_matches("*", '"abc"')
+    assert not api.etag_matches(None, '"abc"')
+    assert not api.etag_matches('"abd"', '"abc"')
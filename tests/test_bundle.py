@@ -0,0 +1,28 @@
+"""Tests for core.bundle and bundles in the wildcard registry"""
+
+import os
+
+from core.bundle import build_bundle
+from core.wildcards import WildcardRegistry
+
+
+def test_rebuilt_bundle_replaces_the_old_mapping(tmp_path):
+    source = tmp_path / "source"
+    source.mkdir()
+    (source / "colors.txt").write_text("red\nblue\n", encoding="utf-8")
+    root = tmp_path / "wildcards"
+    root.mkdir()
+    path = str(root / "pack.pfw")
+    build_bundle(str(source), path)
+
+    registry = WildcardRegistry(lambda: [("local", str(root))], check_interval=0)
+    assert list(registry.get_options("colors")) == ["red", "blue"]
+    old = registry._bundles[path]
+
+    (source / "colors.txt").write_text("green\n", encoding="utf-8")
+    build_bundle(str(source), path)
+    os.utime(path, ns=(1, 1))
+    assert list(registry.get_options("colors")) == ["green"]
+    assert registry._bundles[path] is not old
+    if os.name != "nt":
+        assert old._map.closed
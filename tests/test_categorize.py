@@ -0,0 +1,106 @@
+"""Tests for core.categorize (keyword auto-categorizer)"""
+
+import json
+import random
+
+import pytest
+
+from core.categorize import (
+    EXTENDED_ORDER,
+    Categorizer,
+    load_keyword_file,
+    normalize_tag,
+    split_segments,
+)
+
+TABLES = {
+    "quality": ["masterpiece", "best quality"],
+    "lighting": ["light", "glow"],
+    "location": ["forest", "space"],
+}
+
+
+def _reference(tables, tag):
+    """First category with a keyword in the tag or containing the whole tag"""
+    tag = normalize_tag(tag)
+    for category, keywords in tables.items():
+        for keyword in map(normalize_tag, keywords):
+            if keyword and (keyword in tag or (tag and tag in keyword)):
+                return category
+    return None
+
+
+def test_keywords_match_inside_tags_and_tags_inside_keywords():
+    categorizer = Categorizer(TABLES)
+    assert categorizer.categorize_tag("Soft_Light") == "lighting"
+    assert categorizer.categorize_tag("best quality, 8k") == "quality"
+    assert categorizer.categorize_tag("fore") == "location"
+    assert categorizer.categorize_tag("spaceship") == "location"
+    assert categorizer.categorize_tag("zeppelin") is None
+    # Table order decides between several matching categories
+    assert categorizer.categorize_tag("glowing forest") == "lighting"
+
+
+def test_matches_agree_with_a_brute_force_search():
+    categorizer = Categorizer(TABLES)
+    rng = random.Random(7)
+    alphabet = "aceghilmnorstu -"
+    for _ in range(2000):
+        tag = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+        assert categorizer.categorize_tag(tag) == _reference(TABLES, tag), tag
+
+
+def test_extra_tables_extend_and_append_categories():
+    categorizer = Categorizer(
+        TABLES, extra={"location": ["castle"], "props": ["lantern"]}
+    )
+    assert categorizer.categories[-1] == "props"
+    assert categorizer.categorize_tag("old castle") == "location"
+    assert categorizer.categorize_tag("paper lantern") == "props"
+    with pytest.raises(ValueError, match="Reserved"):
+        Categorizer(TABLES, extra={"custom": ["x"]})
+
+
+def test_categorize_sorts_tags_with_a_fallback():
+    categorizer = Categorizer(TABLES)
+    result = categorizer.categorize("masterpiece; 1girl,, rim light ,forest")
+    assert result["quality"] == ["masterpiece"]
+    assert result["lighting"] == ["rim light"]
+    assert result["location"] == ["forest"]
+    assert result["custom"] == ["1girl"]
+    assert categorizer.categorize("1girl", mode="simple")["main_prompt"] == ["1girl"]
+
+
+def test_widget_data_modes():
+    categorizer = Categorizer(TABLES)
+    prompt = "1girl, Forest, forest, masterpiece, rim light"
+
+    extended = categorizer.widget_data(prompt)
+    assert extended["mode"] == "extended"
+    assert extended["categories"]["location"] == {"value": "Forest", "mode": "fixed"}
+    assert extended["categories"]["custom"]["value"] == "1girl"
+    assert extended["categoryOrder"] == EXTENDED_ORDER
+
+    simple = categorizer.widget_data(prompt, mode="simple")
+    assert simple["categoryOrder"] == ["main_prompt", "style", "quality"]
+    assert simple["categories"] == {
+        "main_prompt": {"value": "rim light, Forest, 1girl", "mode": "fixed"},
+        "quality": {"value": "masterpiece", "mode": "fixed"},
+    }
+
+
+def test_split_and_normalize():
+    assert split_segments(" a ;; b,　c ,") == ["a", "b", "c"]
+    assert normalize_tag(" Blue_Sky-High ") == "blue sky high"
+
+
+def test_load_keyword_file(tmp_path):
+    assert load_keyword_file(str(tmp_path / "missing.json")) == {}
+
+    path = tmp_path / "keywords.json"
+    path.write_text(json.dumps({"props": ["lantern"]}), encoding="utf-8")
+    assert load_keyword_file(str(path)) == {"props": ["lantern"]}
+
+    path.write_text(json.dumps({"props": "lantern"}), encoding="utf-8")
+    with pytest.raises(ValueError, match="expected"):
+        load_keyword_file(str(path))
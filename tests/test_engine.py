@@ -0,0 +1,107 @@
+"""Tests for core.engine.PromptEngine and the node built on it"""
+
+import json
+import sys
+
+import pytest
+
+from core.engine import MAX_BATCH_SIZE, PromptEngine, batch_seeds
+
+SEEDS = list(range(40))
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+@pytest.fixture
+def wildcard_dir(tmp_path):
+    _write(tmp_path / "colors.txt", "red\n3::blue\n{light|dark} green\n")
+    _write(tmp_path / "animals" / "pets.txt", "__colors__ cat\ndog\nbird\n")
+    return tmp_path
+
+
+def _widget_data():
+    return json.dumps(
+        {
+            "mode": "extended",
+            "categories": {
+                "subject": {"value": "__animals/pets__", "mode": "random"},
+                "style": {"value": "{oil|ink|pencil}", "mode": "increment"},
+                "lighting": {"value": "{soft|hard} light", "mode": "shuffle"},
+                "mood": {"value": "__colors__, {calm|tense}", "mode": "shuffle"},
+            },
+            "negative": "{blurry|lowres}, __colors__",
+        }
+    )
+
+
+def test_batch_matches_single_seed_runs(wildcard_dir):
+    engine = PromptEngine([wildcard_dir], check_interval=3600)
+    widget_data = _widget_data()
+
+    positives, negatives, _compiled = engine.resolve_batch(
+        widget_data, SEEDS, trigger_words=" lora ", input_prompt="portrait"
+    )
+    for seed, positive, negative in zip(SEEDS, positives, negatives):
+        single = engine.resolve(widget_data, seed, " lora ", "portrait")
+        assert (positive, negative) == single[:2]
+        assert positive.startswith("lora, portrait, ")
+
+    assert len(set(positives)) > 1
+    # The negative prompt is resolved in fixed mode
+    assert set(negatives) == {"blurry, red"}
+
+
+def test_shuffle_fields_give_distinct_combinations(wildcard_dir):
+    engine = PromptEngine([wildcard_dir], check_interval=3600)
+    widget_data = json.dumps(
+        {
+            "mode": "simple",
+            "categories": {
+                "main_prompt": {"value": "{a|b|c} __colors__", "mode": "shuffle"}
+            },
+        }
+    )
+    positives, _negatives, _compiled = engine.resolve_batch(widget_data, range(12))
+    # 3 x (red, blue, light green, dark green)
+    assert len(set(positives)) == 12
+    assert engine.resolve_batch(widget_data, [12])[0][0] == positives[0]
+
+
+def test_raw_prompts_and_fingerprints(wildcard_dir):
+    engine = PromptEngine([("local", wildcard_dir)], check_interval=0)
+    assert engine.resolve_prompt("a , {x|y} ,, z", seed=1, mode="fixed") == "a, x, z"
+    assert engine.resolve_prompt("__animals/pets__", 0, "decrement") == "bird"
+
+    assert engine.fingerprint(["no wildcards"]) is None
+    before = engine.fingerprint(["__animals/pets__"])
+    _write(wildcard_dir / "colors.txt", "teal\n")
+    # Pets reference colors, so editing colors changes their fingerprint
+    assert engine.fingerprint(["__animals/pets__"]) != before
+
+
+def test_batch_seeds():
+    assert batch_seeds(5, 3, seed_stride=10) == [5, 15, 25]
+    assert batch_seeds(5, 0) == [5]
+    assert len(batch_seeds(0, MAX_BATCH_SIZE + 1)) == MAX_BATCH_SIZE
+
+
+def test_node_matches_the_engine_across_seeds(promptflow, wildcard_dir, monkeypatch):
+    engine_module = sys.modules[promptflow.__name__ + ".core.engine"]
+    engine = engine_module.PromptEngine([wildcard_dir], check_interval=3600)
+    monkeypatch.setattr(engine_module, "_default_engine", engine)
+    node = promptflow.NODE_CLASS_MAPPINGS["PromptFlowCore"]()
+    widget_data = _widget_data()
+
+    positives, negatives, prompt_data = node.process(
+        widget_data, seed=7, input_prompt="photo", batch_size=5, seed_stride=3
+    )
+    expected = [engine.resolve(widget_data, seed, "", "photo") for seed in SEEDS[7::3]]
+    assert positives == [positive for positive, _n, _c in expected[:5]]
+    assert negatives == [negative for _p, negative, _c in expected[:5]]
+
+    data = json.loads(prompt_data)
+    assert data["seed"] == 7
+    assert data["processed"]["positive"] == positives[0]
@@ -0,0 +1,71 @@
+"""Tests for core.expansion (parsing, expansion and counting of templates)"""
+
+import pytest
+
+from core.expansion import CHOICE, FILE, ExpansionCounter, expand, parse_template
+
+
+class _First:
+    """Selector that always picks the first option"""
+
+    def select(self, options):
+        return options[0]
+
+
+OPTIONS = {
+    "animal": ["__size__ cat", "dog"],
+    "size": ["{big|small}"],
+    "loop": ["__loop__!"],
+    "deep": ["__deep__"],
+}
+
+
+def test_braces_nest():
+    seq = parse_template("a {red|{dark|light} blue} __animal__")
+    assert seq[0] == "a "
+    kind, alternatives, source = seq[1]
+    assert kind == CHOICE and source == "{red|{dark|light} blue}"
+    assert alternatives[0] == ("red",)
+    assert alternatives[1][0][0] == CHOICE
+    assert seq[3] == (FILE, "animal", "__animal__")
+
+
+@pytest.mark.parametrize("text", ["a {b| c", "x|y {}", "}{", "plain"])
+def test_unbalanced_syntax_stays_literal(text):
+    assert parse_template(text) == (text,)
+
+
+def test_expand_resolves_wildcards_recursively():
+    seq = parse_template("a {red|blue} __animal__")
+    assert expand(seq, _First(), OPTIONS.get) == "a red big cat"
+
+
+def test_cycles_and_missing_wildcards_stay_unexpanded():
+    assert expand(parse_template("__loop__"), _First(), OPTIONS.get) == "__loop__!"
+    assert expand(parse_template("__nope__ x"), _First(), OPTIONS.get) == "__nope__ x"
+    text = expand(parse_template("__deep__"), _First(), OPTIONS.get, max_depth=3)
+    assert text == "__deep__"
+
+
+def test_counter_renders_every_expansion_once():
+    counter = ExpansionCounter(OPTIONS.get)
+    seq = parse_template("{a|{b|c}} __animal__")
+    total = counter.count(seq)
+    assert total == 9
+
+    rendered = [counter.render(seq, index) for index in range(total)]
+    assert len(set(rendered)) == total
+    assert "c small cat" in rendered and "a dog" in rendered
+
+
+def test_probabilities_follow_weights():
+    counter = ExpansionCounter(OPTIONS.get)
+    seq = parse_template("{2::a|b} {x|y}")
+    assert counter.count(seq) == 4
+
+    probabilities = dict(
+        counter.render_with_probability(seq, index) for index in range(4)
+    )
+    assert probabilities["a x"] == pytest.approx(1 / 3)
+    assert probabilities["b y"] == pytest.approx(1 / 6)
+    assert sum(probabilities.values()) == pytest.approx(1.0)
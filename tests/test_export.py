@@ -0,0 +1,95 @@
+"""Tests for core.export (sharded JSONL / CSV variation export)"""
+
+import csv
+import io
+import json
+
+import pytest
+
+from core import export
+from core.export import csv_header, export_variations, render_range
+from core.variations import VariationSpace
+
+TEMPLATE = "{a|b|c} __colors__"
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+@pytest.fixture
+def roots(tmp_path):
+    _write(tmp_path / "wildcards" / "colors.txt", "red\n3::blue\n{light|dark} green\n")
+    return [("local", str(tmp_path / "wildcards"))]
+
+
+def _export(roots, **kwargs):
+    out = io.BytesIO()
+    rows = export_variations(TEMPLATE, out, roots, **kwargs)
+    return rows, out.getvalue()
+
+
+def test_rows_match_the_variation_space(roots):
+    rows, data = _export(roots)
+    assert rows == 12
+    lines = [json.loads(line) for line in data.decode("utf-8").splitlines()]
+
+    space = VariationSpace(TEMPLATE, export.open_registry(roots).get_options)
+    assert [line["index"] for line in lines] == list(range(12))
+    assert [line["prompt"] for line in lines] == [space[i] for i in range(12)]
+    assert sum(line["probability"] for line in lines) == pytest.approx(1.0)
+
+
+def test_shards_and_checkpoints(roots):
+    checkpoints = []
+    rows, sharded = _export(
+        roots, start=2, stop=9, shard_size=3, checkpoint=checkpoints.append
+    )
+    assert rows == 7
+    assert checkpoints == [5, 8, 9]
+    assert sharded == b"".join(_export(roots)[1].splitlines(keepends=True)[2:9])
+    assert _export(roots, start=12)[0] == 0
+
+
+def test_worker_processes_write_the_same_rows(roots):
+    single = _export(roots, order="shuffle", key=3)
+    pooled = _export(roots, order="shuffle", key=3, workers=2, shard_size=2)
+    assert pooled == single
+
+
+def test_csv_rows(roots):
+    space = VariationSpace(TEMPLATE, export.open_registry(roots).get_options)
+    data = csv_header("shuffle") + render_range(space, 0, 4, "csv", "shuffle")
+    table = list(csv.reader(io.StringIO(data.decode("utf-8"))))
+    assert table[0] == ["index", "variation", "prompt", "probability"]
+    assert [row[0] for row in table[1:]] == ["0", "1", "2", "3"]
+    assert all(row[2] == space[int(row[1])] for row in table[1:])
+
+
+def test_invalid_arguments(roots):
+    with pytest.raises(ValueError, match="format"):
+        _export(roots, fmt="xml")
+    with pytest.raises(ValueError, match="order"):
+        _export(roots, order="random")
+
+
+def test_resume_continues_after_the_last_checkpoint(roots, tmp_path, capsys):
+    out = tmp_path / "prompts.csv"
+    argv = [TEMPLATE, "--wildcards", roots[0][1], "-o", str(out), "--format", "csv"]
+    assert export.main(argv) == 0
+    complete = out.read_bytes()
+    assert not (tmp_path / "prompts.csv.progress").exists()
+
+    # Pretend the export stopped after 5 rows and wrote junk past them
+    lines = complete.splitlines(keepends=True)
+    written = b"".join(lines[:6])
+    out.write_bytes(written + b"partial row")
+    cli_roots = export._parse_roots([roots[0][1]])
+    job = export._job_hash(TEMPLATE, "csv", "sequential", 0, 0, None, cli_roots)
+    export._write_progress(str(out) + ".progress", job, 5, len(written))
+
+    assert export.main([*argv, "--resume"]) == 0
+    assert "Resuming at 5" in capsys.readouterr().err
+    assert not (tmp_path / "prompts.csv.progress").exists()
+    assert out.read_bytes() == complete
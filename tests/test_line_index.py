@@ -0,0 +1,41 @@
+"""Tests for core.line_index.LineIndexedOptions"""
+
+from core.line_index import LineIndexedOptions
+from core.wildcards import read_wildcard_file
+
+
+def test_unit_weight_prefixes_are_stripped(tmp_path):
+    path = tmp_path / "big.txt"
+    path.write_text("1::red\n# comment\n1:: blue\n1::green\n", encoding="utf-8")
+    expected = list(read_wildcard_file(str(path)))
+    assert expected == ["red", "blue", "green"]
+
+    index_dir = str(tmp_path / "index")
+    built = LineIndexedOptions(str(path), index_dir)
+    # The second instance reads the persisted sidecar instead of scanning
+    loaded = LineIndexedOptions(str(path), index_dir)
+    for options in (built, loaded):
+        assert options.weights is None
+        assert list(options) == expected
+        assert [options[i] for i in range(len(options))] == expected
+
+
+def test_syntax_flag_comes_from_the_index(tmp_path, monkeypatch):
+    from core import expansion
+
+    plain = tmp_path / "plain.txt"
+    plain.write_text("red\n2::blue\n", encoding="utf-8")
+    nested = tmp_path / "nested.txt"
+    nested.write_text("red\n{dark|light} __colors__\n", encoding="utf-8")
+    index_dir = str(tmp_path / "index")
+
+    for _ in range(2):  # scanned, then loaded from the sidecar
+        plain_options = LineIndexedOptions(str(plain), index_dir)
+        nested_options = LineIndexedOptions(str(nested), index_dir)
+        assert not plain_options.has_syntax
+        assert nested_options.has_syntax
+
+    # Answered without reading a single option
+    monkeypatch.setattr(LineIndexedOptions, "__iter__", None)
+    assert expansion.is_plain_file(plain_options)
+    assert not expansion.is_plain_file(nested_options)
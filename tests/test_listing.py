@@ -0,0 +1,109 @@
+"""Tests for core.listing.WildcardListing"""
+
+import gzip
+import json
+
+import pytest
+
+from core.listing import (
+    MIN_COMPRESS_SIZE,
+    WildcardListing,
+    accepted_encoding,
+    folder_prefix,
+    parse_fields,
+)
+from core.wildcards import WildcardRegistry
+
+NAMES = [
+    "colors",
+    "styles/anime",
+    "styles/oil",
+    "styles/photo/film",
+    "styles/photo/portrait",
+    "stylesheet",
+]
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+@pytest.fixture
+def listing(tmp_path):
+    for name in NAMES:
+        _write(tmp_path / f"{name}.txt", "x\n")
+    registry = WildcardRegistry(lambda: [("local", str(tmp_path))], check_interval=0)
+    return WildcardListing(registry)
+
+
+def _names(payload):
+    return [entry["name"] for entry in payload["wildcards"]]
+
+
+def test_pages_follow_the_cursor(listing):
+    seen = []
+    cursor = None
+    while True:
+        page = listing.page(cursor=cursor, limit=4, fields=("name",))
+        assert page["total"] == len(NAMES)
+        seen.extend(_names(page))
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == NAMES
+    assert listing.page(limit=1, fields=("name",))["wildcards"] == [{"name": "colors"}]
+
+
+def test_prefix_pages_stay_inside_the_prefix(listing):
+    page = listing.page(prefix="styles/", limit=2)
+    assert page["total"] == 4
+    assert _names(page) == ["styles/anime", "styles/oil"]
+    rest = listing.page(prefix="styles/", cursor=page["next_cursor"], limit=10)
+    assert _names(rest) == ["styles/photo/film", "styles/photo/portrait"]
+    assert rest["next_cursor"] is None
+
+
+def test_tree_lists_one_folder(listing):
+    root = listing.tree()
+    assert root["folders"] == [{"name": "styles", "count": 4}]
+    assert _names(root) == ["colors", "stylesheet"]
+
+    styles = listing.tree("/styles/")
+    assert styles["prefix"] == "styles/"
+    assert styles["folders"] == [{"name": "styles/photo", "count": 2}]
+    assert _names(styles) == ["styles/anime", "styles/oil"]
+
+
+def test_serialized_views_are_cached_per_version(listing, tmp_path):
+    body, etag, encoding = listing.serialized("page", limit=2, prefix="")
+    assert encoding is None and len(body) < MIN_COMPRESS_SIZE
+    assert listing.serialized("page", limit=2, prefix="")[1] == etag
+
+    # A new wildcard sorts into the first page and changes its ETag
+    _write(tmp_path / "animals.txt", "cat\n")
+    body, new_etag, _encoding = listing.serialized("page", limit=2, prefix="")
+    assert new_etag != etag
+    assert _names(json.loads(body)) == ["animals", "colors"]
+
+
+def test_large_bodies_are_compressed(listing):
+    listing = WildcardListing(listing.registry, {"local": "x" * MIN_COMPRESS_SIZE})
+    plain, etag, _none = listing.serialized("all")
+    assert len(plain) >= MIN_COMPRESS_SIZE
+    body, gzip_etag, encoding = listing.serialized("all", encoding="gzip")
+    assert encoding == "gzip"
+    assert gzip.decompress(body) == plain
+    assert gzip_etag != etag
+
+
+def test_request_helpers():
+    assert accepted_encoding("gzip;q=0.5, identity") == "gzip"
+    assert accepted_encoding("gzip;q=0") is None
+    assert accepted_encoding(None) is None
+    assert folder_prefix(" /a/b/ ") == "a/b/"
+    assert folder_prefix("") == ""
+    assert parse_fields("name, path") == ("name", "path")
+    assert parse_fields("") is None
+    with pytest.raises(ValueError, match="Unknown field"):
+        parse_fields("name,size")
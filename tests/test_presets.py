@@ -0,0 +1,72 @@
+"""Tests for core.presets.PresetStore"""
+
+import json
+
+from core.presets import PRESET_TYPES, PresetStore
+
+
+def _write_presets(directory, preset_type, entries):
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{preset_type}.json"
+    path.write_text(json.dumps(entries), encoding="utf-8")
+    return path
+
+
+def test_later_directories_override_by_name(tmp_path):
+    builtin = tmp_path / "builtin"
+    user = tmp_path / "user"
+    _write_presets(
+        builtin,
+        "styles",
+        [{"name": "anime", "value": "cel"}, {"name": "oil", "value": "paint"}],
+    )
+    _write_presets(
+        user,
+        "styles",
+        [{"name": "anime", "value": "mine"}, {"name": "ink", "value": "sumi"}],
+    )
+    store = PresetStore(lambda: [str(builtin), str(user)], check_interval=0)
+
+    presets = store.presets()
+    assert set(presets) == set(PRESET_TYPES)
+    assert presets["styles"] == [
+        {"name": "anime", "value": "mine"},
+        {"name": "oil", "value": "paint"},
+        {"name": "ink", "value": "sumi"},
+    ]
+    assert presets["quality"] == []
+
+
+def test_serialized_bodies_change_with_the_files(tmp_path):
+    path = _write_presets(tmp_path, "quality", [{"name": "hq", "value": "best"}])
+    store = PresetStore(lambda: [str(tmp_path)], check_interval=0)
+
+    body, etag = store.serialized("quality")
+    assert json.loads(body) == [{"name": "hq", "value": "best"}]
+    assert store.serialized("quality") == (body, etag)
+    assert json.loads(store.serialized()[0])["quality"] == json.loads(body)
+    assert store.serialized("unknown") is None
+
+    path.write_text(json.dumps([{"name": "hq", "value": "better"}]), encoding="utf-8")
+    new_body, new_etag = store.serialized("quality")
+    assert new_etag != etag
+    assert json.loads(new_body)[0]["value"] == "better"
+
+
+def test_files_are_rechecked_only_when_due(tmp_path):
+    path = _write_presets(tmp_path, "negatives", [{"name": "a", "value": "x"}])
+    store = PresetStore(lambda: [str(tmp_path)], check_interval=3600)
+    assert len(store.presets()["negatives"]) == 1
+
+    path.write_text(json.dumps([]), encoding="utf-8")
+    assert len(store.presets()["negatives"]) == 1
+    store.invalidate()
+    assert store.presets()["negatives"] == []
+
+
+def test_broken_files_are_skipped(tmp_path):
+    (tmp_path / "styles.json").write_text("{not json", encoding="utf-8")
+    _write_presets(tmp_path, "quality", {"name": "not a list"})
+    store = PresetStore(lambda: [str(tmp_path)], check_interval=0)
+    assert store.presets()["styles"] == []
+    assert store.presets()["quality"] == []
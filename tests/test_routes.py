@@ -0,0 +1,79 @@
+"""Tests for the HTTP routes, with the ComfyUI modules replaced by stubs"""
+
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from multidict import CIMultiDict, MultiDict
+
+
+class _Request:
+    """The parts of an aiohttp request the routes use"""
+
+    method = "GET"
+    path = "/promptflow/test"
+
+    def __init__(self, query=None, body=None, match_info=None):
+        self.query = MultiDict(query or {})
+        self.headers = CIMultiDict()
+        self.match_info = match_info or {}
+        self._body = body
+
+    async def json(self):
+        if isinstance(self._body, str):
+            return json.loads(self._body)
+        return self._body
+
+
+def _call(handler, **request):
+    response = asyncio.run(handler(_Request(**request)))
+    return response.status, json.loads(response.text)
+
+
+@pytest.mark.parametrize(
+    ("route", "request_args", "error"),
+    [
+        ("api_list_wildcards", {"query": {"limit": "abc"}}, "limit must be an integer"),
+        ("api_search_wildcards", {"query": {"q": "a", "offset": "-2"}}, "offset"),
+        ("api_get_variations", {"query": {"prompt": "x", "limit": "?"}}, "limit"),
+        ("api_post_variations", {"body": "not json"}, "Expecting value"),
+        ("api_export_variations", {"query": {"prompt": "x", "key": "k"}}, "key"),
+        ("api_resolve", {"body": {"prompt": "x"}}, "seeds or seed_range"),
+        ("api_batch_wildcards", {"body": {"names": 5}}, "names must be a list"),
+        ("api_categorize", {"body": {"prompt": "x", "mode": "odd"}}, "mode"),
+        ("api_save_wildcard", {"body": {"name": " "}}, "name is required"),
+    ],
+)
+def test_invalid_requests_get_field_errors(promptflow, route, request_args, error):
+    status, payload = _call(getattr(promptflow, route), **request_args)
+    assert status == 400
+    assert error in payload["error"]
+
+
+def test_resolve_route(promptflow):
+    body = {"prompt": "a {red|blue} cat", "seed_range": {"start": 0, "count": 4}}
+    status, payload = _call(promptflow.api_resolve, body=body)
+    assert status == 200
+    assert payload["count"] == 4
+    assert [r["seed"] for r in payload["results"]] == [0, 1, 2, 3]
+    assert {r["positive"] for r in payload["results"]} <= {"a red cat", "a blue cat"}
+
+
+def test_variations_route(promptflow):
+    body = {"prompt": "{a|b|c} {x|y}", "offset": 2, "limit": 3}
+    status, payload = _call(promptflow.api_post_variations, body=body)
+    assert status == 200
+    assert payload["total"] == 6
+    assert [v["prompt"] for v in payload["variations"]] == ["b x", "b y", "c x"]
+
+
+def test_categorize_route(promptflow):
+    body = {"prompts": ["1girl, smiling, masterpiece"], "mode": "simple"}
+    status, payload = _call(promptflow.api_categorize, body=body)
+    assert status == 200
+    fields = payload["results"][0]["widget_data"]["categories"]
+    assert fields["main_prompt"]["value"] == "1girl, smiling"
+    assert fields["quality"]["value"] == "masterpiece"
@@ -0,0 +1,59 @@
+"""Tests for core.sampling (collision-free shuffles of the variation space)"""
+
+import pytest
+
+from core.sampling import (
+    IndexPermutation,
+    decode_mixed_radix,
+    shuffled_indices,
+    shuffled_indices_batch,
+)
+from core.templates import compile_text
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 17, 64, 1000])
+def test_permutation_is_a_bijection(size):
+    permutation = IndexPermutation(size, key="k")
+    shuffled = [permutation.forward(index) for index in range(size)]
+    assert sorted(shuffled) == list(range(size))
+    assert [permutation.inverse(value) for value in shuffled] == list(range(size))
+
+
+def test_keys_give_different_shuffles():
+    first = [IndexPermutation(100, key=1).forward(i) for i in range(100)]
+    again = [IndexPermutation(100, key=1).forward(i) for i in range(100)]
+    other = [IndexPermutation(100, key=2).forward(i) for i in range(100)]
+    assert first == again
+    assert first != other
+    assert first != list(range(100))
+
+
+def test_out_of_range_indices_raise():
+    permutation = IndexPermutation(10)
+    with pytest.raises(IndexError):
+        permutation.forward(10)
+    with pytest.raises(IndexError):
+        permutation.inverse(-1)
+
+
+def test_decode_mixed_radix():
+    assert decode_mixed_radix(0, [3, 2]) == [0, 0]
+    assert decode_mixed_radix(5, [3, 2]) == [2, 1]
+    assert decode_mixed_radix(7, [2, 2, 2]) == [1, 1, 1]
+
+
+def test_consecutive_seeds_pick_distinct_combinations():
+    texts = [compile_text("{a|b|c} {x|y}"), compile_text("{1|2}")]
+    indices, _counter = shuffled_indices_batch(texts, range(12), lambda name: None)
+    combinations = {tuple(row) for row in indices}
+    assert len(combinations) == 12
+
+    # Seeds wrap around the space
+    single, _counter = shuffled_indices(texts, 12, lambda name: None)
+    assert single == indices[0]
+
+
+def test_static_texts_have_one_combination():
+    texts = [compile_text("plain")]
+    indices, _counter = shuffled_indices_batch(texts, [0, 5], lambda name: None)
+    assert indices == [[0], [0]]
@@ -0,0 +1,102 @@
+"""Tests for core.search.WildcardSearchIndex"""
+
+from core import search
+from core.search import WildcardSearchIndex, file_tokens
+from core.wildcards import WildcardRegistry
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def _registry(root):
+    return WildcardRegistry(lambda: [("local", str(root))], check_interval=3600)
+
+
+class _Watcher:
+    """Stand-in for a WildcardWatcher in inotify mode"""
+
+    delivers_events = True
+
+    def __init__(self):
+        self.listeners = []
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def report(self, directories):
+        for callback in self.listeners:
+            callback(directories)
+
+
+def _names(result):
+    return [item["name"] for item in result["results"]]
+
+
+def test_file_tokens_skip_comments_and_weights(tmp_path, monkeypatch):
+    path = tmp_path / "colors.txt"
+    _write(path, "# hidden note\n3::Crimson_Red\n.5:: sky blue\n" * 50)
+    # Chunks much smaller than the file: lines must still stay whole
+    monkeypatch.setattr(search, "FILE_TOKENS_CHUNK", 16)
+    assert file_tokens(str(path)) == {"crimson", "red", "sky", "blue"}
+
+
+def test_names_rank_before_contents(tmp_path):
+    _write(tmp_path / "colors.txt", "red\nblue\n")
+    _write(tmp_path / "colors_dark.txt", "navy\n")
+    _write(tmp_path / "outfit.txt", "colors of the rainbow\n")
+    index = WildcardSearchIndex(_registry(tmp_path))
+
+    result = index.search("colors")
+    assert _names(result) == ["colors", "colors_dark", "outfit"]
+    assert [item["matched"] for item in result["results"]] == [
+        "name",
+        "name",
+        "content",
+    ]
+
+    page = index.search("colors", limit=1, offset=1)
+    assert page["total"] == 3 and _names(page) == ["colors_dark"]
+
+
+def test_last_term_matches_as_prefix(tmp_path):
+    _write(tmp_path / "styles.txt", "anime screencap\noil painting\n")
+    index = WildcardSearchIndex(_registry(tmp_path))
+
+    result = index.search("anime scr", scope="contents", samples=True)
+    assert _names(result) == ["styles"]
+    assert result["results"][0]["sample"] == "anime screencap"
+    assert index.search("nime", scope="contents")["total"] == 0
+
+
+def test_watched_directories_replace_the_timed_sweep(tmp_path):
+    path = tmp_path / "colors.txt"
+    _write(path, "red\n")
+    watcher = _Watcher()
+    index = WildcardSearchIndex(_registry(tmp_path), rescan_interval=0, watcher=watcher)
+    assert index.search("teal")["total"] == 0
+
+    # An edit the registry never sees: no sweep while events are delivered
+    _write(path, "red\nteal\n")
+    assert index.search("teal")["total"] == 0
+
+    watcher.report([str(tmp_path)])
+    assert _names(index.search("teal")) == ["colors"]
+
+    # Lost events force a full sweep
+    _write(path, "red\nteal\nolive\n")
+    watcher.report(None)
+    assert _names(index.search("olive")) == ["colors"]
+
+
+def test_timed_sweep_without_watcher_events(tmp_path):
+    path = tmp_path / "colors.txt"
+    _write(path, "red\n")
+    watcher = _Watcher()
+    watcher.delivers_events = False
+    index = WildcardSearchIndex(_registry(tmp_path), rescan_interval=0, watcher=watcher)
+    index.search("red")
+
+    _write(path, "red\nteal\n")
+    assert _names(index.search("teal")) == ["colors"]
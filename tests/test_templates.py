@@ -0,0 +1,92 @@
+"""Tests for core.templates (compiled prompt templates)"""
+
+import json
+import random
+
+from core.engine import EXTENDED_FIELDS, SIMPLE_FIELDS
+from core.templates import (
+    OptionSelector,
+    cleanup_join,
+    cleanup_prompt,
+    compile_text,
+    compile_widget_data,
+)
+
+
+def _widget_data(categories, mode="extended", **extra):
+    return json.dumps({"mode": mode, "categories": categories, **extra})
+
+
+def test_widget_data_is_compiled_once():
+    widget_data = _widget_data({"subject": {"value": "a {red|blue} cat"}})
+    first = compile_widget_data(widget_data, SIMPLE_FIELDS, EXTENDED_FIELDS)
+    again = compile_widget_data(widget_data, list(SIMPLE_FIELDS), EXTENDED_FIELDS)
+    assert again is first
+    assert compile_text("a {red|blue} cat") is compile_text("a {red|blue} cat")
+
+
+def test_fields_follow_category_order_and_skip_empty_values():
+    widget_data = _widget_data(
+        {
+            "subject": {"value": "cat", "mode": "random"},
+            "style": {"value": "  "},
+            "lighting": {"value": "soft light"},
+        },
+        categoryOrder=["lighting", "style", "subject"],
+        negative=" blurry ",
+    )
+    compiled = compile_widget_data(widget_data, SIMPLE_FIELDS, EXTENDED_FIELDS)
+    assert [(field, mode) for field, mode, _text in compiled.fields] == [
+        ("lighting", "fixed"),
+        ("subject", "random"),
+    ]
+    assert compiled.negative.source == "blurry"
+
+
+def test_invalid_widget_data_compiles_to_an_empty_prompt():
+    compiled = compile_widget_data("{not json", SIMPLE_FIELDS, EXTENDED_FIELDS)
+    assert compiled.mode == "simple"
+    assert compiled.fields == []
+
+
+def test_prompt_data_matches_json_dumps():
+    categories = {"subject": {"value": 'a "quoted"\ncat', "mode": "fixed"}}
+    compiled = compile_widget_data(
+        _widget_data(categories), SIMPLE_FIELDS, EXTENDED_FIELDS
+    )
+    expected = {
+        "mode": "extended",
+        "categories": categories,
+        "negative": "bad",
+        "seed": 7,
+        "processed": {"positive": "p, q", "negative": "bad"},
+    }
+    assert compiled.prompt_data("p, q", "bad", 7) == json.dumps(expected, indent=2)
+
+
+def test_selector_modes():
+    options = ["a", "b", "c"]
+
+    increment = OptionSelector("increment", random.Random(0), 4)
+    assert [increment.select(options) for _ in range(3)] == ["b", "c", "a"]
+
+    decrement = OptionSelector("decrement", random.Random(0), 0)
+    assert [decrement.select(options) for _ in range(3)] == ["c", "b", "a"]
+
+    assert OptionSelector("fixed", random.Random(0), 9).select(options) == "a"
+    assert OptionSelector("random", random.Random(0), 0).select([]) == ""
+
+
+def test_static_text_resolves_to_itself():
+    text = compile_text("plain text, no wildcards")
+    assert text.is_static
+    assert text.count(lambda name: None) == 1
+    assert text.resolve(OptionSelector("random", random.Random(0), 0), None) == (
+        "plain text, no wildcards"
+    )
+
+
+def test_cleanup_joins_tags_with_single_commas():
+    assert cleanup_join(["a,  b ,", "", " ,c\td"]) == "a, b, c d"
+    assert cleanup_prompt(",, a ,b,,") == "a, b"
+    assert cleanup_prompt("") == ""
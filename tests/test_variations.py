@@ -0,0 +1,109 @@
+"""Tests for core.variations (index-addressable variation enumeration)"""
+
+import json
+
+import pytest
+
+from core.engine import EXTENDED_FIELDS, SIMPLE_FIELDS
+from core.variations import (
+    VariationSpace,
+    build_variation_space,
+    extract_wildcards,
+    template_from_prompt_input,
+)
+from core.wildcards import parse_wildcard_lines
+
+OPTIONS = {
+    "color": parse_wildcard_lines(["red", "2::blue", "{light|dark} green"]),
+    "animal": ["cat", "dog"],
+}
+
+
+def _space(template):
+    return VariationSpace(template, OPTIONS.get)
+
+
+def test_total_counts_nested_expansions():
+    space = _space("a {big|small} __color__ __animal__")
+    assert space.radices == [2, 4, 2]
+    assert space.total == 16
+
+
+def test_indices_round_trip_through_digits():
+    space = _space("{x|y|z} __color__")
+    for index in range(space.total):
+        assert space.index_of(space.digits(index)) == index
+    with pytest.raises(IndexError):
+        space.digits(space.total)
+
+
+def test_iter_range_matches_random_access():
+    space = _space("{x|y}, __color__ __animal__")
+    listed = list(space.iter_range(3, 11))
+    assert [row[0] for row in listed] == list(range(3, 11))
+    for index, prompt, probability in listed:
+        assert prompt == space[index]
+        assert probability == pytest.approx(space.probability(index))
+
+    prompts = {prompt for _index, prompt, _p in space.iter_range()}
+    assert len(prompts) == space.total
+    assert "y, dark green dog" in prompts
+
+
+def test_probabilities_sum_to_one():
+    space = _space("{x|y} __color__")
+    total = sum(p for _index, _prompt, p in space.iter_range())
+    assert total == pytest.approx(1.0)
+    # blue has weight 2 of 4
+    assert space.probability(space.index_of([0, 1])) == pytest.approx(0.25)
+
+
+def test_shuffled_pages_cover_the_space_once():
+    space = _space("__color__ __animal__ {1|2|3}")
+    page = space.page(0, 10, order="shuffle")
+    rest = space.page(10, 100, order="shuffle")
+    variations = [row["variation"] for row in page + rest]
+    assert [row["index"] for row in page + rest] == list(range(space.total))
+    assert sorted(variations) == list(range(space.total))
+    assert variations != list(range(space.total))
+    assert all(row["prompt"] == space[row["variation"]] for row in page)
+
+
+def test_missing_wildcards_are_flagged():
+    space, wildcards = build_variation_space("__nope__ {a|b}", OPTIONS.get)
+    assert space.total == 2
+    assert [w["type"] for w in wildcards] == ["inline", "file"]
+    assert wildcards[1]["not_found"] and wildcards[1]["options"] == []
+    assert space.describe()[1] == {
+        "type": "file",
+        "full": "__nope__",
+        "count": 1,
+        "name": "nope",
+        "weighted": False,
+    }
+
+
+def test_extract_wildcards_lists_inline_groups_first():
+    wildcards = extract_wildcards("__animal__ {a|{b|c}}")
+    assert [w["full"] for w in wildcards] == ["{a|{b|c}}", "__animal__"]
+    assert wildcards[0]["options"] == ["a", "{b|c}"]
+    assert extract_wildcards("") == []
+
+
+def test_template_from_widget_data():
+    widget_data = json.dumps(
+        {
+            "mode": "extended",
+            "categoryOrder": ["style", "subject"],
+            "categories": {
+                "subject": {"value": " __animal__ "},
+                "style": {"value": "{oil|ink}"},
+                "lighting": {"value": ""},
+            },
+        }
+    )
+    template = template_from_prompt_input(widget_data, SIMPLE_FIELDS, EXTENDED_FIELDS)
+    assert template == "{oil|ink}, __animal__"
+    assert template_from_prompt_input("{a|b}", SIMPLE_FIELDS, EXTENDED_FIELDS) == (
+        "{a|b}"
+    )
@@ -0,0 +1,47 @@
+"""Tests for core.watcher.WildcardWatcher"""
+
+import sys
+import time
+
+import pytest
+
+from core.watcher import WildcardWatcher
+from core.wildcards import WildcardRegistry
+
+
+def test_no_refresh_before_the_index_is_built(tmp_path):
+    (tmp_path / "colors.txt").write_text("red\n", encoding="utf-8")
+    registry = WildcardRegistry(lambda: [("local", str(tmp_path))])
+    watcher = WildcardWatcher(registry, backend="poll")
+
+    watcher._refresh()
+    assert not registry.built
+
+    registry.entries()
+    (tmp_path / "shapes.txt").write_text("round\n", encoding="utf-8")
+    watcher._refresh()
+    assert "shapes" in registry.entries()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify only")
+def test_inotify_reports_changed_directories(tmp_path):
+    (tmp_path / "colors.txt").write_text("red\n", encoding="utf-8")
+    registry = WildcardRegistry(lambda: [("local", str(tmp_path))])
+    registry.entries()
+    watcher = WildcardWatcher(registry, backend="inotify", debounce=0.01)
+    reported = []
+    watcher.add_listener(reported.append)
+    watcher.start()
+    try:
+        deadline = time.monotonic() + 5
+        while not watcher.delivers_events and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert watcher.delivers_events
+
+        (tmp_path / "colors.txt").write_text("red\nteal\n", encoding="utf-8")
+        while not reported and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert reported[0] == {str(tmp_path)}
+    finally:
+        watcher.stop()
+    assert not watcher.delivers_events
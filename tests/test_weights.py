@@ -0,0 +1,68 @@
+"""Tests for core.weights (weighted options and alias-table sampling)"""
+
+import random
+
+import pytest
+
+from core.weights import (
+    AliasTable,
+    WeightedOptions,
+    option_probability,
+    option_weights,
+    split_weight,
+    weighted_list,
+)
+from core.wildcards import parse_wildcard_lines
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("3::red", (3.0, "red")),
+        (" 0.5::blue", (0.5, "blue")),
+        (".25::x::y", (0.25, "x::y")),
+        ("red", (None, "red")),
+        ("a::b", (None, "a::b")),
+        ("-1::c", (None, "-1::c")),
+    ],
+)
+def test_split_weight(text, expected):
+    assert split_weight(text) == expected
+
+
+def test_alias_table_samples_in_proportion():
+    table = AliasTable([1, 0, 3])
+    rng = random.Random(42)
+    counts = [0, 0, 0]
+    for _ in range(40000):
+        counts[table.sample(rng)] += 1
+    assert counts[1] == 0
+    assert counts[2] / counts[0] == pytest.approx(3.0, rel=0.05)
+
+
+def test_alias_table_without_weight_is_uniform():
+    table = AliasTable([0, 0])
+    rng = random.Random(1)
+    samples = {table.sample(rng) for _ in range(100)}
+    assert samples == {0, 1}
+    with pytest.raises(ValueError):
+        AliasTable([])
+
+
+def test_weighted_list_only_wraps_weighted_options():
+    plain = weighted_list(("a", "b"), [1.0, 1.0])
+    assert plain == ["a", "b"] and not isinstance(plain, WeightedOptions)
+    assert option_weights(plain) is None
+    assert option_probability(plain, 1) == 0.5
+
+    weighted = weighted_list(["a", "b", "c"], [2.0, 1.0, 1.0])
+    assert weighted == ["a", "b", "c"]
+    assert option_weights(weighted, limit=2) == [2.0, 1.0]
+    assert option_probability(weighted, 0) == 0.5
+
+
+def test_wildcard_lines_carry_weights():
+    options = parse_wildcard_lines(["# comment", "3::red", "blue", "", "1::green"])
+    assert options == ["red", "blue", "green"]
+    assert option_weights(options) == [3.0, 1.0, 1.0]
+    assert option_probability(options, 0) == pytest.approx(0.6)
@@ -0,0 +1,99 @@
+"""Tests for core.wildcards.WildcardRegistry"""
+
+from core.wildcards import WildcardRegistry
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def _registry(root):
+    return WildcardRegistry(lambda: [("local", str(root))], check_interval=3600)
+
+
+def test_fingerprint_is_cached_per_name_set(tmp_path):
+    _write(tmp_path / "outfit.txt", "__colors__ dress\nplain armor\n")
+    _write(tmp_path / "colors.txt", "red\nblue\n")
+    registry = _registry(tmp_path)
+
+    first = registry.fingerprint(["outfit"])
+    assert [item[0] for item in first] == ["colors", "outfit"]
+    assert set(registry._fingerprints) == {frozenset(["outfit"])}
+
+    # Served from the cache: no file is looked up again
+    registry._options_for = None
+    assert registry.fingerprint(["outfit"]) is first
+
+
+def test_first_use_callbacks_wait_for_the_index(tmp_path):
+    _write(tmp_path / "colors.txt", "red\n")
+    registry = _registry(tmp_path)
+    calls = []
+    registry.on_first_use(lambda: calls.append(registry.built))
+    assert calls == [] and not registry.built
+
+    registry.get_options("colors")
+    registry.get_options("colors")
+    assert calls == [True]
+
+    # Registered after the build: runs right away
+    registry.on_first_use(lambda: calls.append("late"))
+    assert calls == [True, "late"]
+
+
+def test_entries_is_not_changed_by_updates(tmp_path):
+    _write(tmp_path / "colors.txt", "red\n")
+    registry = _registry(tmp_path)
+    entries = registry.entries()
+
+    _write(tmp_path / "shapes.txt", "round\n")
+    registry.put("shapes", "local", str(tmp_path / "shapes.txt"))
+    registry.discard("colors", str(tmp_path / "colors.txt"))
+    (tmp_path / "colors.txt").unlink()
+    _write(tmp_path / "sizes" / "big.txt", "huge\n")
+    registry.refresh()
+
+    assert sorted(entries) == ["colors"]
+    assert sorted(registry.entries()) == ["shapes", "sizes/big"]
+
+
+def test_unchanged_packs_are_not_parsed_again(tmp_path, monkeypatch):
+    from core import wildcards
+
+    opened = []
+    open_multi_file = wildcards.open_multi_file
+    monkeypatch.setattr(
+        wildcards,
+        "open_multi_file",
+        lambda path: opened.append(path) or open_multi_file(path),
+    )
+    pack = tmp_path / "packs" / "animals.yaml"
+    _write(pack, "animals:\n  cats: [lion, tiger]\n")
+    registry = _registry(tmp_path)
+    assert list(registry.get_options("packs/animals/cats")) == ["lion", "tiger"]
+    assert len(opened) == 1
+
+    # A sibling file changes the directory listing, not the pack
+    _write(tmp_path / "packs" / "colors.txt", "red\n")
+    registry.refresh()
+    registry.invalidate()
+    assert "packs/colors" in registry.entries()
+    assert len(opened) == 1
+
+    _write(pack, "animals:\n  cats: [puma]\n  dogs: [pug]\n")
+    registry.refresh()
+    assert list(registry.get_options("packs/animals/dogs")) == ["pug"]
+    assert len(opened) == 2
+
+
+def test_put_outside_the_roots_does_not_shadow_indexed_files(tmp_path):
+    _write(tmp_path / "local" / "colors.txt", "red\n")
+    registry = _registry(tmp_path / "local")
+    registry.entries()
+
+    stray = tmp_path / "elsewhere" / "colors.txt"
+    _write(stray, "green\n")
+    registry.put("colors", "stray", str(stray), ["green"])
+    assert registry.get("colors")["source"] == "local"
+    assert list(registry.get_options("colors")) == ["red"]
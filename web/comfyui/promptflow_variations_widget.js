@@ -181,31 +181,35 @@ function openThemeEditor(existingThemeKey = null) {
 }
 
 // ============================================================================
-// WILDCARD API
+// VARIATIONS API
 // ============================================================================
 
-const wildcardCache = {
-    contents: {},
-};
+// Variations listed at first and added per "Load more" click
+const PAGE_SIZE = 50;
 
-async function getWildcardContents(name) {
-    if (wildcardCache.contents[name]) {
-        return wildcardCache.contents[name];
-    }
-    
-    try {
-        const safeName = name.replace(/\//g, '---SLASH---');
-        const response = await api.fetchApi(`/promptflow/wildcards/${encodeURIComponent(safeName)}`);
-        if (response.ok) {
-            const data = await response.json();
-            wildcardCache.contents[name] = data.options || [];
-            return wildcardCache.contents[name];
-        }
-        return null;
-    } catch (e) {
-        console.warn(`[PromptFlow Variations] Error loading wildcard '${name}':`, e.message);
-        return null;
+// Largest page the server returns (used by "Copy All")
+const MAX_PAGE_SIZE = 1000;
+
+/**
+ * Fetch one page of variations, expanded by the server in the order the
+ * node's seed selects them
+ * @param {string} prompt - Prompt text containing wildcards
+ * @param {number} offset - Index of the first variation
+ * @param {number} limit - Number of variations
+ * @param {string} order - "sequential" or "shuffle"
+ * @returns {Promise<Object>} { total, wildcards, missing, variations: [{ index, prompt }] }
+ */
+async function fetchVariations(prompt, offset, limit, order) {
+    const response = await api.fetchApi("/promptflow/variations", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ prompt, offset, limit, order }),
+    });
+    const data = await response.json();
+    if (!response.ok) {
+        throw new Error(data.error || `HTTP ${response.status}`);
     }
+    return data;
 }
 
 // ============================================================================
@@ -219,6 +223,9 @@ class VariationsWidget {
         this.theme = getActiveTheme();
         this.selectedVariations = new Set();
         this.promptText = "";
+        this.variations = [];  // Loaded rows: { index, prompt }
+        this.order = "sequential";
+        this.requestId = 0;
     }
     
     render() {
@@ -527,46 +534,47 @@ class VariationsWidget {
             return;
         }
         
-        // Extract wildcards
-        const wildcards = this.extractWildcards(this.promptText);
-        
-        if (wildcards.length === 0) {
+        const order = this.getOrder();
+        const request = ++this.requestId;
+        let data;
+        try {
+            data = await fetchVariations(this.promptText, 0, PAGE_SIZE, order);
+        } catch (e) {
+            if (request !== this.requestId) return;
+            console.warn("[PromptFlow Variations] Error loading variations:", e.message);
             this.countBadge.textContent = "0";
-            this.showNoVariations("No wildcards found<br><span style='opacity:0.7;font-size:10px'>Use {a|b|c} or __wildcard__ syntax</span>");
+            this.showNoVariations("Could not load variations");
             this.triggerNodeResize();
             return;
         }
+        // A newer prompt arrived while this one was loading
+        if (request !== this.requestId) return;
         
-        // Show loading for file wildcards
-        const hasFileWildcards = wildcards.some(w => w.type === "file");
-        if (hasFileWildcards) {
-            this.showNoVariations("Loading file wildcards...");
-            
-            for (const wildcard of wildcards) {
-                if (wildcard.type === "file" && wildcard.options === null) {
-                    const options = await getWildcardContents(wildcard.name);
-                    wildcard.options = options || [];
-                    wildcard.notFound = options === null;
-                }
-            }
+        if (data.wildcards.length === 0) {
+            this.countBadge.textContent = "0";
+            this.showNoVariations("No wildcards found<br><span style='opacity:0.7;font-size:10px'>Use {a|b|c} or __wildcard__ syntax</span>");
+            this.triggerNodeResize();
+            return;
         }
         
-        // Generate combinations
-        const effectiveWildcards = wildcards.filter(w => w.options && w.options.length > 0);
-        const combinations = this.generateCombinations(effectiveWildcards, this.promptText);
-        
-        this.countBadge.textContent = combinations.length > 1000 ? "1000+" : combinations.length.toString();
+        this.countBadge.textContent = data.total.toLocaleString();
         
-        if (combinations.length === 0) {
+        if (data.total === 0) {
             this.showNoVariations("No valid variations found");
             this.triggerNodeResize();
             return;
         }
         
-        this.renderVariations(combinations, wildcards);
+        this.order = order;
+        this.renderVariations(data);
         this.triggerNodeResize();
     }
     
+    getOrder() {
+        const orderWidget = this.node.widgets?.find(w => w.name === "order");
+        return orderWidget?.value === "shuffle" ? "shuffle" : "sequential";
+    }
+    
     triggerNodeResize() {
         // Trigger node to recalculate size after DOM changes
         // Use requestAnimationFrame for smoother updates
@@ -591,80 +599,20 @@ class VariationsWidget {
         });
     }
     
-    extractWildcards(text) {
-        const wildcards = [];
-        
-        // Inline wildcards
-        const inlinePattern = /\{([^}]+)\}/g;
-        let match;
-        while ((match = inlinePattern.exec(text)) !== null) {
-            const options = match[1].split("|").map(o => o.trim()).filter(o => o);
-            if (options.length > 1) {
-                wildcards.push({ type: "inline", full: match[0], options });
-            }
-        }
-        
-        // File wildcards
-        const filePattern = /__([a-zA-Z0-9_\-\/]+)__/g;
-        while ((match = filePattern.exec(text)) !== null) {
-            wildcards.push({ type: "file", full: match[0], name: match[1], options: null });
-        }
-        
-        return wildcards;
-    }
-    
-    generateCombinations(wildcards, template) {
-        if (wildcards.length === 0) return [];
-        
-        const combinations = [];
-        const maxCombinations = 1000;
-        
-        function generate(current, index) {
-            if (combinations.length >= maxCombinations) return;
-            
-            if (index === wildcards.length) {
-                // Clean up the result
-                const cleaned = cleanupPrompt(current);
-                combinations.push(cleaned);
-                return;
-            }
-            
-            const wildcard = wildcards[index];
-            for (const option of wildcard.options) {
-                if (combinations.length >= maxCombinations) return;
-                const newText = current.replace(wildcard.full, option);
-                generate(newText, index + 1);
-            }
-        }
-        
-        // Helper to clean up duplicate commas and whitespace
-        function cleanupPrompt(text) {
-            return text
-                // Replace multiple commas (with optional whitespace) with single comma
-                .replace(/,(\s*,)+/g, ',')
-                // Remove leading/trailing commas
-                .replace(/^[\s,]+|[\s,]+$/g, '')
-                // Normalize spaces around commas
-                .replace(/\s*,\s*/g, ', ')
-                // Remove multiple spaces
-                .replace(/\s+/g, ' ')
-                .trim();
-        }
-        
-        generate(template, 0);
-        return combinations;
-    }
-    
-    renderVariations(combinations, wildcards) {
+    renderVariations(data) {
         this.contentArea.innerHTML = "";
         this.selectedVariations = new Set();
+        this.variations = [];
+        
+        const total = data.total;
+        const wildcardCount = data.wildcards.length;
         
         // Info bar
         const info = document.createElement("div");
         info.className = "pf-variations-info";
         
         const infoText = document.createElement("span");
-        infoText.textContent = `${combinations.length} variation${combinations.length !== 1 ? 's' : ''} from ${wildcards.length} wildcard${wildcards.length !== 1 ? 's' : ''}`;
+        infoText.textContent = `${total.toLocaleString()} variation${total !== 1 ? 's' : ''} from ${wildcardCount} wildcard${wildcardCount !== 1 ? 's' : ''}`;
         
         const actions = document.createElement("div");
         actions.className = "pf-variations-actions";
@@ -672,19 +620,24 @@ class VariationsWidget {
         const copyAllBtn = document.createElement("button");
         copyAllBtn.className = "pf-variations-btn";
         copyAllBtn.textContent = "Copy All";
-        copyAllBtn.addEventListener("click", () => {
-            const allText = combinations.map((c, i) => `${i + 1}: ${c}`).join("\n\n");
-            navigator.clipboard.writeText(allText).then(() => {
+        copyAllBtn.addEventListener("click", async () => {
+            try {
+                const page = await fetchVariations(this.promptText, 0, MAX_PAGE_SIZE, this.order);
+                const allText = page.variations.map(v => `${v.index + 1}: ${v.prompt}`).join("\n\n");
+                await navigator.clipboard.writeText(allText);
                 copyAllBtn.textContent = "Copied!";
-                setTimeout(() => copyAllBtn.textContent = "Copy All", 1500);
-            });
+            } catch (e) {
+                console.warn("[PromptFlow Variations] Copy failed:", e.message);
+                copyAllBtn.textContent = "Error!";
+            }
+            setTimeout(() => copyAllBtn.textContent = "Copy All", 1500);
         });
         
         this.queueBtn = document.createElement("button");
         this.queueBtn.className = "pf-queue-btn";
         this.queueBtn.textContent = "Queue (0)";
         this.queueBtn.disabled = true;
-        this.queueBtn.addEventListener("click", () => this.queueSelected(combinations));
+        this.queueBtn.addEventListener("click", () => this.queueSelected());
         
         actions.appendChild(copyAllBtn);
         actions.appendChild(this.queueBtn);
@@ -703,8 +656,6 @@ class VariationsWidget {
         selectAllLabel.textContent = "Select All";
         selectAllLabel.style.cssText = `cursor: pointer; color: #fff;`;
         
-        const displayLimit = Math.min(combinations.length, 50);
-        
         // Variations list (create first so we can reference it in select all handler)
         const list = document.createElement("div");
         list.className = "pf-variations-list";
@@ -763,50 +714,76 @@ class VariationsWidget {
             }
         };
         
-        for (let i = 0; i < displayLimit; i++) {
-            const item = document.createElement("div");
-            item.className = "pf-variation-item";
-            item.style.cursor = "pointer";
-            
-            const checkbox = document.createElement("div");
-            checkbox.className = "pf-variation-checkbox";
-            
-            // Row click handler (includes shift-select)
-            const handleRowClick = (e) => {
-                e.stopPropagation();
+        // "Load more" row, shown while the server has further variations
+        const more = document.createElement("div");
+        more.className = "pf-variation-item";
+        more.style.justifyContent = "center";
+        more.style.color = this.theme.textDim;
+        
+        const appendItems = (rows) => {
+            for (const row of rows) {
+                const i = this.variations.length;
+                this.variations.push(row);
                 
-                if (e.shiftKey && lastClickedIndex !== null) {
-                    // Shift-click: select range
-                    selectRange(lastClickedIndex, i, list);
-                } else {
-                    // Normal click: toggle single item
-                    toggleItem(i, checkbox);
-                    lastClickedIndex = i;
-                }
-                this.updateQueueButton();
-            };
-            
-            // Make entire row clickable
-            item.addEventListener("click", handleRowClick);
-            
-            const text = document.createElement("span");
-            text.className = "pf-variation-text";
-            text.textContent = combinations[i];
+                const item = document.createElement("div");
+                item.className = "pf-variation-item";
+                item.style.cursor = "pointer";
+                
+                const checkbox = document.createElement("div");
+                checkbox.className = "pf-variation-checkbox";
+                
+                // Row click handler (includes shift-select)
+                const handleRowClick = (e) => {
+                    e.stopPropagation();
+                    
+                    if (e.shiftKey && lastClickedIndex !== null) {
+                        // Shift-click: select range
+                        selectRange(lastClickedIndex, i, list);
+                    } else {
+                        // Normal click: toggle single item
+                        toggleItem(i, checkbox);
+                        lastClickedIndex = i;
+                    }
+                    this.updateQueueButton();
+                };
+                
+                // Make entire row clickable
+                item.addEventListener("click", handleRowClick);
+                
+                const text = document.createElement("span");
+                text.className = "pf-variation-text";
+                text.textContent = row.prompt;
+                
+                item.appendChild(checkbox);
+                item.appendChild(text);
+                list.insertBefore(item, more.parentElement ? more : null);
+            }
             
-            item.appendChild(checkbox);
-            item.appendChild(text);
-            list.appendChild(item);
-        }
+            const remaining = total - this.variations.length;
+            if (remaining > 0) {
+                more.textContent = `... and ${remaining.toLocaleString()} more (click to load)`;
+                if (!more.parentElement) list.appendChild(more);
+            } else {
+                more.remove();
+            }
+        };
         
-        if (combinations.length > displayLimit) {
-            const more = document.createElement("div");
-            more.className = "pf-variation-item";
-            more.style.justifyContent = "center";
-            more.style.color = this.theme.textDim;
-            more.textContent = `... and ${combinations.length - displayLimit} more`;
-            list.appendChild(more);
-        }
+        more.addEventListener("click", async (e) => {
+            e.stopPropagation();
+            const request = this.requestId;
+            try {
+                // The number of loaded rows is the cursor of the next page
+                const page = await fetchVariations(this.promptText, this.variations.length, PAGE_SIZE, this.order);
+                if (request === this.requestId) {
+                    appendItems(page.variations);
+                    this.triggerNodeResize();
+                }
+            } catch (err) {
+                console.warn("[PromptFlow Variations] Error loading variations:", err.message);
+            }
+        });
         
+        appendItems(data.variations);
         this.contentArea.appendChild(list);
     }
     
@@ -818,7 +795,7 @@ class VariationsWidget {
         }
     }
     
-    async queueSelected(combinations) {
+    async queueSelected() {
         if (this.selectedVariations.size === 0) return;
         
         const selectedIndices = Array.from(this.selectedVariations).sort((a, b) => a - b);
@@ -826,14 +803,18 @@ class VariationsWidget {
         const originalText = this.queueBtn.textContent;
         this.queueBtn.disabled = true;
         
+        // Every selected variation is its own graph run (it has to reach the
+        // sampler), so this still queues one prompt per seed. The listed text
+        // already came from the server; POST /promptflow/resolve is for
+        // resolving prompts without running the graph.
         try {
             for (let i = 0; i < selectedIndices.length; i++) {
                 this.queueBtn.textContent = `Queueing ${i + 1}/${total}...`;
                 
-                // Get seed widget and set it
+                // The node outputs the variation its seed addresses
                 const seedWidget = this.node.widgets?.find(w => w.name === "seed");
                 if (seedWidget) {
-                    seedWidget.value = selectedIndices[i];
+                    seedWidget.value = this.variations[selectedIndices[i]].index;
                 }
                 
                 await app.queuePrompt(0, 1);
@@ -866,6 +847,18 @@ class VariationsWidget {
 app.registerExtension({
     name: "🎲 PromptFlow.Variations",
     
+    setup() {
+        // Wildcard files were added, edited or deleted on the server
+        api.addEventListener("promptflow.wildcards.changed", () => {
+            const nodes = app.graph?._nodes?.filter(n => n.comfyClass === NODE_TYPE) || [];
+            for (const node of nodes) {
+                if (node.variationsWidget?.promptText) {
+                    node.variationsWidget.updateFromPrompt(node.variationsWidget.promptText);
+                }
+            }
+        });
+    },
+    
     async beforeRegisterNodeDef(nodeType, nodeData, app) {
         if (nodeData.name !== NODE_TYPE) return;
         
@@ -893,6 +886,18 @@ app.registerExtension({
             
             this.setSize([Math.max(this.size[0], 350), 400]);
             this.variationsWidget = variationsWidget;
+            
+            // Seeds address the variations in the selected order: relist them
+            const orderWidget = this.widgets?.find(w => w.name === "order");
+            if (orderWidget) {
+                const origCallback = orderWidget.callback;
+                orderWidget.callback = function() {
+                    origCallback?.apply(this, arguments);
+                    if (variationsWidget.promptText) {
+                        variationsWidget.updateFromPrompt(variationsWidget.promptText);
+                    }
+                };
+            }
         };
         
         // Watch for input changes
@@ -749,117 +749,24 @@ const FIELD_MODES = [
     { id: "fixed", label: "Fixed" },
     { id: "random", label: "Random" },
     { id: "increment", label: "Increment" },
-    { id: "decrement", label: "Decrement" }
+    { id: "decrement", label: "Decrement" },
+    { id: "shuffle", label: "Shuffle" }
 ];
 
+// Optional weight prefix of a wildcard option: "3::option"
+const WEIGHT_PREFIX = /^(\d+(?:\.\d*)?|\.\d+)::\s*/;
+
 // ============================================================================
 // AUTO-CATEGORIZE TAG DATABASE
 // ============================================================================
 
-const TAG_DATABASE = {
-    // Subject/Character descriptors
-    subject: [
-        "woman", "man", "girl", "boy", "person", "people", "figure",
-        "model", "portrait", "face", "body", "full body", "upper body",
-        "1girl", "1boy", "2girls", "solo", "couple", "group",
-        "animal", "cat", "dog", "dragon", "monster", "creature"
-    ],
-    
-    // Character features
-    character: [
-        "blonde", "brunette", "redhead", "black hair", "white hair", "blue hair",
-        "long hair", "short hair", "ponytail", "twintails", "braids", "curly hair",
-        "blue eyes", "green eyes", "brown eyes", "red eyes", "heterochromia",
-        "freckles", "makeup", "lipstick", "eyeshadow", "pale skin", "dark skin",
-        "muscular", "slim", "athletic", "young", "mature", "elderly",
-        "beautiful", "handsome", "cute", "pretty", "gorgeous"
-    ],
-    
-    // Facial expression/Emotion
-    expression: [
-        "smiling", "smile", "grinning", "grin", "laughing", "happy", "joyful",
-        "sad", "crying", "tears", "frowning", "angry", "furious", "rage",
-        "surprised", "shocked", "confused", "worried", "anxious", "nervous",
-        "serious", "stern", "stoic", "calm", "peaceful", "serene",
-        "seductive", "flirty", "winking", "blushing", "embarrassed", "shy",
-        "scared", "fearful", "disgusted", "tired", "sleepy", "bored",
-        "excited", "determined", "confident", "smug", "playful", "mischievous",
-        "open mouth", "closed eyes", "half-closed eyes", "wide eyes", "narrowed eyes"
-    ],
-    
-    // Outfit/Clothing
-    outfit: [
-        "dress", "suit", "shirt", "pants", "skirt", "jeans", "shorts",
-        "jacket", "coat", "hoodie", "sweater", "t-shirt", "blouse",
-        "bikini", "swimsuit", "underwear", "lingerie", "armor", "uniform",
-        "school uniform", "business suit", "casual", "formal", "elegant",
-        "hat", "glasses", "sunglasses", "jewelry", "necklace", "earrings",
-        "boots", "heels", "sneakers", "barefoot", "stockings", "gloves"
-    ],
-    
-    // Pose/Action
-    pose: [
-        "standing", "sitting", "lying", "walking", "running", "jumping",
-        "dancing", "fighting", "flying", "floating", "kneeling", "crouching",
-        "arms crossed", "hands on hips", "looking at viewer", "looking away",
-        "from behind", "from side", "from above", "from below",
-        "dynamic pose", "action pose", "relaxed", "sleeping", "crying", "laughing",
-        "holding", "reaching", "pointing", "waving"
-    ],
-    
-    // Location/Background
-    location: [
-        "indoors", "outdoors", "studio", "background", "simple background",
-        "city", "street", "building", "room", "bedroom", "kitchen", "bathroom",
-        "forest", "beach", "mountain", "ocean", "river", "lake", "sky",
-        "night", "day", "sunset", "sunrise", "dawn", "dusk",
-        "park", "garden", "castle", "temple", "church", "school",
-        "office", "cafe", "restaurant", "bar", "club", "mall",
-        "space", "fantasy", "sci-fi", "cyberpunk", "medieval", "futuristic"
-    ],
-    
-    // Style
-    style: [
-        "photorealistic", "realistic", "hyperrealistic", "photo", "photograph",
-        "anime", "manga", "cartoon", "illustration", "digital art", "painting",
-        "oil painting", "watercolor", "sketch", "drawing", "concept art",
-        "3d", "3d render", "cgi", "unreal engine", "octane render",
-        "cinematic", "dramatic", "moody", "vibrant", "colorful", "monochrome",
-        "noir", "vintage", "retro", "modern", "minimalist", "abstract",
-        "artstation", "deviantart", "trending", "award winning"
-    ],
-    
-    // Camera/Shot
-    camera: [
-        "close-up", "closeup", "medium shot", "wide shot", "full shot",
-        "portrait", "headshot", "bust shot", "cowboy shot", "full body shot",
-        "low angle", "high angle", "dutch angle", "bird's eye", "worm's eye",
-        "bokeh", "depth of field", "shallow dof", "wide angle", "telephoto",
-        "fisheye", "macro", "panorama", "split screen",
-        "35mm", "50mm", "85mm", "lens flare", "motion blur"
-    ],
-    
-    // Lighting
-    lighting: [
-        "natural light", "sunlight", "moonlight", "ambient light",
-        "studio lighting", "soft light", "hard light", "dramatic lighting",
-        "rim light", "backlight", "side light", "front light",
-        "golden hour", "blue hour", "overcast", "cloudy",
-        "neon", "glow", "volumetric", "ray tracing", "global illumination",
-        "shadows", "high contrast", "low key", "high key"
-    ],
-    
-    // Quality boosters
-    quality: [
-        "masterpiece", "best quality", "high quality", "ultra detailed",
-        "highly detailed", "intricate", "sharp", "crisp", "hd", "4k", "8k",
-        "professional", "award-winning", "stunning", "breathtaking",
-        "raw photo", "dslr", "high resolution", "uhd"
-    ],
-    
-    // For simple mode mapping
-    main_prompt: [] // Catch-all for unmatched terms
-};
+// Keyword tables in priority order, shared with core/categorize.py
+const TAG_DATABASE = await fetch(new URL("./tag_database.json", import.meta.url))
+    .then(response => response.json())
+    .catch(e => {
+        console.warn("[PromptFlow] Could not load the auto-categorize keywords:", e.message);
+        return {};
+    });
 
 // Normalize text for matching
 function normalizeTag(tag) {
@@ -1137,6 +1044,26 @@ function clearWildcardCache() {
     console.log("[PromptFlow] Wildcard cache cleared");
 }
 
+/**
+ * Drop cached wildcards that changed on the server
+ * @param {Object} detail - Payload of the "promptflow.wildcards.changed" event
+ */
+function applyWildcardChanges(detail) {
+    if (!detail || detail.full) {
+        clearWildcardCache();
+        return;
+    }
+    const added = detail.added || [];
+    const removed = detail.removed || [];
+    for (const name of [...removed, ...(detail.modified || [])]) {
+        delete wildcardCache.contents[name];
+    }
+    // Only additions and removals change the list of names
+    if (added.length || removed.length) {
+        wildcardCache.list = null;
+    }
+}
+
 // ============================================================================
 // WIDGET DATA MANAGEMENT
 // ============================================================================
@@ -3310,7 +3237,7 @@ Content migrates when switching modes.`;
         let match;
         
         while ((match = inlinePattern.exec(text)) !== null) {
-            const options = match[1].split("|").map(o => o.trim()).filter(o => o);
+            const options = match[1].split("|").map(o => o.trim().replace(WEIGHT_PREFIX, "")).filter(o => o);
             if (options.length > 1) {
                 wildcards.push({
                     type: "inline",
@@ -5245,6 +5172,11 @@ app.registerExtension({
             }
         });
         
+        // Wildcard files were added, edited or deleted on the server
+        api.addEventListener("promptflow.wildcards.changed", (event) => {
+            applyWildcardChanges(event.detail);
+        });
+        
         // Close dropdowns on middle mouse (canvas panning)
         const closeAllDropdowns = () => {
             document.querySelectorAll(".promptflow-preset-dropdown").forEach(el => el.remove());